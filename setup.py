@@ -8,7 +8,11 @@ sys.path.append('src')
 # fine tuning.
 build_options = {
     'packages': ['dns','dns.resolver','dns.rdatatype'],
-    'excludes': [],
+    # PySimpleGUI imports pydoc, which cx_Freeze leaves out by default
+    'includes': ['pydoc'],
+    # Only pulled in by the IPython extension of python-dotenv, which the application
+    # never loads, it's most of the size of the build
+    'excludes': ['IPython'],
     'include_files': [('variables.env', 'variables.env')],
     'path': sys.path
 }
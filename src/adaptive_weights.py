@@ -0,0 +1,123 @@
+"""
+adaptive_weights.py
+
+Computes the desire percentages of the games from the history of the current group
+of players, so that the wheel prefers games the group wins and hasn't played for a while.
+
+The weights are computed from the per group counters of the statistics,
+which the storage backend updates with every new log, so a spin reads a single small
+set of documents no matter how long the history is.
+
+Main Functions:
+- is_history_weighting_enabled: Checks whether the history weighting mode is selected.
+- get_recency_half_life_days: Gets the recency half life setting.
+- compute_weight: Computes the weight of a single game.
+- get_history_weights: Computes the weights of the games for a group of players.
+- apply_history_weights: Sets the desire percentages of the games for a group of players.
+
+Dependencies:
+- Requires env_var_loader to load the optional settings.
+"""
+
+from datetime import datetime
+from env_var_loader import get_optional_env_var_value
+
+# The lowest weight, so that no game ever drops out of the wheel
+MIN_WEIGHT = 0.05
+# Weights are rounded, so that the alias samplers of similar weights can be reused
+WEIGHT_PRECISION = 3
+
+def is_history_weighting_enabled():
+    """
+    Checks whether the history weighting mode is selected by the WHEEL_WEIGHTING setting,
+    "uniform" (the default) keeps the hard-coded percentages, "history" computes them
+    from the Logs.
+
+    Returns:
+        bool: True when WHEEL_WEIGHTING is "history".
+    """
+    return get_optional_env_var_value("WHEEL_WEIGHTING", "uniform").lower() == "history"
+
+def get_recency_half_life_days():
+    """
+    Gets the number of days after which a game played by the group gets back half
+    of its recency weight.
+
+    Returns:
+        float: The RECENCY_HALF_LIFE_DAYS setting, 7 days by default.
+    """
+    return float(get_optional_env_var_value("RECENCY_HALF_LIFE_DAYS", "7"))
+
+def compute_weight(wins, losses, last_played, now, half_life_days=None):
+    """
+    Computes the weight of a single game from its history with a group of players.
+
+    The recency part grows from 0 right after the game was played up to 1 with
+    the exponential decay of the half life. The outcome part is the win rate
+    with Laplace smoothing, so a game never played by the group gets 0.5.
+
+    Parameters:
+        wins (int): Number of games the group won.
+        losses (int): Number of games the group lost.
+        last_played (datetime or None): When the group played the game the last time.
+        now (datetime): The current time.
+        half_life_days (float, optional): The recency half life in days.
+            Defaults to the RECENCY_HALF_LIFE_DAYS setting.
+
+    Returns:
+        float: The weight of the game, between MIN_WEIGHT and 1 + MIN_WEIGHT.
+    """
+    if last_played is None:
+        recency = 1.0
+    else:
+        if half_life_days is None:
+            half_life_days = get_recency_half_life_days()
+        days = max((now - last_played).total_seconds(), 0) / 86400
+        recency = 1 - 0.5 ** (days / half_life_days)
+    win_rate = (wins + 1) / (wins + losses + 2)
+    return round(MIN_WEIGHT + recency * win_rate, WEIGHT_PRECISION)
+
+def get_history_weights(storage, game_names, players, now=None):
+    """
+    Computes the weights of the games for a group of players by a single query.
+
+    Parameters:
+        storage (storage_backend.StorageBackend): The storage with the statistics.
+        game_names (Iterable): Names of the games.
+        players (List): Names of the players of the group.
+        now (datetime, optional): The current time. Defaults to now.
+
+    Returns:
+        Dictionary: Game name -> weight.
+    """
+    now = now or datetime.now()
+    half_life_days = get_recency_half_life_days()
+    history = storage.get_game_group_stats(players)
+    weights = {}
+    for name in game_names:
+        entry = history.get(name, {})
+        weights[name] = compute_weight(
+            entry.get("wins", 0),
+            entry.get("losses", 0),
+            entry.get("last_played"),
+            now,
+            half_life_days
+        )
+    return weights
+
+def apply_history_weights(storage, games, players, now=None):
+    """
+    Sets the desire percentages of the games for a group of players.
+
+    Parameters:
+        storage (storage_backend.StorageBackend): The storage with the statistics.
+        games (list[Game]): The games on the wheel, their `percentage` is changed.
+        players (List): Names of the players of the group.
+        now (datetime, optional): The current time. Defaults to now.
+
+    Returns:
+        None
+    """
+    weights = get_history_weights(storage, [_game.name for _game in games], players, now)
+    for _game in games:
+        _game.percentage = weights[_game.name]
@@ -0,0 +1,159 @@
+"""
+alias_sampler.py
+
+Module containing the definition of the AliasSampler class, a weighted random sampler
+using Vose's alias method. Building the sampler takes O(n), every draw then takes O(1).
+
+Main Functions:
+- get_sampler: Returns a cached AliasSampler for the given weights.
+
+Dependencies:
+- Optionally uses numpy to draw large batches of samples at once.
+    It is imported on the first batch draw, as importing it is slow.
+"""
+
+import random
+from functools import lru_cache
+
+# The numpy module once imported, False when it isn't installed
+_numpy = None
+
+def _get_numpy():
+    """
+    Returns the numpy module, importing it on first use. None when it isn't installed.
+    """
+    global _numpy # pylint: disable=global-statement
+    if _numpy is None:
+        try:
+            import numpy # pylint: disable=import-outside-toplevel
+            _numpy = numpy
+        except ImportError:
+            _numpy = False
+    return _numpy or None
+
+class AliasSampler:
+    """
+    This class represents a weighted random sampler of indexes 0..n-1.
+    """
+
+    def __init__(self, weights, seed=None):
+        """
+        Initializes the AliasSampler class, building the probability and alias tables.
+
+        Parameters:
+            weights (List): Non-negative weights of the indexes, at least one must be positive.
+            seed (int, optional): A seed of the random number generators,
+                used for reproducible draws.
+        """
+        count = len(weights)
+        total = sum(weights)
+        if count == 0 or total <= 0 or min(weights) < 0:
+            raise ValueError("Weights must be non-negative with a positive sum.")
+
+        # Scale the weights so that their average is 1
+        scaled = [weight * count / total for weight in weights]
+        small = [index for index, weight in enumerate(scaled) if weight < 1]
+        large = [index for index, weight in enumerate(scaled) if weight >= 1]
+
+        self.probability = [1.0] * count
+        self.alias = list(range(count))
+
+        # Fill every column up to 1 by the rest of a column that is over 1
+        while small and large:
+            small_index = small.pop()
+            large_index = large.pop()
+            self.probability[small_index] = scaled[small_index]
+            self.alias[small_index] = large_index
+            scaled[large_index] += scaled[small_index] - 1
+            if scaled[large_index] < 1:
+                small.append(large_index)
+            else:
+                large.append(large_index)
+        # The remaining columns are full (any leftovers are rounding errors)
+
+        self.rng = random.Random(seed)
+        self._seed = seed
+        # The numpy copies of the tables, built on the first batch draw
+        self._numpy_rng = None
+        self._numpy_probability = None
+        self._numpy_alias = None
+
+    def __len__(self):
+        return len(self.probability)
+
+    def draw(self, rng=None):
+        """
+        Draws a single random index.
+
+        Parameters:
+            rng (random.Random, optional): The random number generator to be used.
+                Defaults to the sampler's own generator.
+
+        Returns:
+            int: The drawn index.
+        """
+        rng = rng or self.rng
+        column = int(rng.random() * len(self.probability))
+        if rng.random() < self.probability[column]:
+            return column
+        return self.alias[column]
+
+    def _sample_numpy(self, k):
+        """
+        Draws `k` random indexes at once into a numpy array.
+        """
+        numpy = _get_numpy()
+        if self._numpy_rng is None:
+            self._numpy_rng = numpy.random.default_rng(self._seed)
+            self._numpy_probability = numpy.array(self.probability)
+            self._numpy_alias = numpy.array(self.alias)
+        columns = self._numpy_rng.integers(len(self.probability), size=k)
+        coins = self._numpy_rng.random(k)
+        return numpy.where(coins < self._numpy_probability[columns], columns,
+                           self._numpy_alias[columns])
+
+    def sample(self, k):
+        """
+        Draws `k` random indexes.
+
+        Parameters:
+            k (int): The number of indexes to be drawn.
+
+        Returns:
+            List: A list of `k` drawn indexes.
+        """
+        if _get_numpy() is not None:
+            return self._sample_numpy(k).tolist()
+        return [self.draw() for _ in range(k)]
+
+    def sample_counts(self, k):
+        """
+        Draws `k` random indexes and counts how many times each index was drawn.
+        Meant for bulk simulations, as the drawn indexes don't have to be kept.
+
+        Parameters:
+            k (int): The number of indexes to be drawn.
+
+        Returns:
+            List: A list with the number of draws of each index.
+        """
+        if _get_numpy() is not None:
+            return _get_numpy().bincount(self._sample_numpy(k), minlength=len(self)).tolist()
+        counts = [0] * len(self)
+        for _ in range(k):
+            counts[self.draw()] += 1
+        return counts
+
+@lru_cache(maxsize=32)
+def get_sampler(weights):
+    """
+    Returns an AliasSampler for the given weights, building it only when
+    these weights weren't used recently.
+
+    Parameters:
+        weights (tuple): Non-negative weights of the indexes.
+
+    Returns:
+        AliasSampler: The sampler of the weights.
+    """
+    return AliasSampler(weights)
@@ -0,0 +1,106 @@
+"""
+async_db_handler.py
+
+Awaitable variants of the storage backend methods for use inside an asyncio event loop.
+
+pymongo (like sqlite3) is a blocking driver, so calling the storage backend directly from
+a Discord event handler stalls the whole event loop (including the gateway heartbeat)
+for every Atlas round trip.
+The functions here run the blocking calls on a bounded thread pool instead, so concurrent
+commands from many users overlap instead of queueing behind each other.
+
+Main Functions:
+- get_executor_workers: Gets the maximum number of concurrent database calls.
+- get_executor: Returns the shared, bounded thread pool used for database calls.
+- run_in_executor: Runs any blocking function on the database thread pool and awaits it.
+- get_list_of_games, get_list_of_user_games, add_game_to_game_list, ...:
+    Awaitable versions of the StorageBackend methods, taking the backend
+    followed by the parameters of the method.
+
+Dependencies:
+- Requires asyncio and concurrent.futures to run blocking calls off the event loop.
+- Requires storage_backend to provide all database operations.
+- Requires env_var_loader to load the optional settings.
+"""
+
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from storage_backend import StorageBackend
+from env_var_loader import get_optional_env_var_value
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def get_executor_workers():
+    """
+    Gets the maximum number of database calls running at the same time.
+    Calls above this limit wait in the executor queue, not in the event loop.
+
+    Returns:
+        int: The DB_EXECUTOR_WORKERS setting, 8 by default.
+    """
+    return int(get_optional_env_var_value("DB_EXECUTOR_WORKERS", "8"))
+
+def get_executor():
+    """
+    Returns the shared thread pool used for database calls, creating it on first use.
+
+    Returns:
+        concurrent.futures.ThreadPoolExecutor: The bounded database thread pool.
+    """
+    global _executor # pylint: disable=global-statement
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=get_executor_workers(),
+                thread_name_prefix="db_handler"
+            )
+    return _executor
+
+async def run_in_executor(func, *args, **kwargs):
+    """
+    Runs a blocking function on the database thread pool without blocking the event loop.
+
+    Parameters:
+        func (callable): The blocking function to be run.
+        *args: Positional arguments passed to `func`.
+        **kwargs: Keyword arguments passed to `func`.
+
+    Returns:
+        Any: Whatever `func` returns.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), functools.partial(func, *args, **kwargs))
+
+def _make_async(method_name):
+    """
+    Creates an awaitable wrapper around a blocking StorageBackend method.
+
+    Parameters:
+        method_name (string): The name of the StorageBackend method.
+
+    Returns:
+        Coroutine function: Accepts the storage backend followed by the parameters
+            of the method and returns its result.
+    """
+    async def wrapper(storage, *args, **kwargs):
+        return await run_in_executor(getattr(storage, method_name), *args, **kwargs)
+    wrapper.__name__ = method_name
+    wrapper.__doc__ = getattr(StorageBackend, method_name).__doc__
+    return wrapper
+
+get_last_spin_string = _make_async("get_last_spin_string")
+update_last_spin = _make_async("update_last_spin")
+is_last_spin_inserted = _make_async("is_last_spin_inserted")
+insert_log_into_database = _make_async("insert_log_into_database")
+get_list_of_games = _make_async("get_list_of_games")
+is_game_in_game_list = _make_async("is_game_in_game_list")
+add_game_to_game_list = _make_async("add_game_to_game_list")
+remove_game_from_game_list = _make_async("remove_game_from_game_list")
+get_list_of_user_games = _make_async("get_list_of_user_games")
+get_common_games_of_players = _make_async("get_common_games_of_players")
+add_game_to_user_game_list = _make_async("add_game_to_user_game_list")
+remove_game_from_user_game_list = _make_async("remove_game_from_user_game_list")
+get_stats = _make_async("get_stats")
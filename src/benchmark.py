@@ -0,0 +1,343 @@
+"""
+benchmark.py
+
+Performance benchmarks of the Wheel of Luck database and bot command paths.
+
+The benchmarks run against a local MongoDB stand-in (mongomock) wrapped in a layer that adds
+a fixed latency to every database round trip, mimicking the WAN latency to Atlas.
+Every throughput run gets a new stand-in and an empty games catalog, so the blocking
+and the async runs start from the same state.
+
+Main Functions:
+- create_stand_in_db: Creates an in-process MongoDB stand-in with simulated round trip latency.
+- benchmark_command_throughput:
+    Measures bot commands per second for a given number of concurrent senders.
+- benchmark_write_operations:
+    Measures round trips and latency of the db_handler write operations.
+- benchmark_storage_backends:
+    Measures the latency of the bot command operations of every storage backend.
+- main: Runs all the benchmarks and prints the results.
+
+Dependencies:
+- Requires mongomock as a local MongoDB stand-in (`pip install mongomock`).
+- Requires db_handler and async_db_handler for the benchmarked database operations.
+- Requires storage_backend for the compared storage backends.
+"""
+
+import time
+import asyncio
+import threading
+import argparse
+import mongomock
+import db_handler
+import async_db_handler
+from game_catalog import get_game_catalog
+from storage_backend import MongoBackend, MemoryBackend, SQLiteBackend
+
+# Collection methods that result in a round trip to the database server
+ROUND_TRIP_METHODS = {
+    "find", "find_one", "count_documents", "insert_one", "insert_many", "update_one",
+    "update_many", "delete_one", "delete_many", "find_one_and_update", "aggregate",
+    "bulk_write", "create_index", "create_indexes"
+}
+
+class LatencyCollection:
+    """
+    This class wraps a mongomock collection and delays every round trip method call.
+    """
+
+    def __init__(self, collection, latency, stats, stats_lock):
+        """
+        Initializes the LatencyCollection class.
+
+        Parameters:
+            collection (mongomock.Collection): The wrapped collection.
+            latency (float): The simulated round trip latency in seconds.
+            stats (Dictionary): Shared counters, `round_trips` is increased on every call.
+            stats_lock (threading.Lock): Guards the counters, the calls come from
+                the database worker threads.
+        """
+        self._collection = collection
+        self._latency = latency
+        self._stats = stats
+        self._stats_lock = stats_lock
+
+    def __getattr__(self, name):
+        attribute = getattr(self._collection, name)
+        if name not in ROUND_TRIP_METHODS:
+            return attribute
+
+        def delayed(*args, **kwargs):
+            with self._stats_lock:
+                self._stats["round_trips"] += 1
+            # A blocking sleep, just like a blocking pymongo socket read
+            time.sleep(self._latency)
+            return attribute(*args, **kwargs)
+        return delayed
+
+class LatencyDatabase:
+    """
+    This class wraps a mongomock database so that every collection adds a round trip latency.
+    """
+
+    def __init__(self, db, latency):
+        """
+        Initializes the LatencyDatabase class.
+
+        Parameters:
+            db (mongomock.Database): The wrapped database.
+            latency (float): The simulated round trip latency in seconds.
+        """
+        self._db = db
+        self.name = db.name
+        self.stats = {"round_trips": 0}
+        self._stats_lock = threading.Lock()
+        self._latency = latency
+
+    def __getitem__(self, collection_name):
+        return LatencyCollection(
+            self._db[collection_name], self._latency, self.stats, self._stats_lock
+        )
+
+    def __getattr__(self, name):
+        return getattr(self._db, name)
+
+def create_stand_in_db(latency=0.02, games_count=50, players_count=10):
+    """
+    Creates an in-process MongoDB stand-in filled with generated games and players.
+    The cached games catalog of the database is dropped, so nothing carries over
+    from a previous stand-in.
+
+    Parameters:
+        latency (float, optional): The simulated round trip latency in seconds.
+        games_count (int, optional): The number of games in the Games collection.
+        players_count (int, optional): The number of players in the Players collection.
+
+    Returns:
+        LatencyDatabase: The stand-in database.
+    """
+    db = mongomock.MongoClient()["WheelOfLuck"]
+    games = [f"Game {index:06d}" for index in range(games_count)]
+    db["Games"].insert_many([{"name": game} for game in games])
+    db["Players"].insert_many([
+        {"name": f"player{index}", "games": games[index::2]} for index in range(players_count)
+    ])
+    # The catalogs are shared by the databases of the same name
+    get_game_catalog(db).invalidate()
+    return LatencyDatabase(db, latency)
+
+async def _run_blocking_commands(db, sender, commands):
+    """
+    Runs `!games` and `!mygames` commands calling db_handler directly inside the event loop.
+    """
+    for index in range(commands):
+        if index % 2 == 0:
+            db_handler.get_list_of_games(db)
+        else:
+            db_handler.get_list_of_user_games(db, sender)
+        # Give other senders a chance to run, as awaiting channel.send() would
+        await asyncio.sleep(0)
+    return commands
+
+async def _run_async_commands(db, sender, commands):
+    """
+    Runs `!games` and `!mygames` commands awaiting async_db_handler.
+    """
+    storage = MongoBackend(db)
+    for index in range(commands):
+        if index % 2 == 0:
+            await async_db_handler.get_list_of_games(storage)
+        else:
+            await async_db_handler.get_list_of_user_games(storage, sender)
+    return commands
+
+async def benchmark_command_throughput(db, senders, commands_per_sender, blocking=False):
+    """
+    Measures bot commands per second for a given number of concurrent senders.
+
+    Parameters:
+        db (LatencyDatabase): The stand-in database.
+        senders (int): The number of users sending commands at the same time.
+        commands_per_sender (int): The number of commands each user sends.
+        blocking (bool, optional): Whether to call the blocking db_handler functions directly
+            (the behaviour before async_db_handler) instead of awaiting async_db_handler.
+
+    Returns:
+        float: Commands handled per second.
+    """
+    run_commands = _run_blocking_commands if blocking else _run_async_commands
+    start = time.perf_counter()
+    # Every sender returns its own count of the completed commands, nothing is shared
+    completed = await asyncio.gather(*(
+        run_commands(db, f"player{index}", commands_per_sender) for index in range(senders)
+    ))
+    elapsed = time.perf_counter() - start
+    return sum(completed) / elapsed
+
+def _legacy_add_game_to_game_list(db, game):
+    """
+    add_game_to_game_list as it was before the atomic upserts, kept for comparison.
+    """
+    if db["Games"].count_documents({"name": game}) != 0:
+        return False
+    db["Games"].insert_one({"name": game})
+    return True
+
+def _legacy_remove_game_from_game_list(db, game):
+    """
+    remove_game_from_game_list as it was before the atomic upserts, kept for comparison.
+    """
+    if db["Games"].count_documents({"name": game}) == 0:
+        return False
+    db["Games"].delete_one({"name": game})
+    return True
+
+def _legacy_add_game_to_user_game_list(db, user_name, game):
+    """
+    add_game_to_user_game_list as it was before the atomic upserts, kept for comparison.
+    """
+    if db["Players"].find_one({"name": user_name}) is None:
+        db["Players"].insert_one({"name": user_name, "games": []})
+    db["Players"].update_one({"name": user_name}, {"$addToSet": {"games": game}})
+
+def _legacy_remove_game_from_user_game_list(db, user_name, game):
+    """
+    remove_game_from_user_game_list as it was before the atomic upserts, kept for comparison.
+    """
+    if db["Players"].find_one({"name": user_name}) is None:
+        db["Players"].insert_one({"name": user_name, "games": []})
+    db["Players"].update_one({"name": user_name}, {"$pull": {"games": game}})
+
+def benchmark_write_operations(db, repeats=20):
+    """
+    Measures round trips and latency of the db_handler write operations,
+    before (legacy) and after the atomic upserts.
+
+    Parameters:
+        db (LatencyDatabase): The stand-in database.
+        repeats (int, optional): The number of times each operation is run.
+
+    Returns:
+        List: Tuples of (operation name, variant, round trips per call, milliseconds per call).
+    """
+    operations = [
+        ("add game", _legacy_add_game_to_game_list, db_handler.add_game_to_game_list,
+         lambda index: (f"New game {index}",)),
+        ("remove game", _legacy_remove_game_from_game_list, db_handler.remove_game_from_game_list,
+         lambda index: (f"New game {index}",)),
+        ("add user game", _legacy_add_game_to_user_game_list,
+         db_handler.add_game_to_user_game_list,
+         lambda index: (f"new player {index}", "Game 000001")),
+        ("remove user game", _legacy_remove_game_from_user_game_list,
+         db_handler.remove_game_from_user_game_list,
+         lambda index: (f"new player {index}", "Game 000001")),
+    ]
+    results = []
+    for variant in ("before", "after"):
+        # Every variant starts with the same data
+        db.drop_collection("Games")
+        db.drop_collection("Players")
+        if variant == "after":
+            db_handler.ensure_indexes(db)
+        for name, legacy_function, function, make_args in operations:
+            operation = legacy_function if variant == "before" else function
+            round_trips = db.stats["round_trips"]
+            start = time.perf_counter()
+            for index in range(repeats):
+                operation(db, *make_args(index))
+            elapsed = time.perf_counter() - start
+            results.append((
+                name,
+                variant,
+                (db.stats["round_trips"] - round_trips) / repeats,
+                elapsed / repeats * 1000
+            ))
+    return results
+
+def benchmark_storage_backends(db, repeats=20):
+    """
+    Measures the latency of the bot command operations of every storage backend.
+
+    Parameters:
+        db (LatencyDatabase): The stand-in database of the MongoDB backend.
+        repeats (int, optional): Number of times every operation is run.
+
+    Returns:
+        List: (backend, operation, ms/op) tuples.
+    """
+    backends = [
+        ("mongo", MongoBackend(db)),
+        ("sqlite", SQLiteBackend(":memory:")),
+        ("memory", MemoryBackend()),
+    ]
+    results = []
+    for backend_name, storage in backends:
+        storage.add_game_to_game_list("Benchmark Game")
+        operations = [
+            ("list games", storage.get_list_of_games),
+            ("user games", lambda: storage.get_list_of_user_games("benchmark_player")),
+            ("add user game",
+             lambda: storage.add_game_to_user_game_list("benchmark_player", "Benchmark Game")),
+            ("common games",
+             lambda: storage.get_common_games_of_players(["benchmark_player", "player0"])),
+        ]
+        for operation_name, operation in operations:
+            start = time.perf_counter()
+            for _ in range(repeats):
+                operation()
+            elapsed = time.perf_counter() - start
+            results.append((backend_name, operation_name, elapsed / repeats * 1000))
+        storage.close()
+    return results
+
+def main():
+    """
+    The main entry point of the script.
+
+    Runs the command throughput benchmark at 1, 10 and 100 concurrent senders
+    and prints commands per second for the blocking and the async database layer.
+    Then prints round trips and latency of the write operations.
+
+    Returns:
+        None
+    """
+    parser = argparse.ArgumentParser(description="Wheel of Luck performance benchmarks.")
+    parser.add_argument("--latency-ms", type=float, default=20.0,
+                        help="Simulated database round trip latency in milliseconds.")
+    parser.add_argument("--commands", type=int, default=4,
+                        help="Number of commands sent by each sender.")
+    args = parser.parse_args()
+
+    latency = args.latency_ms / 1000
+
+    print(f"Command throughput ({args.latency_ms:g} ms per round trip, "
+          f"{async_db_handler.get_executor_workers()} database workers)")
+    print(f"{'senders':>8} {'blocking cmd/s':>15} {'round trips':>12} "
+          f"{'async cmd/s':>12} {'round trips':>12}")
+    for senders in (1, 10, 100):
+        row = []
+        for blocking in (True, False):
+            # A new stand-in, so the runs don't share data or a warm catalog
+            db = create_stand_in_db(latency=latency)
+            throughput = asyncio.run(
+                benchmark_command_throughput(db, senders, args.commands, blocking=blocking)
+            )
+            row.append(f"{throughput:>15.1f} {db.stats['round_trips']:>12}" if blocking
+                       else f"{throughput:>12.1f} {db.stats['round_trips']:>12}")
+        print(f"{senders:>8} {' '.join(row)}")
+
+    db = create_stand_in_db(latency=latency)
+    print()
+    print("Write operations")
+    print(f"{'operation':>17} {'variant':>8} {'round trips':>12} {'ms/op':>8}")
+    for name, variant, round_trips, milliseconds in benchmark_write_operations(db):
+        print(f"{name:>17} {variant:>8} {round_trips:>12.1f} {milliseconds:>8.1f}")
+
+    print()
+    print("Storage backends")
+    print(f"{'backend':>8} {'operation':>14} {'ms/op':>8}")
+    for backend_name, operation_name, milliseconds in benchmark_storage_backends(db):
+        print(f"{backend_name:>8} {operation_name:>14} {milliseconds:>8.3f}")
+
+if __name__ == "__main__":
+    main()
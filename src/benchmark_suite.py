@@ -0,0 +1,544 @@
+"""
+benchmark_suite.py
+
+Benchmark suite of the Wheel of Luck storage, selection and bot command paths,
+saving its results as JSON so runs can be compared over time.
+
+Every storage operation (the db_handler functions behind the StorageBackend methods)
+is measured at catalog sizes from 10 to 100 000 games on:
+- MongoDB through db_handler, a real server at all the sizes when MONGODB_BENCHMARK_URI
+    is set (like "mongodb://localhost:27017", the Benchmarks workflow runs one), otherwise
+    a local stand-in (mongomock) up to MONGO_STAND_IN_MAX_GAMES games, as mongomock reads
+    of larger collections take minutes,
+- the embedded SQLite and the in-memory backends, at all the sizes.
+The suite also measures choose_winning_game, make_list_printable and the dispatch
+of the bot commands driven by fake Discord messages.
+
+Main Functions:
+- measure: Runs a function repeatedly and returns its timing statistics.
+- create_benchmark_backend: Creates a storage backend filled with generated games and players.
+- benchmark_storage: Measures every storage operation of a backend.
+- benchmark_db_handler: Measures the db_handler functions without a StorageBackend method.
+- benchmark_selection: Measures choose_winning_game and make_list_printable.
+- benchmark_command_dispatch: Measures the dispatch of the bot commands.
+- compare_results: Compares the results with the results of a baseline run.
+- find_regressions: Finds the benchmarks that got slower than allowed.
+- main: Runs the suite, prints the results and saves them as JSON.
+
+Dependencies:
+- Requires mongomock as a local MongoDB stand-in (`pip install mongomock`)
+  and pymongo for a real MongoDB server.
+- Requires env_var_loader to load the optional settings.
+- Requires db_handler and storage_backend for the benchmarked storage operations.
+- Requires spin_engine and game for the selection of the winning game.
+- Requires discord_bot for the bot commands, the discord package itself isn't needed.
+"""
+
+import sys
+import json
+import time
+import random
+import asyncio
+import platform
+import argparse
+import statistics
+from datetime import datetime, timezone
+import mongomock
+from pymongo import MongoClient
+import db_handler
+import discord_bot
+import stats_keys
+from game import Game
+from spin_engine import choose_winning_game
+from storage_backend import MongoBackend, MemoryBackend, SQLiteBackend, set_storage_backend
+from env_var_loader import get_optional_env_var_value
+
+# Numbers of games in the catalog the suite runs at
+CATALOG_SIZES = (10, 100, 1000, 10000, 100000)
+# mongomock reads a 100 000 games collection in minutes, without a real server
+# larger catalogs skip the mongo backend
+MONGO_STAND_IN_MAX_GAMES = 10000
+BACKENDS = ("mongo", "sqlite", "memory")
+# Number of players and the maximal number of games in a players library
+PLAYERS_COUNT = 8
+MAX_LIBRARY_SIZE = 1000
+# Every benchmark runs at least MIN_ROUNDS times and for at least MIN_TIME seconds,
+# but at most MAX_ROUNDS times
+MIN_ROUNDS = 5
+MAX_ROUNDS = 1000
+MIN_TIME = 0.2
+# Benchmarks changing the data run a fixed number of times, so they can be undone
+WRITE_ROUNDS = 20
+# Benchmarks faster than this in the baseline are too noisy to fail the regression check
+MIN_CHECKED_MS = 0.05
+
+def measure(function, setup=None, rounds=None, min_time=MIN_TIME):
+    """
+    Runs a function repeatedly and returns its timing statistics.
+
+    Parameters:
+        function (callable): Called with the index of the round.
+        setup (callable, optional): Called with the index of the round before the function,
+            not included in the measured time.
+        rounds (int, optional): A fixed number of rounds. Defaults to running at least
+            MIN_ROUNDS times and `min_time` seconds, up to MAX_ROUNDS times.
+        min_time (float, optional): The minimal measured time in seconds.
+
+    Returns:
+        Dictionary: `rounds` and the `mean_ms`, `median_ms`, `min_ms`, `max_ms`
+            and `stddev_ms` of a single round.
+    """
+    times = []
+    index = 0
+    while True:
+        if rounds is not None:
+            if index == rounds:
+                break
+        elif index >= MAX_ROUNDS or (index >= MIN_ROUNDS and sum(times) >= min_time):
+            break
+        if setup is not None:
+            setup(index)
+        start = time.perf_counter()
+        function(index)
+        times.append(time.perf_counter() - start)
+        index += 1
+    return {
+        "rounds": len(times),
+        "mean_ms": statistics.mean(times) * 1000,
+        "median_ms": statistics.median(times) * 1000,
+        "min_ms": min(times) * 1000,
+        "max_ms": max(times) * 1000,
+        "stddev_ms": (statistics.stdev(times) if len(times) > 1 else 0.0) * 1000
+    }
+
+def make_game_names(games_count):
+    """
+    Returns the generated game names, in alphabetical order.
+    """
+    return [f"Game {index:06d}" for index in range(games_count)]
+
+def make_libraries(games):
+    """
+    Returns the generated libraries of the players, every player owning a smaller
+    part of the same games than the previous one, so any players have games in common.
+
+    Returns:
+        Dictionary: Player name -> list of the players game names.
+    """
+    library_size = min(len(games) // 2, MAX_LIBRARY_SIZE)
+    return {
+        f"player{index}": games[:library_size - index * library_size // (2 * PLAYERS_COUNT)]
+        for index in range(PLAYERS_COUNT)
+    }
+
+def create_benchmark_backend(backend_name, games_count, mongo_client=None):
+    """
+    Creates a storage backend filled with generated games and players.
+
+    Parameters:
+        backend_name (string): "mongo", "sqlite" or "memory".
+        games_count (int): The number of games in the catalog.
+        mongo_client (pymongo.mongo_client.MongoClient, optional): The client of a real
+            MongoDB server for the mongo backend, its database is dropped first.
+            Defaults to a mongomock stand-in.
+
+    Returns:
+        StorageBackend: The filled storage backend.
+    """
+    games = make_game_names(games_count)
+    libraries = make_libraries(games)
+
+    if backend_name == "mongo":
+        # Every catalog size has its own database, so that the cached catalogs don't mix
+        db_name = f"WheelOfLuckBenchmark{games_count}"
+        if mongo_client is None:
+            db = mongomock.MongoClient()[db_name]
+        else:
+            mongo_client.drop_database(db_name)
+            db = mongo_client[db_name]
+        # Seeded by bulk inserts, a single round trip per batch of the driver
+        db["Games"].insert_many([{"name": game} for game in games])
+        db["Players"].insert_many([
+            {"name": player, "games": list(library)} for player, library in libraries.items()
+        ])
+        db_handler.ensure_indexes(db)
+        return MongoBackend(db)
+
+    storage = SQLiteBackend(":memory:") if backend_name == "sqlite" else MemoryBackend()
+    for game in games:
+        storage.add_game_to_game_list(game)
+    for player, library in libraries.items():
+        for game in library:
+            storage.add_game_to_user_game_list(player, game)
+    return storage
+
+def _log_spins(storage, players, spins):
+    """
+    Logs generated spins, so that the statistics aren't empty.
+    """
+    games = storage.get_list_of_games()
+    for index in range(spins):
+        storage.update_last_spin(games[index % len(games)], players[:index % len(players) + 1])
+        storage.insert_log_into_database("W" if index % 3 else "L")
+    if isinstance(storage, MongoBackend):
+        # The logs and their statistics are written in the background
+        db_handler.wait_for_logs()
+
+def benchmark_storage(storage):
+    """
+    Measures every storage operation of a backend. The data is the same after the run.
+
+    Parameters:
+        storage (StorageBackend): A backend filled by create_benchmark_backend.
+
+    Returns:
+        List: (operation name, timing statistics) tuples.
+    """
+    players = [f"player{index}" for index in range(PLAYERS_COUNT)]
+    _log_spins(storage, players, 50)
+    game = storage.get_list_of_games()[0]
+    new_games = [f"Benchmark game {index}" for index in range(WRITE_ROUNDS)]
+
+    return [
+        ("get_list_of_games", measure(lambda _: storage.get_list_of_games())),
+        ("is_game_in_game_list", measure(lambda _: storage.is_game_in_game_list(game))),
+        ("add_game_to_game_list", measure(
+            lambda index: storage.add_game_to_game_list(new_games[index]), rounds=WRITE_ROUNDS
+        )),
+        ("remove_game_from_game_list", measure(
+            lambda index: storage.remove_game_from_game_list(new_games[index]),
+            rounds=WRITE_ROUNDS
+        )),
+        ("get_list_of_user_games", measure(
+            lambda _: storage.get_list_of_user_games(players[0])
+        )),
+        ("add_game_to_user_game_list", measure(
+            lambda index: storage.add_game_to_user_game_list(players[0], new_games[index]),
+            rounds=WRITE_ROUNDS
+        )),
+        ("remove_game_from_user_game_list", measure(
+            lambda index: storage.remove_game_from_user_game_list(players[0], new_games[index]),
+            rounds=WRITE_ROUNDS
+        )),
+        ("get_common_games_of_players (2 players)", measure(
+            lambda _: storage.get_common_games_of_players(players[:2])
+        )),
+        (f"get_common_games_of_players ({PLAYERS_COUNT} players)", measure(
+            lambda _: storage.get_common_games_of_players(players)
+        )),
+        ("update_last_spin", measure(
+            lambda _: storage.update_last_spin(game, players[:2]), rounds=WRITE_ROUNDS
+        )),
+        ("get_last_spin_string", measure(lambda _: storage.get_last_spin_string())),
+        ("is_last_spin_inserted", measure(lambda _: storage.is_last_spin_inserted())),
+        ("insert_log_into_database", measure(
+            lambda _: storage.insert_log_into_database("W"),
+            setup=lambda _: storage.update_last_spin(game, players[:2]),
+            rounds=WRITE_ROUNDS
+        )),
+        ("get_stats", measure(
+            lambda _: storage.get_stats(stats_keys.KIND_GAME, discord_bot.STATS_ENTRIES_LIMIT)
+        )),
+        ("get_game_group_stats", measure(
+            lambda _: storage.get_game_group_stats(players[:2])
+        )),
+    ]
+
+def benchmark_db_handler(storage):
+    """
+    Measures the db_handler functions that have no StorageBackend method.
+    The added players are removed after the run.
+
+    Parameters:
+        storage (MongoBackend): A backend filled by create_benchmark_backend.
+
+    Returns:
+        List: (function name, timing statistics) tuples.
+    """
+    db = storage.db
+    players = [f"player{index}" for index in range(PLAYERS_COUNT)]
+    new_players = [f"benchmark player {index}" for index in range(WRITE_ROUNDS)]
+    results = [
+        ("get_libraries_of_players", measure(
+            lambda _: db_handler.get_libraries_of_players(db, players)
+        )),
+        ("add_new_player", measure(
+            lambda index: db_handler.add_new_player(db, new_players[index]), rounds=WRITE_ROUNDS
+        )),
+        ("add_new_players", measure(
+            lambda index: db_handler.add_new_players(db, [f"{new_players[index]} (bulk)"]),
+            setup=lambda index: db["Players"].delete_one({"name": new_players[index]}),
+            rounds=WRITE_ROUNDS
+        )),
+    ]
+    db["Players"].delete_many({"name": {"$regex": "^benchmark player "}})
+    return results
+
+def benchmark_selection(games_count):
+    """
+    Measures choose_winning_game and make_list_printable.
+
+    Parameters:
+        games_count (int): The number of games on the wheel.
+
+    Returns:
+        List: (function name, timing statistics) tuples.
+    """
+    rng = random.Random(0)
+    games = [
+        Game(name, "DK", rng.randint(1, 100)) for name in make_game_names(games_count)
+    ]
+    game_names = [f" {game.name}\n" for game in games]
+    return [
+        ("choose_winning_game", measure(lambda _: choose_winning_game(games, rng))),
+        ("make_list_printable", measure(
+            lambda _: discord_bot.make_list_printable(game_names)
+        )),
+    ]
+
+class FakeAuthor:
+    """
+    This class represents the author of a fake Discord message.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+class FakeChannel:
+    """
+    This class represents a fake Discord channel, keeping the last sent message.
+    """
+
+    def __init__(self):
+        self.last_message = None
+
+    async def send(self, content):
+        """
+        Keeps the sent message instead of sending it.
+        """
+        self.last_message = content
+
+class FakeMessage:
+    """
+    This class represents a fake Discord message with the attributes the commands use.
+    """
+
+    def __init__(self, content, author, channel):
+        self.content = content
+        self.author = author
+        self.channel = channel
+
+def benchmark_command_dispatch(storage):
+    """
+    Measures the dispatch of the bot commands, driven by fake Discord messages,
+    from parsing the message to sending the reply (on a fake channel).
+
+    The messages are dispatched by the command router of discord_bot, on_message
+    only adds a comparison of the author with the logged in user of the Discord client.
+
+    Parameters:
+        storage (StorageBackend): A backend filled by create_benchmark_backend,
+            used by the commands while the benchmark runs.
+
+    Returns:
+        List: (message, timing statistics) tuples.
+    """
+    author = FakeAuthor("player0")
+    channel = FakeChannel()
+    game = storage.get_list_of_games()[0]
+
+    def make_dispatch(loop, content):
+        message = FakeMessage(content, author, channel)
+        return lambda _: loop.run_until_complete(discord_bot.router.dispatch(message))
+
+    set_storage_backend(storage)
+    loop = asyncio.new_event_loop()
+    try:
+        return [
+            (content, measure(make_dispatch(loop, content), rounds=rounds))
+            for content, rounds in (
+                ("ahoj", None),
+                ("!games", None),
+                ("!mygames", None),
+                (f"!mygames add {game}", None),
+                ("!games add Benchmark game", 1),
+                ("!games remove Benchmark game", 1),
+                ("!stats", None),
+            )
+        ]
+    finally:
+        loop.run_until_complete(loop.shutdown_default_executor())
+        loop.close()
+        set_storage_backend(None)
+
+def run_suite(catalog_sizes=CATALOG_SIZES, backends=BACKENDS, report=print, mongo_uri=None):
+    """
+    Runs the whole benchmark suite.
+
+    Parameters:
+        catalog_sizes (Iterable, optional): The numbers of games in the catalog.
+        backends (Iterable, optional): The names of the measured storage backends.
+        report (callable, optional): Called with every result as it's measured.
+        mongo_uri (string, optional): The connection string of a real MongoDB server
+            the mongo backend is measured on. Defaults to the mongomock stand-in.
+
+    Returns:
+        List: Dictionaries with the `group`, `name`, `backend` (None when the benchmark
+            doesn't use any) and `size` of the benchmark and its timing statistics.
+    """
+    results = []
+
+    def add_results(group, backend_name, size, measured):
+        for name, stats in measured:
+            result = {"group": group, "name": name, "backend": backend_name, "size": size}
+            result.update(stats)
+            results.append(result)
+            report(result)
+
+    mongo_client = MongoClient(mongo_uri) if mongo_uri and "mongo" in backends else None
+    for size in catalog_sizes:
+        add_results("selection", None, size, benchmark_selection(size))
+        for backend_name in backends:
+            if backend_name == "mongo" and mongo_client is None \
+                    and size > MONGO_STAND_IN_MAX_GAMES:
+                print(f"Skipping the mongo backend at {size} games, set MONGODB_BENCHMARK_URI "
+                      "to measure it on a real server.", flush=True)
+                continue
+            storage = create_benchmark_backend(backend_name, size, mongo_client)
+            add_results("storage", backend_name, size, benchmark_storage(storage))
+            if backend_name == "mongo":
+                add_results("db_handler", backend_name, size, benchmark_db_handler(storage))
+            add_results("commands", backend_name, size, benchmark_command_dispatch(storage))
+            storage.close()
+            if backend_name == "mongo" and mongo_client is not None:
+                mongo_client.drop_database(storage.db.name)
+    if mongo_client is not None:
+        mongo_client.close()
+    return results
+
+def _get_result_key(result):
+    """
+    Returns the key identifying the benchmark of a result across runs.
+    """
+    return (result["group"], result["name"], result["backend"], result["size"])
+
+def compare_results(baseline_results, results):
+    """
+    Compares the results with the results of a baseline run.
+
+    Parameters:
+        baseline_results (List): The results of the baseline run.
+        results (List): The results of this run.
+
+    Returns:
+        List: (result, baseline result, ratio) tuples of the benchmarks measured by both runs,
+            where the ratio is the median time of this run divided by the baseline one.
+    """
+    baseline = {_get_result_key(result): result for result in baseline_results}
+    comparison = []
+    for result in results:
+        baseline_result = baseline.get(_get_result_key(result))
+        if baseline_result is None or baseline_result["median_ms"] == 0:
+            continue
+        comparison.append(
+            (result, baseline_result, result["median_ms"] / baseline_result["median_ms"])
+        )
+    return comparison
+
+def find_regressions(comparison, max_regression, min_checked_ms=MIN_CHECKED_MS):
+    """
+    Finds the benchmarks that got slower than allowed.
+
+    Parameters:
+        comparison (List): The output of compare_results.
+        max_regression (float): The allowed ratio of the median times, like 1.5.
+        min_checked_ms (float, optional): Benchmarks faster than this in the baseline
+            aren't checked, their timings are mostly noise. Defaults to MIN_CHECKED_MS.
+
+    Returns:
+        List: (result, ratio) tuples of the regressed benchmarks.
+    """
+    return [
+        (result, ratio) for result, baseline_result, ratio in comparison
+        if ratio > max_regression and baseline_result["median_ms"] >= min_checked_ms
+    ]
+
+def _format_result(result):
+    """
+    Formats a result as a single line.
+    """
+    return (f"{result['group']:>10} {result['backend'] or '-':>7} {result['size']:>7} "
+            f"{result['median_ms']:>10.4f} {result['rounds']:>7}  {result['name']}")
+
+def main():
+    """
+    The main entry point of the script.
+
+    Runs the suite, prints the median time of every benchmark and saves the results as JSON.
+    With a baseline JSON file, prints the change of every benchmark and exits with
+    status code 1 when any of them got slower than the allowed regression.
+
+    Returns:
+        None
+    """
+    parser = argparse.ArgumentParser(description="Wheel of Luck benchmark suite.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(CATALOG_SIZES),
+                        help="Numbers of games in the catalog.")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS,
+                        help="Measured storage backends.")
+    parser.add_argument("--output", default="benchmark_results.json",
+                        help="The JSON file the results are saved to.")
+    parser.add_argument("--baseline",
+                        help="A JSON file with the results of a previous run to compare with.")
+    parser.add_argument("--mongo-uri",
+                        default=get_optional_env_var_value("MONGODB_BENCHMARK_URI", ""),
+                        help="A MongoDB server the mongo backend is measured on, at all "
+                             "the sizes. Defaults to MONGODB_BENCHMARK_URI, or to mongomock "
+                             f"up to {MONGO_STAND_IN_MAX_GAMES} games when it isn't set.")
+    parser.add_argument("--max-regression", type=float,
+                        help="Fail when a benchmark is this many times slower than "
+                             "in the baseline run (like 1.5).")
+    args = parser.parse_args()
+
+    print(f"{'group':>10} {'backend':>7} {'size':>7} {'median ms':>10} {'rounds':>7}  benchmark")
+    results = run_suite(args.sizes, args.backends,
+                        report=lambda result: print(_format_result(result), flush=True),
+                        mongo_uri=args.mongo_uri or None)
+
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump({
+            "created": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "mongo": "server" if args.mongo_uri else "mongomock",
+            "results": results
+        }, file, indent=2)
+    print(f"Results saved to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            baseline = json.load(file)
+        baseline_results = baseline["results"]
+        print()
+        print(f"Compared with {args.baseline} (ratio of the median times)")
+        if baseline.get("mongo", "mongomock") != ("server" if args.mongo_uri else "mongomock"):
+            # A real server and the stand-in aren't comparable
+            print("The baseline measured the mongo backend on a different MongoDB, "
+                  "its results aren't compared.")
+            baseline_results = [
+                result for result in baseline_results if result["backend"] != "mongo"
+            ]
+        comparison = compare_results(baseline_results, results)
+        for result, _, ratio in comparison:
+            print(f"{ratio:>6.2f}x {_format_result(result)}")
+        if args.max_regression is not None:
+            regressions = find_regressions(comparison, args.max_regression)
+            for result, ratio in regressions:
+                print(f"Regression {ratio:.2f}x: {_format_result(result)}")
+            if regressions:
+                print(f"{len(regressions)} benchmarks are more than "
+                      f"{args.max_regression:g} times slower than the baseline.")
+                sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+bot_bridge.py
+
+Module containing the definition of the BotBridge class, which lets the application's
+event loop await coroutines running on the Discord bot's thread.
+
+Unlike calling `future.result()` on the future from `asyncio.run_coroutine_threadsafe`,
+awaiting the bridge doesn't block the application's event loop. Every call has a timeout,
+waits until the bot is logged in and the number of pending calls is limited,
+so a slow or unavailable Discord shows up as an error instead of a frozen application.
+"""
+
+import time
+import asyncio
+
+# Default time limit of a single call in seconds (including waiting for the bot to log in)
+DEFAULT_TIMEOUT = 15.0
+# Maximum number of calls waiting for the bot at the same time
+MAX_PENDING_CALLS = 8
+# How often the readiness of the bot is checked while waiting for it, in seconds
+READY_POLL_INTERVAL = 0.05
+
+class BotBridgeError(Exception):
+    """
+    Raised when a call to the Discord bot can't be made, fails or doesn't finish in time.
+    """
+
+class BotBridge:
+    """
+    This class represents a bridge from the application's event loop
+    to the event loop of the Discord bot thread.
+    """
+
+    def __init__(self, get_bot_loop, ready_event, timeout=DEFAULT_TIMEOUT,
+                 max_pending=MAX_PENDING_CALLS):
+        """
+        Initializes the BotBridge class.
+
+        Parameters:
+            get_bot_loop (callable): Returns the event loop of the Discord bot,
+                only called once the bot is ready.
+            ready_event (threading.Event): Set while the bot is logged in.
+            timeout (float, optional): Default time limit of a call in seconds.
+            max_pending (int, optional): Maximum number of calls waiting at the same time.
+        """
+        self._get_bot_loop = get_bot_loop
+        self._ready_event = ready_event
+        self.timeout = timeout
+        self.max_pending = max_pending
+        self.pending = 0
+        # Keep references to the posted tasks, so they aren't garbage collected
+        self._posted_tasks = set()
+
+    @property
+    def is_ready(self):
+        """
+        bool: Whether the Discord bot is logged in.
+        """
+        return self._ready_event.is_set()
+
+    async def _wait_until_ready(self, deadline):
+        """
+        Waits until the bot is logged in without blocking the event loop.
+        """
+        while not self._ready_event.is_set():
+            if time.monotonic() >= deadline:
+                raise BotBridgeError("The Discord bot isn't logged in.")
+            await asyncio.sleep(READY_POLL_INTERVAL)
+
+    def _reserve(self, coroutine_function):
+        """
+        Counts a new pending call, failing when there are too many of them.
+        """
+        if self.pending >= self.max_pending:
+            raise BotBridgeError(
+                f"Discord call {coroutine_function.__name__} refused, "
+                f"too many pending calls ({self.pending})."
+            )
+        self.pending += 1
+
+    async def _run(self, coroutine_function, args, timeout):
+        """
+        Runs an already reserved call on the Discord bot's event loop.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        await self._wait_until_ready(deadline)
+        future = asyncio.run_coroutine_threadsafe(
+            coroutine_function(*args),
+            self._get_bot_loop()
+        )
+        try:
+            # On timeout the coroutine on the bot's loop is cancelled as well
+            return await asyncio.wait_for(
+                asyncio.wrap_future(future),
+                max(deadline - time.monotonic(), 0)
+            )
+        except asyncio.TimeoutError as error:
+            raise BotBridgeError(
+                f"Discord call {coroutine_function.__name__} didn't finish in {timeout} s."
+            ) from error
+        except Exception as error: # pylint: disable=broad-exception-caught
+            # Errors of Discord (like discord.HTTPException) mustn't crash the application
+            raise BotBridgeError(
+                f"Discord call {coroutine_function.__name__} failed: {error!r}"
+            ) from error
+
+    async def call(self, coroutine_function, *args, timeout=None):
+        """
+        Runs a coroutine function on the Discord bot's event loop and awaits its result.
+
+        Parameters:
+            coroutine_function (Coroutine function): The function to be run, like
+                `discord_bot.send_message`.
+            *args: Arguments passed to `coroutine_function`.
+            timeout (float, optional): The time limit in seconds. Defaults to `self.timeout`.
+
+        Returns:
+            Any: Whatever `coroutine_function` returns.
+
+        Raises:
+            BotBridgeError: When there are too many pending calls, the bot isn't logged in,
+                the call doesn't finish in time or it fails.
+        """
+        self._reserve(coroutine_function)
+        try:
+            return await self._run(coroutine_function, args, timeout)
+        finally:
+            self.pending -= 1
+
+    def post(self, coroutine_function, *args, timeout=None):
+        """
+        Runs a coroutine function on the Discord bot's event loop without waiting for it.
+        Failures are printed out.
+
+        Parameters:
+            coroutine_function (Coroutine function): The function to be run.
+            *args: Arguments passed to `coroutine_function`.
+            timeout (float, optional): The time limit in seconds. Defaults to `self.timeout`.
+
+        Returns:
+            asyncio.Task or None: The task of the call, None when it was dropped
+                because there were too many pending calls.
+        """
+        try:
+            self._reserve(coroutine_function)
+        except BotBridgeError as error:
+            print(error)
+            return None
+
+        async def run():
+            try:
+                await self._run(coroutine_function, args, timeout)
+            except BotBridgeError as error:
+                print(error)
+            finally:
+                self.pending -= 1
+
+        task = asyncio.create_task(run())
+        self._posted_tasks.add(task)
+        task.add_done_callback(self._posted_tasks.discard)
+        return task
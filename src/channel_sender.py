@@ -0,0 +1,256 @@
+"""
+channel_sender.py
+
+Module containing the definition of the ChannelSender class, an outbound message queue
+of a single Discord channel.
+
+Messages are sent one after another, keeping under the channel's rate limit ahead of time
+instead of waiting for Discord to reject them. Plain text messages waiting in the queue
+are merged into a single message up to Discord's message length limit. When the queue
+is full, callers wait until there is room in it (back-pressure). When the queue is closed
+or its worker is cancelled, the callers still waiting get a ChannelSenderClosedError.
+"""
+
+import time
+import asyncio
+import contextlib
+from collections import deque
+
+# Discord's maximum number of characters of a single message
+MAX_MESSAGE_LENGTH = 2000
+# Discord allows about 5 messages per 5 seconds in a single channel
+RATE_LIMIT_MESSAGES = 5
+RATE_LIMIT_PERIOD = 5.0
+# Maximum number of messages waiting in the queue
+MAX_QUEUED_MESSAGES = 20
+
+class ChannelSenderClosedError(Exception):
+    """
+    Raised to the callers whose messages weren't sent because the queue was closed.
+    """
+
+class OutgoingMessage:
+    """
+    This class represents a message waiting in the queue.
+    """
+
+    def __init__(self, content, coalesce, future):
+        """
+        Initializes the OutgoingMessage class.
+
+        Parameters:
+            content (string): The text of the message.
+            coalesce (bool): Whether the message may be merged with other messages.
+            future (asyncio.Future): Resolved with the Discord ID of the sent message.
+        """
+        self.content = content
+        self.coalesce = coalesce
+        self.future = future
+        self.enqueued_at = time.monotonic()
+
+class ChannelSender:
+    """
+    This class represents a rate limited, coalescing outbound queue of a Discord channel.
+    """
+
+    def __init__(self, send_function, max_queued=MAX_QUEUED_MESSAGES,
+                 rate_limit_messages=RATE_LIMIT_MESSAGES, rate_limit_period=RATE_LIMIT_PERIOD):
+        """
+        Initializes the ChannelSender class.
+
+        Parameters:
+            send_function (Coroutine function): Sends a text to the channel and returns
+                the sent discord.Message, like `channel.send`.
+            max_queued (int, optional): Maximum number of messages waiting in the queue.
+            rate_limit_messages (int, optional): Number of messages allowed per period.
+            rate_limit_period (float, optional): The rate limit period in seconds.
+        """
+        self._send_function = send_function
+        self._queue = asyncio.Queue(maxsize=max_queued)
+        self._worker = None
+        # A message taken from the queue that didn't fit into the last batch
+        self._carried_message = None
+        self.rate_limit_period = rate_limit_period
+        # Times of the recent sends, the oldest one decides when the next send is allowed
+        self._send_times = deque(maxlen=rate_limit_messages)
+        self.sent_messages = 0
+        self.coalesced_messages = 0
+        self.rate_limit_waits = 0
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+        self.is_closed = False
+
+    async def send(self, content, coalesce=True):
+        """
+        Queues a message and waits until it is sent.
+
+        Parameters:
+            content (string): The text of the message.
+            coalesce (bool, optional): Whether the message may be merged with other
+                queued messages. Messages whose ID matters on its own (like a message
+                collecting reactions) shouldn't be coalesced.
+
+        Returns:
+            int: Discord ID of the sent message (shared by all the merged messages).
+
+        Raises:
+            ChannelSenderClosedError: When the queue was closed before the message was sent.
+        """
+        if self.is_closed:
+            raise ChannelSenderClosedError("The channel's message queue is closed.")
+        future = asyncio.get_running_loop().create_future()
+        # Waits while the queue is full
+        await self._queue.put(OutgoingMessage(content, coalesce, future))
+        if self.is_closed:
+            # Closed while waiting for room in the queue
+            self._fail_waiting_messages()
+        elif self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+        return await future
+
+    async def close(self):
+        """
+        Stops sending the queued messages, their callers get a ChannelSenderClosedError.
+
+        Returns:
+            None
+        """
+        self.is_closed = True
+        if self._worker is not None and not self._worker.done():
+            self._worker.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._worker
+        self._fail_waiting_messages()
+
+    def _fail_waiting_messages(self, messages=()):
+        """
+        Fails the given messages and every message left in the queue, so their callers
+        don't wait for a send that never comes.
+        """
+        messages = list(messages)
+        while self._has_next_message():
+            messages.append(self._next_message())
+        for message in messages:
+            if not message.future.done():
+                message.future.set_exception(
+                    ChannelSenderClosedError("The channel's message queue was closed.")
+                )
+
+    async def _wait_for_rate_limit(self):
+        """
+        Waits until sending another message doesn't exceed the rate limit.
+        """
+        if len(self._send_times) < self._send_times.maxlen:
+            return
+        delay = self._send_times[0] + self.rate_limit_period - time.monotonic()
+        if delay > 0:
+            self.rate_limit_waits += 1
+            await asyncio.sleep(delay)
+
+    def _next_message(self):
+        """
+        Takes the next message, the one left over from the last batch goes first.
+        """
+        if self._carried_message is not None:
+            message, self._carried_message = self._carried_message, None
+            return message
+        return self._queue.get_nowait()
+
+    def _has_next_message(self):
+        """
+        Checks whether there is another message to be sent.
+        """
+        return self._carried_message is not None or not self._queue.empty()
+
+    def _collect_batch(self, first_message):
+        """
+        Takes the queued messages that can be merged with the first message.
+        The first message that can't be merged is left for the next batch.
+
+        Returns:
+            list[OutgoingMessage]: The messages to be sent as one.
+        """
+        batch = [first_message]
+        if not first_message.coalesce:
+            return batch
+        length = len(first_message.content)
+        while self._has_next_message():
+            message = self._next_message()
+            if message.future.done():
+                # The caller isn't waiting anymore
+                continue
+            merged_length = length + 1 + len(message.content)
+            if not message.coalesce or merged_length > MAX_MESSAGE_LENGTH:
+                self._carried_message = message
+                break
+            batch.append(message)
+            length = merged_length
+        return batch
+
+    async def _run(self):
+        """
+        Sends the queued messages until the queue is empty.
+        """
+        # The messages taken from the queue and not answered yet
+        batch = []
+        try:
+            while self._has_next_message():
+                batch = [self._next_message()]
+                await self._send_batch(batch)
+        except asyncio.CancelledError:
+            self._fail_waiting_messages(batch)
+            raise
+
+    async def _send_batch(self, batch):
+        """
+        Sends the first message of the batch merged with the queued messages,
+        which are added to the batch.
+        """
+        first_message = batch[0]
+        if first_message.future.done():
+            # The caller isn't waiting anymore
+            return
+        # More messages can queue up (and be merged) while waiting for the rate limit
+        await self._wait_for_rate_limit()
+        batch[:] = self._collect_batch(first_message)
+
+        self._send_times.append(time.monotonic())
+        try:
+            sent_message = await self._send_function(
+                "\n".join(message.content for message in batch)
+            )
+        except Exception as error: # pylint: disable=broad-exception-caught
+            # Pass the error to the callers instead of stopping the queue
+            for message in batch:
+                if not message.future.done():
+                    message.future.set_exception(error)
+            return
+
+        now = time.monotonic()
+        self.sent_messages += 1
+        self.coalesced_messages += len(batch) - 1
+        for message in batch:
+            latency = now - message.enqueued_at
+            self._latency_total += latency
+            self._latency_max = max(self._latency_max, latency)
+            if not message.future.done():
+                message.future.set_result(sent_message.id)
+
+    def get_stats(self):
+        """
+        Returns the queue metrics.
+
+        Returns:
+            Dictionary: `queue_depth`, `sent_messages` (Discord messages actually sent),
+                `coalesced_messages`, `rate_limit_waits` and average and maximal
+                `latency_ms` from queuing to sending a message.
+        """
+        delivered = self.sent_messages + self.coalesced_messages
+        return {
+            "queue_depth": self._queue.qsize() + (self._carried_message is not None),
+            "sent_messages": self.sent_messages,
+            "coalesced_messages": self.coalesced_messages,
+            "rate_limit_waits": self.rate_limit_waits,
+            "avg_latency_ms": self._latency_total / max(delivered, 1) * 1000,
+            "max_latency_ms": self._latency_max * 1000
+        }
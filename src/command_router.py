@@ -0,0 +1,166 @@
+"""
+command_router.py
+
+Module containing the definition of the CommandRouter class, which dispatches
+Discord chat commands like "!games" or "!mygames add NázevHry" to their handlers.
+
+Commands are registered by a decorator and looked up in dictionaries by their words,
+so the cost of dispatching doesn't grow with the number of commands. Messages that
+aren't commands are rejected after a single prefix check.
+"""
+
+import time
+
+class CommandStats:
+    """
+    This class represents latency metrics of a single command.
+    """
+
+    def __init__(self):
+        """
+        Initializes the CommandStats class.
+        """
+        self.calls = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+
+    def record(self, elapsed):
+        """
+        Records a single handler run.
+
+        Parameters:
+            elapsed (float): The time the handler took in seconds.
+
+        Returns:
+            None
+        """
+        self.calls += 1
+        self.total_time += elapsed
+        self.max_time = max(self.max_time, elapsed)
+
+    def to_dict(self):
+        """
+        Returns the metrics as a dictionary.
+
+        Returns:
+            Dictionary: `calls`, `avg_ms` and `max_ms` of the command.
+        """
+        avg_time = self.total_time / self.calls if self.calls else 0.0
+        return {
+            "calls": self.calls,
+            "avg_ms": avg_time * 1000,
+            "max_ms": self.max_time * 1000
+        }
+
+class CommandRouter:
+    """
+    This class represents a registry of chat commands and their handlers.
+
+    A command consists of a name and an optional subcommand ("games", "games add"),
+    the rest of the message is passed to the handler as its argument.
+    """
+
+    def __init__(self, prefix="!"):
+        """
+        Initializes the CommandRouter class.
+
+        Parameters:
+            prefix (string, optional): The symbol every command starts with. Defaults to "!".
+        """
+        self.prefix = prefix
+        # Command name -> {subcommand name (or None) -> (handler, takes_argument)}
+        self._commands = {}
+        # Command path like "games add" -> CommandStats
+        self._stats = {}
+
+    def command(self, path, takes_argument=False):
+        """
+        A decorator registering a coroutine function as the handler of a command.
+
+        The handler is called with the Discord message and the argument string
+        (empty for commands without an argument).
+
+        Parameters:
+            path (string): The command without the prefix, like "games" or "games add".
+            takes_argument (bool, optional): Whether the command requires an argument.
+
+        Returns:
+            Function: The decorator.
+        """
+        name, _, subcommand = path.partition(" ")
+
+        def decorator(handler):
+            self._commands.setdefault(name, {})[subcommand or None] = (handler, takes_argument)
+            self._stats[path] = CommandStats()
+            return handler
+        return decorator
+
+    def parse(self, content):
+        """
+        Finds the handler of a command message and parses its argument.
+
+        Parameters:
+            content (string): The content of the Discord message.
+
+        Returns:
+            tuple or None: A tuple containing:
+                - string: The command path.
+                - Coroutine function: The handler.
+                - string: The argument, stripped of white characters.
+            None when the message isn't a known command.
+        """
+        if not content.startswith(self.prefix):
+            return None
+
+        name, _, rest = content[len(self.prefix):].partition(" ")
+        subcommands = self._commands.get(name)
+        if subcommands is None:
+            return None
+
+        subcommand, _, argument = rest.partition(" ")
+        if subcommand in subcommands:
+            path = f"{name} {subcommand}"
+            handler, takes_argument = subcommands[subcommand]
+        elif None in subcommands:
+            path = name
+            handler, takes_argument = subcommands[None]
+            argument = rest
+        else:
+            return None
+
+        argument = argument.strip()
+        # Commands either require an argument or don't accept any
+        if takes_argument != bool(argument):
+            return None
+        return path, handler, argument
+
+    async def dispatch(self, message):
+        """
+        Runs the handler of a command message and records its latency.
+
+        Parameters:
+            message (discord.Message): The Discord message.
+
+        Returns:
+            Bool: Indication whether the message was a known command.
+        """
+        parsed_command = self.parse(message.content)
+        if parsed_command is None:
+            return False
+
+        path, handler, argument = parsed_command
+        start = time.perf_counter()
+        try:
+            await handler(message, argument)
+        finally:
+            self._stats[path].record(time.perf_counter() - start)
+        return True
+
+    def get_stats(self):
+        """
+        Returns the latency metrics of every registered command.
+
+        Returns:
+            Dictionary: Command path -> dictionary with `calls`, `avg_ms` and `max_ms`.
+        """
+        return {path: stats.to_dict() for path, stats in self._stats.items()}
@@ -0,0 +1,205 @@
+"""
+db_client.py
+
+Module owning the single MongoClient shared by the whole process.
+
+The client (with its connection pool) is created on first use and connects lazily,
+on the first database operation, so every module of the process shares one pool
+and a single TLS/SRV handshake.
+
+Main Functions:
+- get_client_options: Gets the pool, timeout and compression options from the settings.
+- get_client: Returns the shared MongoClient, creating it on first use.
+- get_database: Returns a database of the shared MongoClient.
+- get_pool_metrics: Returns the connection pool metrics.
+- close_client: Closes the shared MongoClient.
+
+Dependencies:
+- Requires pymongo for MongoDB interactions and its monitoring listeners.
+- Requires env_var_loader to load environment variables.
+"""
+
+import threading
+from pymongo import monitoring
+from pymongo.mongo_client import MongoClient
+from pymongo.server_api import ServerApi
+from env_var_loader import get_env_var_value, get_optional_env_var_value
+
+DATABASE_NAME = "WheelOfLuck"
+# Client options and the environment variables setting them, with their defaults
+CLIENT_OPTION_SETTINGS = (
+    # Maximum number of connections of the pool, one per concurrent database call is enough
+    ("maxPoolSize", "DB_MAX_POOL_SIZE", "20", int),
+    ("minPoolSize", "DB_MIN_POOL_SIZE", "0", int),
+    # Timeouts in milliseconds
+    ("serverSelectionTimeoutMS", "DB_SERVER_SELECTION_TIMEOUT_MS", "10000", int),
+    ("connectTimeoutMS", "DB_CONNECT_TIMEOUT_MS", "10000", int),
+    ("socketTimeoutMS", "DB_SOCKET_TIMEOUT_MS", "20000", int),
+    # How long a call waits for a free connection of the pool
+    ("waitQueueTimeoutMS", "DB_WAIT_QUEUE_TIMEOUT_MS", "5000", int),
+    # Wire protocol compressors in the order of preference, zlib needs no extra package
+    ("compressors", "DB_COMPRESSORS", "zlib", str),
+)
+
+def get_client_options():
+    """
+    Gets the pool, timeout and compression options of the client from the settings.
+
+    Returns:
+        Dictionary: The MongoClient keyword arguments by their name.
+    """
+    return {
+        option: convert(get_optional_env_var_value(env_var_name, default))
+        for option, env_var_name, default, convert in CLIENT_OPTION_SETTINGS
+    }
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """
+    This class represents the metrics of the connection pool, collected by pymongo's
+    connection pool monitoring events.
+    """
+
+    def __init__(self):
+        """
+        Initializes the PoolMetrics class.
+        """
+        self._lock = threading.Lock()
+        self.connections_created = 0
+        self.connections_closed = 0
+        self.checked_out = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.pool_clears = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def _record_wait(self, event):
+        """
+        Records how long a checkout waited for a connection.
+        """
+        # The duration of the checkout is in seconds (pymongo 4.7+)
+        duration = getattr(event, "duration", None) or 0.0
+        self._wait_total += duration
+        self._wait_max = max(self._wait_max, duration)
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pool_clears += 1
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        with self._lock:
+            self.connections_created += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.connections_closed += 1
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.checkout_failures += 1
+            self._record_wait(event)
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self._record_wait(event)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out -= 1
+
+    def get_stats(self):
+        """
+        Returns the connection pool metrics.
+
+        Returns:
+            Dictionary: `open_connections`, `checked_out` connections, `checkouts`,
+                `checkout_failures`, `pool_clears` and average and maximal
+                `checkout_wait_ms`.
+        """
+        with self._lock:
+            attempts = self.checkouts + self.checkout_failures
+            return {
+                "open_connections": self.connections_created - self.connections_closed,
+                "checked_out": self.checked_out,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "pool_clears": self.pool_clears,
+                "avg_checkout_wait_ms": self._wait_total / max(attempts, 1) * 1000,
+                "max_checkout_wait_ms": self._wait_max * 1000
+            }
+
+pool_metrics = PoolMetrics()
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """
+    Returns the shared MongoClient, creating it on first use.
+    The client connects on the first database operation, not when created.
+
+    Returns:
+        pymongo.mongo_client.MongoClient: The client shared by the whole process.
+    """
+    global _client # pylint: disable=global-statement
+    with _client_lock:
+        if _client is None:
+            _client = MongoClient(
+                get_env_var_value("DB_CONNECTION_STRING"),
+                server_api=ServerApi('1'),
+                connect=False,
+                event_listeners=[pool_metrics],
+                **get_client_options()
+            )
+        return _client
+
+def get_database(name=DATABASE_NAME):
+    """
+    Returns a database of the shared MongoClient.
+
+    Parameters:
+        name (string, optional): The name of the database. Defaults to DATABASE_NAME.
+
+    Returns:
+        pymongo.database.Database: The database.
+    """
+    return get_client()[name]
+
+def get_pool_metrics():
+    """
+    Returns the connection pool metrics of the shared MongoClient.
+
+    Returns:
+        Dictionary: See PoolMetrics.get_stats.
+    """
+    return pool_metrics.get_stats()
+
+def close_client():
+    """
+    Closes the shared MongoClient and its connections, the next get_client creates a new one.
+
+    Returns:
+        None
+    """
+    global _client # pylint: disable=global-statement
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
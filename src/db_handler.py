@@ -5,41 +5,131 @@ This module contains database handling functions.
 
 Main Functions:
 - connect_to_db: Establishes a connection to the MongoDB database.
+- ensure_indexes: Creates the indexes the database operations rely on.
+- insert_log_into_database: Logs the result of the last spin.
+- wait_for_logs: Waits until the background log writer writes all the logs.
 - get_list_of_games: Retrieves a list of all games from the database.
+- is_game_in_game_list: Checks whether a game is in the list of games.
 - get_list_of_user_games: Retrieves a list of games associated with a specific user.
+- get_common_games_of_players: Retrieves the games that all the given users have in common.
 - add_game_to_user_game_list: Adds a game to a user's list of games in the database.
 - remove_game_from_user_game_list: Removes a game from a user's list of games in the database.
 
 Dependencies:
 - Requires pymongo for MongoDB interactions.
-- Requires env_var_loader to load environment variables.
+- Requires db_client for the MongoClient shared by the whole process.
+- Requires game_catalog to cache the list of games in memory.
+- Requires last_spin_state to cache the last spin in memory.
+- Requires stats_handler to keep the statistics up to date with the logs.
+- Requires instrumentation to record the latency of the database calls.
 """
 
-from datetime import datetime
-from pymongo.mongo_client import MongoClient
-from pymongo.server_api import ServerApi
-from env_var_loader import get_env_var_value
-
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure, PyMongoError
+from db_client import get_database
+from game_catalog import get_game_catalog
+from instrumentation import timed
+from last_spin_state import get_last_spin_state
+from stats_handler import STATS_SORT, record_log_stats
+
+# Writes the logs and their statistics in the background, in the order of the W/L clicks.
+# Its thread is joined when the interpreter exits, so no submitted log is lost.
+_log_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="log_writer")
+
+# Names of the databases whose indexes were already ensured by connect_to_db
+_indexed_databases = set()
+_indexed_databases_lock = threading.Lock()
+
+# Indexes of every collection, created by ensure_indexes
+INDEXES = {
+    "Games": [
+        IndexModel([("name", ASCENDING)], unique=True)
+    ],
+    "Players": [
+        IndexModel([("name", ASCENDING)], unique=True)
+    ],
+    "Logs": [
+        # A spin is logged only once, even by two racing writers
+        IndexModel([("game_date", ASCENDING), ("game", ASCENDING)], unique=True),
+        IndexModel([("game_date", DESCENDING)]),
+        IndexModel([("game", ASCENDING), ("game_date", DESCENDING)]),
+        IndexModel([("players", ASCENDING), ("game_date", DESCENDING)])
+    ],
+    "Stats": [
+        IndexModel([("kind", ASCENDING), ("key", ASCENDING)], unique=True),
+        IndexModel([("kind", ASCENDING)] + STATS_SORT)
+    ]
+}
+
+@timed()
 def connect_to_db():
     """
     Establishes a connection to the MongoDB database.
 
+    All the calls share a single MongoClient (and its connection pool) from db_client,
+    the indexes are ensured only by the first call.
+
     Returns:
         pymongo.mongo_client.MongoClient:
             A MongoClient instance connected to the specified database.
     """
-    db_connection_string = get_env_var_value("DB_CONNECTION_STRING")
-    # Create a new client and connect to the server
-    client = MongoClient(db_connection_string, server_api=ServerApi('1'))
-    # Connect to database namespace
-    return client['WheelOfLuck']
+    db = get_database()
+    with _indexed_databases_lock:
+        if db.name not in _indexed_databases:
+            ensure_indexes(db)
+            _indexed_databases.add(db.name)
+    return db
+
+def ensure_indexes(db):
+    """
+    Creates the indexes the database operations rely on.
+
+    Creating an index that already exists does nothing, so this is safe to call on every start.
+    The unique indexes make the upserts in this module atomic, two racing commands
+    can't create two documents with the same name.
+
+    Parameters:
+        db (pymongo.mongo_client.MongoClient):
+            An instance of a MongoClient connected to the specified database.
+
+    Returns:
+        None
+    """
+    for collection_name, indexes in INDEXES.items():
+        try:
+            db[collection_name].create_indexes(indexes)
+        except OperationFailure as error:
+            # Most likely there already are duplicate names in the collection
+            print(f"Indexes on {collection_name} couldn't be created: {error}")
+
+def _upsert_one(collection, query, update):
+    """
+    Runs an upsert, retrying once when a concurrent upsert inserted the same document first.
+
+    Parameters:
+        collection (pymongo.collection.Collection): The MongoDB collection.
+        query (Dictionary): The filter selecting the document.
+        update (Dictionary): The update operations.
+
+    Returns:
+        pymongo.results.UpdateResult: The result of the update.
+    """
+    try:
+        return collection.update_one(query, update, upsert=True)
+    except DuplicateKeyError:
+        # The document exists now, so the retry is a plain update
+        return collection.update_one(query, update, upsert=True)
 
+@timed()
 def get_last_spin_string(db):
     """
     Retrieves the whole record of the last spin collection from MongoDB.
     
     Makes the record in a string form that is easily printable for the user,
-    so the user can understand it. 
+    so the user can understand it. The record is read from the database only once,
+    then it is served from memory.
 
     Parameters:
         db (pymongo.mongo_client.MongoClient):
@@ -49,13 +139,9 @@ def get_last_spin_string(db):
         String: Contains every relevant attribute of the last spin record
             (`last_category`, `last_game`, `last_game_date`) in an easily readable form.
     """
-    collection = db['LastSpin']
-    entry = collection.find_one()
-    formatted_time = entry['last_game_date'].strftime("%d/%m/%Y %H:%M:%S")
-
-    return str(entry['players']) + " - " + entry['last_game'] + \
-        " [" + formatted_time + "]"
+    return get_last_spin_state(db).get_string()
 
+@timed()
 def update_last_spin(db, game, players):
     """
     Updates the last spin in the MongoDB collection.
@@ -72,24 +158,9 @@ def update_last_spin(db, game, players):
     Returns:
         None
     """
-    # Create the time of the spin
-    time = datetime.now()
-
-    # Select the correct collection from the DB and create the new data values to enter
-    collection = db['LastSpin']
-    new_values = { "$set": {
-        "last_game": game,
-        "last_game_date": time,
-        "players": players,
-        "is_inserted": False
-        }
-    }
-    # Get the single entry that will be updated
-    entry = collection.find_one()
-    id_filter = {'_id': entry['_id']}
-
-    collection.update_one(id_filter, new_values)
+    get_last_spin_state(db).update(game, players)
 
+@timed()
 def is_last_spin_inserted(db):
     """
     Checks whether the last spin in the DB was already inserted or not.
@@ -102,19 +173,23 @@ def is_last_spin_inserted(db):
             - bool: A boolean indicating whether the last spin was already inserted into the logs.
             - entry (dictionary): The last spin document.
     """
-    collection = db['LastSpin']
-    entry = collection.find_one()
-
-    if entry["is_inserted"]:
-        return True, entry
-    return False, entry
+    state = get_last_spin_state(db)
+    # Logs lost by a crash of the previous process are written again
+    _submit_logs(db, state.take_pending_logs())
+    return state.is_inserted()
 
+@timed()
 def insert_log_into_database(db, result):
     """
     Gets all information from the last spin in the database and inserts
     a new document with the `result` parameter. Only inserts when the last spin
     wasn't already inserted before.
 
+    The last spin is marked as inserted atomically, so even two processes
+    can't insert the same spin twice. The log is kept in the LastSpin document
+    by the same single write, the log itself and its statistics are written
+    by the background log writer (see wait_for_logs).
+
     Parameters:
         db (pymongo.mongo_client.MongoClient):
             An instance of a MongoClient connected to the specified database.
@@ -123,31 +198,56 @@ def insert_log_into_database(db, result):
     Returns:
         None
     """
-    is_inserted, entry = is_last_spin_inserted(db)
-    if not is_inserted:
-        new_values = { "$set": {
-            "is_inserted": True
-            }
-        }
-        id_filter = {'_id': entry['_id']}
-        db['LastSpin'].update_one(id_filter, new_values)
-    else:
-        return
+    state = get_last_spin_state(db)
+    _submit_logs(db, state.take_pending_logs())
+    log = state.mark_inserted(result)
+    if log is not None:
+        _submit_logs(db, [log])
+
+def _write_log(db, log):
+    """
+    Inserts a log and increments its statistics, then removes it from the pending logs.
+    Writing the same log again (after a crash) doesn't insert or count it twice:
+    the unique index on the date and the game lets only one upsert insert it,
+    the upsert losing a race is retried by _upsert_one and only matches the log.
+    """
+    try:
+        inserted = _upsert_one(
+            db["Logs"],
+            {"game_date": log["game_date"], "game": log["game"]},
+            {"$setOnInsert": dict(log)}
+        ).upserted_id is not None
+        if inserted:
+            record_log_stats(db, log)
+        get_last_spin_state(db).mark_logged(log)
+    except PyMongoError as error:
+        # The log stays pending and is written again by the next process
+        print(f"Log of {log['game']} couldn't be written: {error}")
+
+def _submit_logs(db, logs):
+    """
+    Hands the logs over to the background log writer.
+    """
+    for log in logs:
+        _log_writer.submit(_write_log, db, log)
 
-    collection = db['Logs']
-    post = {
-        "game_date": entry['last_game_date'],
-        "game": entry['last_game'],
-        "result": result,
-        "players": entry['players']
-    }
+def wait_for_logs():
+    """
+    Waits until the background log writer writes all the logs submitted so far.
 
-    collection.insert_one(post)
+    Returns:
+        None
+    """
+    _log_writer.submit(lambda: None).result()
 
+@timed()
 def get_list_of_games(db):
     """
     Retrieves a list of all games from the MongoDB database in alphabetically sorted order.
 
+    The games are served from the in-memory game catalog, the database is only
+    read when the catalog isn't loaded yet or has expired.
+
     Parameters:
         db (pymongo.mongo_client.MongoClient):
             An instance of a MongoClient connected to the specified database.
@@ -155,16 +255,27 @@ def get_list_of_games(db):
     Returns:
         List: A list of strings containing all game names (alphabetically sorted).
     """
-    games = []
-    collection = db["Games"]
+    return get_game_catalog(db).get_games(db)
 
-    for query in collection.find():
-        games.append(query["name"])
+@timed()
+def is_game_in_game_list(db, game):
+    """
+    Checks whether a game name is in the list of games in the database.
 
-    # Sort the games alphabetically
-    games.sort()
-    return games
+    The check is served from the in-memory game catalog, the database is only
+    read when the catalog isn't loaded yet or has expired.
+
+    Parameters:
+        db (pymongo.mongo_client.MongoClient):
+            An instance of a MongoClient connected to the specified database.
+        game (string): A name of the game.
+
+    Returns:
+        Bool: Indication whether the game is in the list of games.
+    """
+    return get_game_catalog(db).contains(db, game)
 
+@timed()
 def add_game_to_game_list(db, game):
     """
     Adds a game name to the list of games in the database.
@@ -175,18 +286,17 @@ def add_game_to_game_list(db, game):
         game (string): A name of the game.
 
     Returns:
-        Bool: Indication whether the game was removed or not.
+        Bool: Indication whether the game was added or not.
     """
-    collection = db["Games"]
-
-    # Check whether there already is a game with that name
-    count = collection.count_documents({"name": game})
-    if count != 0:
+    # Only inserts when there isn't a game with that name yet
+    result = _upsert_one(db["Games"], {"name": game}, {"$setOnInsert": {"name": game}})
+    if result.upserted_id is None:
         return False
 
-    collection.insert_one({"name": game})
+    get_game_catalog(db).add(game)
     return True
 
+@timed()
 def remove_game_from_game_list(db, game):
     """
     Removes a game name from a list of games in the database.
@@ -199,16 +309,14 @@ def remove_game_from_game_list(db, game):
     Returns:
         Bool: Indication whether the game was removed or not.
     """
-    collection = db["Games"]
-
-    # Check whether there already is a game with that name
-    count = collection.count_documents({"name": game})
-    if count == 0:
+    result = db["Games"].delete_one({"name": game})
+    if result.deleted_count == 0:
         return False
 
-    collection.delete_one({"name": game})
+    get_game_catalog(db).remove(game)
     return True
 
+@timed()
 def add_new_player(db, user_name):
     """
     Add a new player into the Players collection.
@@ -221,14 +329,14 @@ def add_new_player(db, user_name):
     Returns:
         Dictionary: Represents a new player document inserted in the DB.
     """
-    collection = db["Players"]
     new_document = {
         "name": user_name,
         "games": []
         }
-    collection.insert_one(new_document)
+    _upsert_one(db["Players"], {"name": user_name}, {"$setOnInsert": {"games": []}})
     return new_document
 
+@timed()
 def get_list_of_user_games(db, user_name):
     """
     Retrieves a list of all games from the MongoDB database in alphabetically sorted order.
@@ -251,9 +359,89 @@ def get_list_of_user_games(db, user_name):
     user_games.sort()
     return user_games
 
+@timed()
+def add_new_players(db, user_names):
+    """
+    Add multiple new players into the Players collection in a single round trip.
+
+    Parameters:
+        db (pymongo.mongo_client.MongoClient):
+            An instance of a MongoClient connected to the specified database.
+        user_names (List): Users Dicord names (not server nicks).
+
+    Returns:
+        None
+    """
+    if not user_names:
+        return
+    try:
+        db["Players"].insert_many(
+            [{"name": user_name, "games": []} for user_name in user_names],
+            ordered=False
+        )
+    except BulkWriteError as error:
+        # Players inserted by a concurrent command are fine, anything else isn't
+        if any(write_error["code"] != 11000 for write_error in error.details["writeErrors"]):
+            raise
+
+@timed()
+def get_libraries_of_players(db, user_names):
+    """
+    Retrieves the lists of games of the specified users by a single query.
+    Users that aren't in the database are left out.
+
+    Parameters:
+        db (pymongo.mongo_client.MongoClient):
+            An instance of a MongoClient connected to the specified database.
+        user_names (List): Users Dicord names (not server nicks).
+
+    Returns:
+        Dictionary: User name -> set of the users game names.
+    """
+    libraries = {}
+    for user in db["Players"].find(
+        {"name": {"$in": list(user_names)}},
+        {"name": 1, "games": 1, "_id": 0}
+    ):
+        libraries[user["name"]] = set(user["games"])
+    return libraries
+
+@timed()
+def get_common_games_of_players(db, user_names):
+    """
+    Retrieves the games that all the specified users have in their list of games.
+
+    All the users libraries are loaded by a single query. Users that aren't
+    in the database yet are created (in bulk) with an empty list of games.
+
+    Parameters:
+        db (pymongo.mongo_client.MongoClient):
+            An instance of a MongoClient connected to the specified database.
+        user_names (List): Users Dicord names (not server nicks).
+
+    Returns:
+        Set: A set of game names every user has in their list of games.
+    """
+    # Remove duplicates while keeping the order
+    user_names = list(dict.fromkeys(user_names))
+    if not user_names:
+        return set()
+
+    libraries = get_libraries_of_players(db, user_names)
+
+    missing_user_names = [name for name in user_names if name not in libraries]
+    if missing_user_names:
+        add_new_players(db, missing_user_names)
+        # A new player has no games, so there are no games in common
+        return set()
+
+    return set.intersection(*libraries.values())
+
+@timed()
 def add_game_to_user_game_list(db, user_name, game):
     """
     Adds a game name to the users list of games in the database.
+    Creates the user when they aren't in the database yet.
 
     Parameters:
         db (pymongo.mongo_client.MongoClient):
@@ -262,20 +450,16 @@ def add_game_to_user_game_list(db, user_name, game):
         game (string): A name of the game.
 
     Returns:
-        None
+        Bool: Indication whether the game was added or not.
     """
-    collection = db["Players"]
-    user = collection.find_one({"name": user_name})
-    if user is None:
-        add_new_player(db, user_name)
-    collection.update_one(
-        {"name": user_name},
-        {"$addToSet": {"games": game}}
-    )
+    result = _upsert_one(db["Players"], {"name": user_name}, {"$addToSet": {"games": game}})
+    return result.upserted_id is not None or result.modified_count == 1
 
+@timed()
 def remove_game_from_user_game_list(db, user_name, game):
     """
-    Removes a game name from the users list of games in the database.   
+    Removes a game name from the users list of games in the database.
+    Creates the user when they aren't in the database yet.
 
     Parameters:
         db (pymongo.mongo_client.MongoClient):
@@ -284,16 +468,16 @@ def remove_game_from_user_game_list(db, user_name, game):
         game (string): A name of the game.
 
     Returns:
-        None
+        Bool: Indication whether the game was removed or not.
     """
-    collection = db["Players"]
-    user = collection.find_one({"name": user_name})
-    if user is None:
-        add_new_player(db, user_name)
-    collection.update_one(
+    result = db["Players"].update_one(
         {"name": user_name},
         {"$pull": {"games": game}}
     )
+    if result.matched_count == 0:
+        # Only a new user costs the second round trip
+        add_new_player(db, user_name)
+    return result.modified_count == 1
 
 def main():
     """
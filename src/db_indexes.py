@@ -0,0 +1,139 @@
+"""
+db_indexes.py
+
+Creates the database indexes and reports how MongoDB executes every query db_handler issues.
+
+Run it after changing a query or an index, a collection scan that creeps back in
+is reported and the script exits with status code 1.
+
+Main Functions:
+- get_plan_stages: Collects the names of all stages of a query plan.
+- explain_queries: Explains every query db_handler issues and summarizes the plans.
+- main: Creates the indexes and prints the query plan report.
+
+Dependencies:
+- Requires db_handler for the database connection and the index definitions.
+"""
+
+import sys
+import db_handler
+
+# Every query db_handler issues, as (description, collection, filter, sort, expected scan).
+# Queries reading a whole collection on purpose are expected to scan it.
+# "$sample" is replaced by a real value from the collection before explaining.
+QUERIES = [
+    ("list of games", "Games", {}, None, True),
+    ("game by name", "Games", {"name": "$sample"}, None, False),
+    ("player by name", "Players", {"name": "$sample"}, None, False),
+    ("players by names", "Players", {"name": {"$in": ["$sample"]}}, None, False),
+    ("last spin", "LastSpin", {}, None, True),
+    ("last spin not inserted", "LastSpin", {"is_inserted": False}, None, True),
+    ("latest logs", "Logs", {}, [("game_date", -1)], False),
+    ("logs by game", "Logs", {"game": "$sample"}, [("game_date", -1)], False),
+    ("logs by player", "Logs", {"players": "$sample"}, [("game_date", -1)], False),
+    ("stats by kind", "Stats", {"kind": "game"}, [("played", -1), ("key", 1)], False),
+    ("stats of a group", "Stats",
+     {"kind": "game_group", "key": {"$regex": "^sample\n"}}, None, False),
+]
+
+# Fields the "$sample" values are taken from
+SAMPLE_FIELDS = {
+    "Games": "name",
+    "Players": "name",
+    "Logs": "game",
+}
+
+def get_plan_stages(plan):
+    """
+    Collects the names of all stages of a query plan, from the root to the leaves.
+
+    Parameters:
+        plan (Dictionary): The `winningPlan` of an explain output.
+
+    Returns:
+        List: A list of strings with the stage names, like ["FETCH", "IXSCAN"].
+    """
+    stages = [plan.get("stage", "?")]
+    if "inputStage" in plan:
+        stages += get_plan_stages(plan["inputStage"])
+    for input_stage in plan.get("inputStages", []):
+        stages += get_plan_stages(input_stage)
+    return stages
+
+def _get_sample_value(db, collection_name, query_filter):
+    """
+    Replaces the "$sample" placeholders of a filter with a real value from the collection.
+    """
+    field = SAMPLE_FIELDS.get(collection_name)
+    sample_document = db[collection_name].find_one({}, {field: 1}) if field else None
+    value = "sample"
+    if sample_document is not None and field in sample_document:
+        value = sample_document[field]
+        if isinstance(value, list):
+            value = value[0] if value else "sample"
+
+    def replace(item):
+        if item == "$sample":
+            return value
+        if isinstance(item, dict):
+            return {key: replace(val) for key, val in item.items()}
+        if isinstance(item, list):
+            return [replace(val) for val in item]
+        return item
+    return replace(query_filter)
+
+def explain_queries(db):
+    """
+    Explains every query db_handler issues and summarizes the chosen plans.
+
+    Parameters:
+        db (pymongo.mongo_client.MongoClient):
+            An instance of a MongoClient connected to the specified database.
+
+    Returns:
+        List: Dictionaries with `query`, `stages`, `docs_examined`, `returned`
+            and `unexpected_scan` of every query.
+    """
+    report = []
+    for description, collection_name, query_filter, sort, expected_scan in QUERIES:
+        cursor = db[collection_name].find(_get_sample_value(db, collection_name, query_filter))
+        if sort is not None:
+            cursor = cursor.sort(sort)
+        explain = cursor.explain()
+
+        stages = get_plan_stages(explain["queryPlanner"]["winningPlan"])
+        execution_stats = explain.get("executionStats", {})
+        report.append({
+            "query": f"{collection_name}: {description}",
+            "stages": stages,
+            "docs_examined": execution_stats.get("totalDocsExamined"),
+            "returned": execution_stats.get("nReturned"),
+            "unexpected_scan": "COLLSCAN" in stages and not expected_scan
+        })
+    return report
+
+def main():
+    """
+    The main entry point of the script.
+
+    Creates the indexes and prints the query plan report.
+    Exits with status code 1 when any query unexpectedly scans a whole collection.
+
+    Returns:
+        None
+    """
+    # Connecting creates the indexes
+    db = db_handler.connect_to_db()
+
+    report = explain_queries(db)
+    for entry in report:
+        status = "SCAN!" if entry["unexpected_scan"] else "ok"
+        print(f"{status:<6} {entry['query']:<28} {' <- '.join(entry['stages']):<32} "
+              f"examined {entry['docs_examined']}, returned {entry['returned']}")
+
+    if any(entry["unexpected_scan"] for entry in report):
+        print("Some queries scan a whole collection, check the indexes in db_handler.INDEXES.")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
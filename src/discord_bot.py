@@ -3,9 +3,21 @@ discord_bot.py
 
 This module handles all the Discord bot interactions between the Wheel_of_luck and Discord Server. 
 
+The Discord client, the storage backend and the environment variables are only
+loaded on first use, so importing the module is fast and has no side effects.
+
 Main Functions:
+- get_client: Returns the Discord client, creating it on first use.
+- get_storage: Returns the storage backend used by the bot, connecting to it on first use.
+- get_channel_id: Returns the ID of the channel the bot sends its messages to.
 - on_ready: An event handler for when the Discord bot is succesfully logged in.
+- on_disconnect, on_resumed:
+    Event handlers closing and opening the bot for the other threads on a lost connection.
+- on_raw_reaction_add, on_raw_reaction_remove:
+    Event handlers keeping track of users reacting to the messages sent by the bot.
+- on_message: Dispatches the chat commands like "!games" to their handlers.
 - send_message: Sends a message via the Discord bot to a specified channel.
+- send_reaction_message: Sends a message collecting reactions, never merged with others.
 - get_reaction_users: Retrieves a list of users that put any reaction on the specific message.
 - run_bot: The main starting point of the Discord bot.
 - logout: Closing the currently opened Discord client.
@@ -13,53 +25,182 @@ Main Functions:
 Dependencies:
 - Requires asyncio for establishing an event loop that can be accessed from the main wheel_of_luck
 and by Discord events.
-- Requires discord for interactions with the Discord servers.
-- Requires db_handler to provide all database operations.
+- Requires discord for interactions with the Discord servers, imported on first use.
+- Requires storage_backend to provide the storage of the games and players.
+- Requires async_db_handler to run database operations without blocking the event loop.
+- Requires stats_keys for the kinds of the precomputed statistics.
 - Requires env_var_loader to load environment variables.
+- Requires reaction_tracker to keep track of reactions to the sent messages.
+- Requires command_router to dispatch the chat commands to their handlers.
+- Requires channel_sender to queue, merge and rate limit the sent messages.
+- Requires instrumentation to record the latency of the Discord calls and commands.
 """
 
 import sys
 import asyncio
-import discord
-import db_handler
+import threading
+import async_db_handler
+import stats_keys
 from env_var_loader import get_env_var_value
+from storage_backend import get_storage_backend
+from reaction_tracker import ReactionTracker
+from command_router import CommandRouter
+from channel_sender import ChannelSender
+from instrumentation import timed, start_exporter
+
+# Maximum number of reactions whose users are fetched from Discord at the same time
+REACTION_USERS_CONCURRENCY = 5
+# Maximum number of users fetched for a single reaction (Discord returns up to 100 per page)
+REACTION_USERS_LIMIT = 100
+
+# Maximum number of games, players and groups listed by the "!stats" command
+STATS_ENTRIES_LIMIT = 10
+
+# Set while the bot is logged in and ready to receive commands from other threads
+ready_event = threading.Event()
 
-# Getting environment variables
-DISCORD_BOT_TOKEN = get_env_var_value("DISCORD_BOT_TOKEN")
-# Use CHANNEL_ID env var for the actuall usage of the bot.
-# Use TEST_CHANNEL_ID env var for testing purposes.
-CHANNEL_ID = get_env_var_value("TEST_CHANNEL_ID")
+# Users reacting to the messages sent by the bot, kept up to date by the gateway events
+reaction_tracker = ReactionTracker()
 
-# Discord API needs the CHANNEL_ID in form of an integer, not string
-try:
-    DISCORD_CHANNEL_ID = int(CHANNEL_ID)
-except (TypeError, ValueError):
-    print(f"Invalid DISCORD_CHANNEL_ID: {CHANNEL_ID}. Must be an integer.")
-    sys.exit(1)
+# Chat commands and their handlers
+router = CommandRouter()
+
+# Channel ID -> outbound message queue of the channel
+channel_senders = {}
+
+# The Discord client and the channel ID, created on first use
+_client = None
+_client_lock = threading.Lock()
+_channel_id = None
+
+def get_client():
+    """
+    Returns the Discord client, creating it and registering its event handlers on first use.
+    The discord package is only imported then, as importing it is slow.
 
-# Declaring Intents for the Discord Client
-intents = discord.Intents.default()
-intents.message_content = True
+    Returns:
+        discord.Client: The Discord client of the bot.
+    """
+    global _client # pylint: disable=global-statement
+    with _client_lock:
+        if _client is None:
+            import discord # pylint: disable=import-outside-toplevel
+
+            # Declaring Intents for the Discord Client
+            intents = discord.Intents.default()
+            intents.message_content = True
+
+            _client = discord.Client(intents=intents)
+            for event_handler in (on_ready, on_disconnect, on_resumed, on_raw_reaction_add,
+                                  on_raw_reaction_remove, on_message):
+                _client.event(event_handler)
+        return _client
+
+def get_storage():
+    """
+    Returns the storage backend used by the bot, connecting to it on first use.
 
-client = discord.Client(intents=intents)
+    Returns:
+        storage_backend.StorageBackend: The storage backend selected by the configuration.
+    """
+    return get_storage_backend()
 
-# Setup database connection
-db = db_handler.connect_to_db()
+def get_channel_id():
+    """
+    Returns the ID of the channel the bot sends its messages to,
+    loading it from the environment variables on first use.
+    Use CHANNEL_ID env var for the actuall usage of the bot.
+    Use TEST_CHANNEL_ID env var for testing purposes.
+
+    Returns:
+        int: The Discord channel ID.
+    """
+    global _channel_id # pylint: disable=global-statement
+    if _channel_id is None:
+        channel_id = get_env_var_value("TEST_CHANNEL_ID")
+        # Discord API needs the CHANNEL_ID in form of an integer, not string
+        try:
+            _channel_id = int(channel_id)
+        except (TypeError, ValueError):
+            print(f"Invalid DISCORD_CHANNEL_ID: {channel_id}. Must be an integer.")
+            sys.exit(1)
+    return _channel_id
 
-@client.event
 async def on_ready():
     """
     An event handler for when the Discord bot is succesfully
     logged in and ready to receive commands.
     
-    Only announces that the bot is ready in the console.
+    Announces that the bot is ready in the console and lets
+    the other threads know they can send commands to the bot.
+
+    Returns:
+        None
+    """
+    print(f"We have logged in as {get_client().user}")
+    ready_event.set()
+
+async def on_disconnect():
+    """
+    An event handler for when the Discord bot loses the connection to Discord.
+
+    Reaction events could be missed until the bot reconnects, so the users of all
+    tracked messages will be fetched from Discord again when needed.
+    Other threads wait with their commands until the bot is ready again
+    (on_ready after a new login, on_resumed after a resumed session).
+
+    Returns:
+        None
+    """
+    ready_event.clear()
+    reaction_tracker.mark_all_unsynced()
+
+async def on_resumed():
+    """
+    An event handler for when the Discord bot resumes its session after a lost connection.
+
+    Discord doesn't send the ready event again after a resume, so this lets
+    the other threads send commands to the bot again.
 
     Returns:
         None
     """
-    print(f"We have logged in as {client.user}")
+    ready_event.set()
 
-@client.event
+async def on_raw_reaction_add(payload):
+    """
+    An event handler for when a reaction is added to any message.
+    Records the reacting user of the messages sent by the bot.
+
+    Parameters:
+        payload (discord.RawReactionActionEvent): The reaction event.
+
+    Returns:
+        None
+    """
+    user_name = None
+    if payload.member is not None:
+        user_name = payload.member.name
+    else:
+        user = get_client().get_user(payload.user_id)
+        if user is not None:
+            user_name = user.name
+    reaction_tracker.add_reaction(payload.message_id, payload.user_id, user_name)
+
+async def on_raw_reaction_remove(payload):
+    """
+    An event handler for when a reaction is removed from any message.
+    Records the removal on the messages sent by the bot.
+
+    Parameters:
+        payload (discord.RawReactionActionEvent): The reaction event.
+
+    Returns:
+        None
+    """
+    reaction_tracker.remove_reaction(payload.message_id, payload.user_id)
+
+@timed()
 async def on_message(message):
     """
     An event handler for when there is a message sent in the Discord
@@ -71,91 +212,180 @@ async def on_message(message):
         None
     """
     # Ensure the bot doesn't respond to itself
-    if message.author == client.user:
+    if message.author == get_client().user:
         return
-    # Check if the message starts with "!games"
-    if message.content.startswith("!"):
-        if message.content == "!games":
-            # Ensure no extra spaces or newlines are present in each game name
-            await message.channel.send(
-                "List her v kole štěstí: \n\n" +
-                f"{make_list_printable(db_handler.get_list_of_games(db))}"
-            )
-        elif message.content.startswith("!games add "):
-            # Extract the game name
-            game = get_game_name_from_command(message, "!games add ")
-
-            added = db_handler.add_game_to_game_list(db, game)
-            if added:
-                await message.channel.send(
-                    f"Hra '{game}' byla úspěšně přidána do seznamu her."
-                )
-            else:
-                await message.channel.send(
-                    f"Hra '{game}' již je na seznamu her. (!games)"
-                )
-        elif message.content.startswith("!games remove "):
-            # Extract the game name
-            game = get_game_name_from_command(message, "!games remove ")
-
-            removed = db_handler.remove_game_from_game_list(db, game)
-            if removed:
-                await message.channel.send(
-                    f"Hra '{game}' byla úspěšně odebrána ze seznamu her."
-                )
-            else:
-                await message.channel.send(
-                    f"Hra '{game}' nebyla na seznamu her nalezena. (!games)"
-                )
-        elif message.content == "!mygames":
-            # Get the games list of the author of the message
-            users_games = db_handler.get_list_of_user_games(db, message.author.name)
-            if len(users_games) == 0:
-                await message.channel.send(
-                    "Tvůj list her je prázdný, přidej hry pomocí \"!mygames add NázevHry\""
-                )
-            else:
-                await message.channel.send(f"Tvůj list her: \n\n{make_list_printable(users_games)}")
-        elif message.content.startswith("!mygames add "):
-            # Extract the game name
-            game = get_game_name_from_command(message, "!mygames add ")
-
-            if game in db_handler.get_list_of_games(db):
-                db_handler.add_game_to_user_game_list(db, message.author.name, game)
-                await message.channel.send(
-                    f"Hra '{game}' byla úspěšně přidána do tvého seznamu her."
-                )
-            else:
-                await message.channel.send(
-                    f"Hra '{game}' nebyla nalezena na seznamu her. (!games)"
-                )
-        elif message.content.startswith("!mygames remove "):
-            # Extract the game name
-            game_to_remove = get_game_name_from_command(message, "!mygames remove ")
-
-            if game_to_remove in db_handler.get_list_of_user_games(db, message.author.name):
-                db_handler.remove_game_from_user_game_list(db, message.author.name, game_to_remove)
-                await message.channel.send(
-                    f"Hra '{game_to_remove}' byla úspěšně odebrána z tvého seznamu her."
-                )
-            else:
-                await message.channel.send(
-                    f"Hra '{game_to_remove}' nebyla nalezena na tvém seznamu her. (!mygames)"
-                )
-
-def get_game_name_from_command(command, command_to_remove_from_message):
-    """
-    Removes all of the string which doesn't represent a game name.
-
-    Parameters:
-        command (string): A message command posted by the user in Discord.
-        command_to_remove_from_message (string):
-            Part of the command that is to be removed in order to get the game name.
-
-    Returns:
-        string: Game name.
-    """
-    return command.content[len(command_to_remove_from_message):].strip()
+    await router.dispatch(message)
+
+@router.command("games")
+async def list_games(message, _):
+    """
+    Handles the "!games" command, listing all the games of the wheel.
+
+    Parameters:
+        message (discord.Message): The command message.
+
+    Returns:
+        None
+    """
+    games = await async_db_handler.get_list_of_games(get_storage())
+    # Ensure no extra spaces or newlines are present in each game name
+    await message.channel.send(
+        "List her v kole štěstí: \n\n" +
+        f"{make_list_printable(games)}"
+    )
+
+@router.command("games add", takes_argument=True)
+async def add_game(message, game):
+    """
+    Handles the "!games add NázevHry" command, adding a game to the wheel.
+
+    Parameters:
+        message (discord.Message): The command message.
+        game (string): A name of the game.
+
+    Returns:
+        None
+    """
+    added = await async_db_handler.add_game_to_game_list(get_storage(), game)
+    if added:
+        await message.channel.send(
+            f"Hra '{game}' byla úspěšně přidána do seznamu her."
+        )
+    else:
+        await message.channel.send(
+            f"Hra '{game}' již je na seznamu her. (!games)"
+        )
+
+@router.command("games remove", takes_argument=True)
+async def remove_game(message, game):
+    """
+    Handles the "!games remove NázevHry" command, removing a game from the wheel.
+
+    Parameters:
+        message (discord.Message): The command message.
+        game (string): A name of the game.
+
+    Returns:
+        None
+    """
+    removed = await async_db_handler.remove_game_from_game_list(get_storage(), game)
+    if removed:
+        await message.channel.send(
+            f"Hra '{game}' byla úspěšně odebrána ze seznamu her."
+        )
+    else:
+        await message.channel.send(
+            f"Hra '{game}' nebyla na seznamu her nalezena. (!games)"
+        )
+
+@router.command("mygames")
+async def list_user_games(message, _):
+    """
+    Handles the "!mygames" command, listing the games of the author of the message.
+
+    Parameters:
+        message (discord.Message): The command message.
+
+    Returns:
+        None
+    """
+    users_games = await async_db_handler.get_list_of_user_games(get_storage(), message.author.name)
+    if len(users_games) == 0:
+        await message.channel.send(
+            "Tvůj list her je prázdný, přidej hry pomocí \"!mygames add NázevHry\""
+        )
+    else:
+        await message.channel.send(f"Tvůj list her: \n\n{make_list_printable(users_games)}")
+
+@router.command("mygames add", takes_argument=True)
+async def add_user_game(message, game):
+    """
+    Handles the "!mygames add NázevHry" command, adding a game
+    to the list of games of the author of the message.
+
+    Parameters:
+        message (discord.Message): The command message.
+        game (string): A name of the game.
+
+    Returns:
+        None
+    """
+    if await async_db_handler.is_game_in_game_list(get_storage(), game):
+        await async_db_handler.add_game_to_user_game_list(get_storage(), message.author.name, game)
+        await message.channel.send(
+            f"Hra '{game}' byla úspěšně přidána do tvého seznamu her."
+        )
+    else:
+        await message.channel.send(
+            f"Hra '{game}' nebyla nalezena na seznamu her. (!games)"
+        )
+
+@router.command("mygames remove", takes_argument=True)
+async def remove_user_game(message, game):
+    """
+    Handles the "!mygames remove NázevHry" command, removing a game
+    from the list of games of the author of the message.
+
+    Parameters:
+        message (discord.Message): The command message.
+        game (string): A name of the game.
+
+    Returns:
+        None
+    """
+    removed = await async_db_handler.remove_game_from_user_game_list(
+        get_storage(), message.author.name, game
+    )
+    if removed:
+        await message.channel.send(
+            f"Hra '{game}' byla úspěšně odebrána z tvého seznamu her."
+        )
+    else:
+        await message.channel.send(
+            f"Hra '{game}' nebyla nalezena na tvém seznamu her. (!mygames)"
+        )
+
+@router.command("stats")
+async def show_stats(message, _):
+    """
+    Handles the "!stats" command, showing the win/loss statistics of the most played
+    games, players and groups. Only reads the precomputed statistics.
+
+    Parameters:
+        message (discord.Message): The command message.
+
+    Returns:
+        None
+    """
+    sections = [
+        ("Hry", stats_keys.KIND_GAME),
+        ("Hráči", stats_keys.KIND_PLAYER),
+        ("Skupiny", stats_keys.KIND_GROUP)
+    ]
+    lines = []
+    for title, kind in sections:
+        entries = await async_db_handler.get_stats(get_storage(), kind, STATS_ENTRIES_LIMIT)
+        lines.append(f"**{title}**")
+        lines.append(make_stats_printable(entries) or "Zatím nic neodehráno.")
+        lines.append("")
+    await message.channel.send("Statistiky kola štěstí: \n\n" + "\n".join(lines).strip())
+
+def make_stats_printable(entries):
+    """
+    Makes the statistics entries printable, every entry on its separate line.
+
+    Parameters:
+        entries (List): Dictionaries with `key`, `wins` and `losses`.
+
+    Returns:
+        String: The entries with their wins, losses and win rate.
+    """
+    lines = []
+    for entry in entries:
+        played = entry["wins"] + entry["losses"]
+        win_rate = entry["wins"] / played if played else 0
+        lines.append(f"{entry['key']}: {entry['wins']}W / {entry['losses']}L ({win_rate:.0%})")
+    return "\n".join(lines)
 
 def make_list_printable(items_list):
     """
@@ -170,50 +400,117 @@ def make_list_printable(items_list):
     """
     return "\n".join(item.strip() for item in items_list)
 
-async def send_message(message, discord_channel_id = DISCORD_CHANNEL_ID):
+def get_channel_sender(discord_channel_id):
+    """
+    Returns the outbound message queue of a channel, creating it on first use.
+
+    Parameters:
+        discord_channel_id (int): The Discord channel ID.
+
+    Returns:
+        ChannelSender: The queue of the channel.
+    """
+    if discord_channel_id not in channel_senders:
+        channel = get_client().get_channel(discord_channel_id)
+        channel_senders[discord_channel_id] = ChannelSender(channel.send)
+    return channel_senders[discord_channel_id]
+
+@timed()
+async def send_message(message, discord_channel_id = None, coalesce = True):
     """
     Sends a message via the Discord bot to a specified channel.
 
+    The message goes through the channel's outbound queue, so it can be merged with other
+    messages waiting in the queue and the call waits while the channel is rate limited.
+
     Parameters:
         message (string): The message to be sent.
         discord_channel_id (int, optional): The channel where the message will be sent.
-            Defaults to DISCORD_CHANNEL_ID.
+            Defaults to the channel of get_channel_id.
+        coalesce (bool, optional): Whether the message may be merged with other messages.
 
     Returns:
         int: Discord ID of the sent message.
     """
-    message = await client.get_channel(discord_channel_id).send(message)
-    return message.id
+    return await get_channel_sender(discord_channel_id or get_channel_id()).send(
+        message, coalesce
+    )
 
-async def get_reaction_users(message_id, channel_id = DISCORD_CHANNEL_ID):
+async def send_reaction_message(message, discord_channel_id = None):
+    """
+    Sends a message collecting reactions via the Discord bot to a specified channel.
+    The message is never merged with other messages, so only reactions meant for it
+    are collected.
+
+    Parameters:
+        message (string): The message to be sent.
+        discord_channel_id (int, optional): The channel where the message will be sent.
+            Defaults to the channel of get_channel_id.
+
+    Returns:
+        int: Discord ID of the sent message.
+    """
+    message_id = await send_message(message, discord_channel_id, coalesce=False)
+    # Start tracking the users reacting to the message. Only the reaction messages are
+    # tracked, other messages would push them out of the tracker.
+    reaction_tracker.track(message_id)
+    return message_id
+
+@timed()
+async def get_reaction_users(message_id, channel_id = None):
     """
     Retrieves a list of users that put any reaction on the specific message in Discord chat.
 
+    The users of the messages sent by the bot are answered from the reaction tracker.
+    The reactions are only fetched from Discord when the message isn't tracked
+    or the bot reconnected since.
+
     Parameters:
         message_id (int): The message's Discord ID.
         discord_channel_id (int, optional): The channel where the message is located.
-            Defaults to DISCORD_CHANNEL_ID.
+            Defaults to the channel of get_channel_id.
 
     Returns:
         List: A list of users that had at least one reaction on the message with message_id.
     """
-    channel = client.get_channel(channel_id)
+    users = reaction_tracker.get_users(message_id)
+    if users is not None:
+        return users
+
+    channel = get_client().get_channel(channel_id or get_channel_id())
     message = await channel.fetch_message(message_id)
 
-    # Use a set to store unique user names
-    users = set()
+    # Limit the number of reactions whose users are fetched at the same time
+    semaphore = asyncio.Semaphore(REACTION_USERS_CONCURRENCY)
+
+    async def fetch_reaction_users(reaction):
+        async with semaphore:
+            return [user async for user in reaction.users(limit=REACTION_USERS_LIMIT)]
+
+    # Walk the users of all the reactions concurrently
+    reactions_users = await asyncio.gather(
+        *(fetch_reaction_users(reaction) for reaction in message.reactions)
+    )
+
+    # Use a dictionary to store unique users by their ID, as names don't have to be unique
+    users = {}
+    for reaction_users in reactions_users:
+        for user in reaction_users:
+            _, reaction_count = users.get(user.id, (user.name, 0))
+            users[user.id] = (user.name, reaction_count + 1)
 
-    for reaction in message.reactions:
-        reaction_users = [user.name async for user in reaction.users()]
-        users.update(reaction_users)
+    # Only a complete list of users can be tracked
+    if all(reaction.count <= REACTION_USERS_LIMIT for reaction in message.reactions):
+        reaction_tracker.set_users(message_id, users)
 
-    return list(users)
+    return [user_name for user_name, _ in users.values()]
 
-def run_bot(discord_bot_token = DISCORD_BOT_TOKEN):
+def run_bot(discord_bot_token = None):
     """
     The main starting point of the Discord bot.
     Creates a new event loop and starts a Discord client which takes control of the event loop,
     meaning listening to events from Discord servers.
+    Starts exporting the latency histograms when the instrumentation is on.
 
     Parameters:
         discord_bot_token (string, optional): The token of the Discord bot.
@@ -222,16 +519,21 @@ def run_bot(discord_bot_token = DISCORD_BOT_TOKEN):
     Returns:
         None
     """
-    asyncio.run(client.start(discord_bot_token))
+    discord_bot_token = discord_bot_token or get_env_var_value("DISCORD_BOT_TOKEN")
+    start_exporter()
+    asyncio.run(get_client().start(discord_bot_token))
 
 async def logout():
     """
     Closing the currently opened Discord client, meaning the Discord bot logging off. 
+    The messages still waiting in the outbound queues fail, so nobody waits for them.
 
     Returns:
         None
     """
-    await client.close()
+    for sender in channel_senders.values():
+        await sender.close()
+    await get_client().close()
 
 async def main():
     """
@@ -243,7 +545,7 @@ async def main():
         None 
     """
     # Start the Discord bot
-    await client.start(DISCORD_BOT_TOKEN)
+    await get_client().start(get_env_var_value("DISCORD_BOT_TOKEN"))
 
     # Testing
     await send_message("Just Testing")
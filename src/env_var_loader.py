@@ -3,8 +3,11 @@ env_var_loader.py
 
 A helper module for loading environment variables from variables.env file.
 
+The variables.env file is loaded on the first lookup, not when the module is imported.
+
 Main Functions:
-- get_env_var_value: An event handler for when the Discord bot is succesfully logged in.
+- get_env_var_value: Gets the value of a required environment variable.
+- get_optional_env_var_value: Gets the value of an optional environment variable.
 
 Dependencies:
 - Requires dotenv to load environment variables from .env file.
@@ -12,10 +15,37 @@ Dependencies:
 
 import os
 import sys
-from dotenv import load_dotenv
+import threading
+
+ENV_FILE_PATH = 'variables.env'
+
+_is_env_file_loaded = False
+_env_file_lock = threading.Lock()
+
+def _load_env_file():
+    """
+    Loads the environment variables from the .env file, only once.
+    """
+    global _is_env_file_loaded # pylint: disable=global-statement
+    with _env_file_lock:
+        if not _is_env_file_loaded:
+            from dotenv import load_dotenv # pylint: disable=import-outside-toplevel
+            load_dotenv(dotenv_path=ENV_FILE_PATH)
+            _is_env_file_loaded = True
 
-# Load environment variables from .env file
-load_dotenv(dotenv_path='variables.env')
+def get_optional_env_var_value(env_var_name, default):
+    """
+    Gets the value of an optional environment variable.
+
+    Parameters:
+        env_var_name (string): The name of the environment variable to be loaded.
+        default (string): The value used when the environment variable isn't set.
+
+    Returns:
+        string: The value of the environment variable.
+    """
+    _load_env_file()
+    return os.getenv(env_var_name, default)
 
 def get_env_var_value(env_var_name):
     """
@@ -26,8 +56,9 @@ def get_env_var_value(env_var_name):
         env_var_name (string): The name of the environment variable to be loaded. 
 
     Returns:
-        None
+        string: The value of the environment variable.
     """
+    _load_env_file()
     env_var_value = os.getenv(env_var_name)
     if env_var_value is None:
         print(f"Environment variable {env_var_name} weren't loaded correctly. Exiting...")
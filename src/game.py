@@ -3,6 +3,9 @@ game.py
 
 Module containing the definition of the Game class.
 
+Main Functions:
+- get_default_games: Returns all the playable games of the wheel.
+- get_player_codes: Derives the codes of the players from the groups of the games.
 """
 
 class Game:
@@ -24,3 +27,62 @@ class Game:
         self.name = name
         self.players = players
         self.percentage = percentage
+
+def get_default_games():
+    """
+    Returns all the playable games of the wheel.
+
+    Returns:
+        list[Game]: A list of all the playable games represented by Game objects.
+    """
+    return [
+        Game("Apex Legends", ["DK", "D", "K", "DKKA", "DKA"], 1),
+        Game("PUBG: Battlegrounds", ["DK", "K", "D", "DKKA", "DKA",], 1),
+        Game("Counter Strike: Global Offensive", ["DK", "D", "DKKA", "DKA",], 1),
+        Game("Fortnite", ["DK", "D"], 1),
+        Game("Programovani kola stesti", ["DK", "D", "DKKA", "DKA"], 1),
+        Game("Lost Ark", ["DK", "D", "K", "DFK"], 1),
+        #Game("Payday 2", ["DFK", "DK", "FK", "F", "K"], 1),
+        Game("League of Legends", ["DM", "D", "M", "DF", "DFKM"], 1),
+        Game("Fall Guys", ["DFK", "DK", "DF", "FK", "D", "K", "F"], 1),
+        Game("Overwatch", ["DFK", "DK", "DF", "FK", "D", "K", "F", "DKKA", "DKA"], 1),
+        Game("Grant Treft Auto V", ["DFK", "F", "DK", "DF"], 1),
+        Game("Keep Talking and Nobody Explodes", ["DK", "DF", "TEST"], 1),
+        Game("Orcs Must Die", ["DK", "K"], 1),
+        Game("Deceive", ["DFK", "DK", "DF"], 1),
+        Game("Dead by Daylight", ["DK", "DKKA", "DKA"], 1),
+        Game("Dying Light", ["DKKA", "DKA"], 1)
+    ]
+
+def get_player_codes(games=None):
+    """
+    Returns the codes of the players in the groups of the games (Game.players),
+    derived from the groups, so a group like "DKKA" can be split into its players
+    "D", "K" and "KA".
+
+    A letter that is a group on its own in any game is a single letter player.
+    The letters that never play alone continue the code of the player before them,
+    so "DKA" is "D" and "KA" when "D" and "K" play alone and "A" doesn't.
+
+    Parameters:
+        games (list[Game], optional): The games with their groups of players.
+            Defaults to get_default_games().
+
+    Returns:
+        List: The sorted player codes, a code may be longer than a single letter.
+    """
+    if games is None:
+        games = get_default_games()
+    groups = {group for _game in games for group in _game.players}
+    single_players = {group for group in groups if len(group) == 1}
+    codes = set(single_players)
+    for group in groups:
+        code = ""
+        for letter in group:
+            if letter in single_players and code:
+                codes.add(code)
+                code = ""
+            code += letter
+        if code:
+            codes.add(code)
+    return sorted(codes)
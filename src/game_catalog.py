@@ -0,0 +1,181 @@
+"""
+game_catalog.py
+
+Module containing the definition of the GameCatalog class, a process-wide cache
+of the Games collection.
+
+Main Functions:
+- get_game_catalog: Returns the shared GameCatalog of the given database.
+
+Dependencies:
+- Requires bisect to keep the cached list of games sorted on in-place updates.
+- Requires threading, as the catalog is shared by the database worker threads.
+- Requires env_var_loader to load the optional settings.
+"""
+
+import time
+import bisect
+import threading
+from env_var_loader import get_optional_env_var_value
+
+def get_games_catalog_ttl():
+    """
+    Gets the number of seconds after which the cached catalog is reloaded from the database,
+    so that edits made by another process (another bot or app instance) are picked up.
+
+    Returns:
+        float: The GAMES_CATALOG_TTL setting, 60 seconds by default.
+    """
+    return float(get_optional_env_var_value("GAMES_CATALOG_TTL", "60"))
+
+class GameCatalog:
+    """
+    This class represents an in-memory copy of the Games collection.
+
+    Holds the alphabetically sorted list of game names for listing and a set
+    of the same names for O(1) membership checks.
+    """
+
+    def __init__(self, ttl=None):
+        """
+        Initializes the GameCatalog class.
+
+        Parameters:
+            ttl (float, optional): Number of seconds the cached games stay valid.
+                Defaults to the GAMES_CATALOG_TTL setting.
+        """
+        self.ttl = get_games_catalog_ttl() if ttl is None else ttl
+        self.hits = 0
+        self.misses = 0
+        self._games = []
+        self._game_set = set()
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def _ensure_loaded(self, db):
+        """
+        Loads the games from the database when there is no valid cached copy.
+        Must be called with the lock held.
+
+        Parameters:
+            db (pymongo.mongo_client.MongoClient):
+                An instance of a MongoClient connected to the specified database.
+
+        Returns:
+            None
+        """
+        if self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl:
+            self.hits += 1
+            return
+
+        self.misses += 1
+        games = [query["name"] for query in db["Games"].find({}, {"name": 1, "_id": 0})]
+        # Sort the games alphabetically
+        games.sort()
+        self._games = games
+        self._game_set = set(games)
+        self._loaded_at = time.monotonic()
+
+    def get_games(self, db):
+        """
+        Retrieves all game names in alphabetically sorted order.
+
+        Parameters:
+            db (pymongo.mongo_client.MongoClient):
+                An instance of a MongoClient connected to the specified database.
+
+        Returns:
+            List: A new list of strings containing all game names (alphabetically sorted).
+        """
+        with self._lock:
+            self._ensure_loaded(db)
+            return list(self._games)
+
+    def contains(self, db, game):
+        """
+        Checks whether a game is in the catalog.
+
+        Parameters:
+            db (pymongo.mongo_client.MongoClient):
+                An instance of a MongoClient connected to the specified database.
+            game (string): A name of the game.
+
+        Returns:
+            Bool: Indication whether the game is in the catalog.
+        """
+        with self._lock:
+            self._ensure_loaded(db)
+            return game in self._game_set
+
+    def add(self, game):
+        """
+        Adds a game to the cached catalog, keeping the list sorted.
+        Does nothing when the catalog wasn't loaded yet.
+
+        Parameters:
+            game (string): A name of the game.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            if self._loaded_at is None or game in self._game_set:
+                return
+            bisect.insort(self._games, game)
+            self._game_set.add(game)
+
+    def remove(self, game):
+        """
+        Removes a game from the cached catalog.
+
+        Parameters:
+            game (string): A name of the game.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            if game not in self._game_set:
+                return
+            self._games.pop(bisect.bisect_left(self._games, game))
+            self._game_set.discard(game)
+
+    def invalidate(self):
+        """
+        Drops the cached games, the next read loads them from the database again.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self._loaded_at = None
+
+    def get_stats(self):
+        """
+        Returns the cache counters.
+
+        Returns:
+            Dictionary: `hits` and `misses` (reads served from memory/the database)
+                and `size` (number of cached games).
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._games)}
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+def get_game_catalog(db):
+    """
+    Returns the shared GameCatalog of the given database, creating it on first use.
+
+    Parameters:
+        db (pymongo.mongo_client.MongoClient):
+            An instance of a MongoClient connected to the specified database.
+
+    Returns:
+        GameCatalog: The catalog shared by the whole process.
+    """
+    with _catalogs_lock:
+        if db.name not in _catalogs:
+            _catalogs[db.name] = GameCatalog()
+        return _catalogs[db.name]
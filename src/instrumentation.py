@@ -0,0 +1,408 @@
+"""
+instrumentation.py
+
+Lightweight latency instrumentation of the database calls, the Discord calls
+and the phases of a wheel spin.
+
+Every instrumented operation records its durations into a latency histogram and counts
+its failures. The histograms are exported as a Prometheus text endpoint or printed
+periodically, and single operations slower than SLOW_OPERATION_MS (500 by default)
+are printed right away.
+
+The instrumentation is selected by the INSTRUMENTATION environment variable, read on the first
+instrumented call: "off" (the default), "log" or "prometheus", any other value is reported
+and treated as "off". When it's off, the functions decorated by `timed` call the function
+right away and `span` returns a shared empty context manager, so the instrumented code
+runs just like without it.
+
+Main Functions:
+- get_mode: Gets the selected instrumentation mode.
+- is_enabled: Checks whether the instrumentation is on.
+- timed: A decorator recording the durations of a function or a coroutine function.
+- span: A context manager recording the duration of a block of code.
+- get_histograms: Returns the latency histograms of all the recorded operations.
+- render_prometheus: Returns the histograms in the Prometheus text format.
+- start_exporter: Starts exporting the histograms, by HTTP or by periodic log lines.
+
+Dependencies:
+- Requires http.server to serve the Prometheus text endpoint, imported on first use.
+- Requires env_var_loader to load the optional settings.
+"""
+
+import time
+import bisect
+import inspect
+import functools
+import threading
+import contextlib
+from env_var_loader import get_optional_env_var_value
+
+# Upper bounds of the histogram buckets in seconds
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+METRIC_PREFIX = "wheel_of_luck_operation"
+# Valid values of the INSTRUMENTATION environment variable
+INSTRUMENTATION_MODES = ("off", "log", "prometheus")
+
+# The mode and the slow operation threshold, read on the first instrumented call,
+# as they are checked on every call
+_settings = None
+_settings_lock = threading.Lock()
+
+def _get_settings():
+    """
+    Returns the settings checked on every instrumented call, reading them on first use.
+
+    Returns:
+        Dictionary: `mode` ("off", "log" or "prometheus") and `slow_operation_ms`,
+            single operations slower than this are printed right away.
+    """
+    global _settings # pylint: disable=global-statement
+    if _settings is None:
+        with _settings_lock:
+            if _settings is None:
+                mode = get_optional_env_var_value("INSTRUMENTATION", "off").strip().lower()
+                if mode not in INSTRUMENTATION_MODES:
+                    print(f"Unknown INSTRUMENTATION mode {mode}, use one of: "
+                          f"{', '.join(INSTRUMENTATION_MODES)}. The instrumentation is off.",
+                          flush=True)
+                    mode = "off"
+                _settings = {
+                    "mode": mode,
+                    "slow_operation_ms": float(
+                        get_optional_env_var_value("SLOW_OPERATION_MS", "500")
+                    )
+                }
+    return _settings
+
+def get_mode():
+    """
+    Gets the instrumentation mode selected by the INSTRUMENTATION environment variable.
+
+    Returns:
+        string: "off", "log" or "prometheus".
+    """
+    return _get_settings()["mode"]
+
+def is_enabled():
+    """
+    Checks whether the instrumentation is on.
+
+    Returns:
+        bool: True when the mode isn't "off".
+    """
+    return _get_settings()["mode"] != "off"
+
+class Histogram:
+    """
+    This class represents a latency histogram of a single operation, with a counter
+    of its failures.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        """
+        Initializes the Histogram class.
+
+        Parameters:
+            buckets (tuple, optional): Sorted upper bounds of the buckets in seconds.
+                Defaults to LATENCY_BUCKETS.
+        """
+        self.buckets = buckets
+        # The last count is of the durations above the last bucket
+        self._bucket_counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, duration, failed=False):
+        """
+        Records a single duration of the operation.
+
+        Parameters:
+            duration (float): The duration in seconds.
+            failed (bool, optional): Whether the operation raised an exception.
+
+        Returns:
+            None
+        """
+        index = bisect.bisect_left(self.buckets, duration)
+        with self._lock:
+            self._bucket_counts[index] += 1
+            self.count += 1
+            self.total += duration
+            self.max = max(self.max, duration)
+            if failed:
+                self.errors += 1
+
+    def get_cumulative_counts(self):
+        """
+        Returns:
+            List: (upper bound in seconds, number of durations up to the bound) tuples,
+                the last bound is infinity.
+        """
+        with self._lock:
+            bucket_counts = list(self._bucket_counts)
+        cumulative_counts = []
+        count = 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), bucket_counts):
+            count += bucket_count
+            cumulative_counts.append((bound, count))
+        return cumulative_counts
+
+    def get_quantile(self, quantile):
+        """
+        Estimates a quantile of the durations by the upper bound of its bucket.
+
+        Parameters:
+            quantile (float): The quantile, like 0.95.
+
+        Returns:
+            float: The estimated quantile in seconds, the maximal duration when it's above
+                the last bucket, 0 when nothing was recorded yet.
+        """
+        cumulative_counts = self.get_cumulative_counts()
+        rank = quantile * cumulative_counts[-1][1]
+        for bound, count in cumulative_counts:
+            if count and count >= rank:
+                return min(bound, self.max)
+        return 0.0
+
+    def get_stats(self):
+        """
+        Returns the summary of the histogram.
+
+        Returns:
+            Dictionary: `count`, `errors`, `avg_ms`, `p50_ms`, `p95_ms`, `p99_ms`
+                (estimated by the buckets) and `max_ms`.
+        """
+        with self._lock:
+            count, errors, total, maximum = self.count, self.errors, self.total, self.max
+        return {
+            "count": count,
+            "errors": errors,
+            "avg_ms": total / count * 1000 if count else 0.0,
+            "p50_ms": self.get_quantile(0.5) * 1000,
+            "p95_ms": self.get_quantile(0.95) * 1000,
+            "p99_ms": self.get_quantile(0.99) * 1000,
+            "max_ms": maximum * 1000
+        }
+
+# Operation name -> Histogram
+_histograms = {}
+_histograms_lock = threading.Lock()
+
+def _get_histogram(name):
+    """
+    Returns the histogram of an operation, creating it on first use.
+    """
+    histogram = _histograms.get(name)
+    if histogram is None:
+        with _histograms_lock:
+            histogram = _histograms.setdefault(name, Histogram())
+    return histogram
+
+def _record(name, duration, failed):
+    """
+    Records a duration of an operation and prints it when the operation was slow.
+    """
+    _get_histogram(name).observe(duration, failed)
+    if duration * 1000 >= _get_settings()["slow_operation_ms"]:
+        print(f"Slow operation {name}: {duration * 1000:.1f} ms"
+              f"{' (failed)' if failed else ''}", flush=True)
+
+@contextlib.contextmanager
+def _recorded_span(name):
+    """
+    Records the duration of the block as the operation `name`.
+    """
+    start = time.perf_counter()
+    failed = True
+    try:
+        yield
+        failed = False
+    finally:
+        _record(name, time.perf_counter() - start, failed)
+
+_disabled_span = contextlib.nullcontext()
+
+def span(name):
+    """
+    A context manager recording the duration of a block of code as an operation.
+
+    Parameters:
+        name (string): The name of the operation, like "spin_wheel.render".
+
+    Returns:
+        Context manager: Records the duration of the block, does nothing when
+            the instrumentation is off.
+    """
+    if not is_enabled():
+        return _disabled_span
+    return _recorded_span(name)
+
+def timed(name=None):
+    """
+    A decorator recording the durations of every call of a function or a coroutine function.
+
+    Parameters:
+        name (string, optional): The name of the operation.
+            Defaults to the module and the name of the function, like "db_handler.get_stats".
+
+    Returns:
+        Function: The decorator, the decorated function only calls the function
+            when the instrumentation is off.
+    """
+    def decorator(func):
+        operation = name or f"{func.__module__}.{func.__qualname__}"
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if not is_enabled():
+                    return await func(*args, **kwargs)
+                with _recorded_span(operation):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not is_enabled():
+                return func(*args, **kwargs)
+            with _recorded_span(operation):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def get_histograms():
+    """
+    Returns the latency histograms of all the recorded operations.
+
+    Returns:
+        Dictionary: Operation name -> Histogram, sorted by the name.
+    """
+    with _histograms_lock:
+        return dict(sorted(_histograms.items()))
+
+def render_prometheus():
+    """
+    Returns the latency histograms and the failure counters in the Prometheus text format.
+
+    Returns:
+        string: The metrics of all the recorded operations.
+    """
+    histograms = get_histograms()
+    lines = [
+        f"# HELP {METRIC_PREFIX}_duration_seconds Duration of the instrumented operations.",
+        f"# TYPE {METRIC_PREFIX}_duration_seconds histogram"
+    ]
+    for name, histogram in histograms.items():
+        cumulative_counts = histogram.get_cumulative_counts()
+        for bound, count in cumulative_counts:
+            bound_label = "+Inf" if bound == float("inf") else f"{bound:g}"
+            lines.append(f'{METRIC_PREFIX}_duration_seconds_bucket'
+                         f'{{operation="{name}",le="{bound_label}"}} {count}')
+        lines.append(f'{METRIC_PREFIX}_duration_seconds_sum{{operation="{name}"}} '
+                     f'{histogram.total}')
+        lines.append(f'{METRIC_PREFIX}_duration_seconds_count{{operation="{name}"}} '
+                     f'{cumulative_counts[-1][1]}')
+    lines.append(f"# HELP {METRIC_PREFIX}_errors_total Failed calls of the instrumented "
+                 "operations.")
+    lines.append(f"# TYPE {METRIC_PREFIX}_errors_total counter")
+    for name, histogram in histograms.items():
+        lines.append(f'{METRIC_PREFIX}_errors_total{{operation="{name}"}} {histogram.errors}')
+    return "\n".join(lines) + "\n"
+
+def format_histograms():
+    """
+    Returns the summaries of the latency histograms, every operation on its separate line.
+
+    Returns:
+        string: The summaries of all the recorded operations.
+    """
+    lines = []
+    for name, histogram in get_histograms().items():
+        stats = histogram.get_stats()
+        lines.append(
+            f"{name}: {stats['count']} calls, {stats['errors']} failed, "
+            f"avg {stats['avg_ms']:.1f} ms, p50 {stats['p50_ms']:.1f} ms, "
+            f"p95 {stats['p95_ms']:.1f} ms, max {stats['max_ms']:.1f} ms"
+        )
+    return "\n".join(lines)
+
+def _create_metrics_request_handler():
+    """
+    Creates the request handler serving the Prometheus text endpoint on /metrics,
+    http.server is only imported when the endpoint is started.
+    """
+    from http.server import BaseHTTPRequestHandler # pylint: disable=import-outside-toplevel
+
+    class MetricsRequestHandler(BaseHTTPRequestHandler):
+        """
+        This class serves the Prometheus text endpoint on /metrics.
+        """
+
+        def do_GET(self): # pylint: disable=invalid-name
+            """
+            Responds with the metrics on /metrics and with 404 on any other path.
+            """
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args): # pylint: disable=redefined-builtin
+            # Scrapes aren't worth a line in the console
+            pass
+
+    return MetricsRequestHandler
+
+def _log_histograms(interval):
+    """
+    Prints the summaries of the latency histograms every `interval` seconds.
+    """
+    while True:
+        time.sleep(interval)
+        summary = format_histograms()
+        if summary:
+            print(f"Latency of the instrumented operations:\n{summary}", flush=True)
+
+_exporter = None
+_exporter_lock = threading.Lock()
+
+def start_exporter():
+    """
+    Starts exporting the latency histograms in a background thread, only once per process:
+    - INSTRUMENTATION=prometheus: serves them on
+        http://INSTRUMENTATION_HOST:INSTRUMENTATION_PORT/metrics,
+        127.0.0.1:9464 by default, only this machine can scrape it unless the host
+        is set to "0.0.0.0",
+    - INSTRUMENTATION=log: prints them every INSTRUMENTATION_LOG_INTERVAL seconds,
+        60 by default.
+    Does nothing when the instrumentation is off.
+
+    Returns:
+        None
+    """
+    global _exporter # pylint: disable=global-statement
+    with _exporter_lock:
+        if not is_enabled() or _exporter is not None:
+            return
+        if get_mode() == "prometheus":
+            from http.server import ThreadingHTTPServer # pylint: disable=import-outside-toplevel
+            host = get_optional_env_var_value("INSTRUMENTATION_HOST", "127.0.0.1")
+            port = int(get_optional_env_var_value("INSTRUMENTATION_PORT", "9464"))
+            server = ThreadingHTTPServer((host, port), _create_metrics_request_handler())
+            _exporter = threading.Thread(target=server.serve_forever, daemon=True)
+            print(f"Serving the metrics on http://{host}:{port}/metrics")
+        else:
+            interval = float(get_optional_env_var_value("INSTRUMENTATION_LOG_INTERVAL", "60"))
+            _exporter = threading.Thread(target=_log_histograms, args=(interval,), daemon=True)
+        _exporter.start()
@@ -0,0 +1,211 @@
+"""
+last_spin_state.py
+
+Module containing the definition of the LastSpinState class, a write-through
+in-memory copy of the single document in the LastSpin collection.
+
+Main Functions:
+- format_last_spin: Makes a last spin record a string that is easily printable for the user.
+- get_last_spin_state: Returns the shared LastSpinState of the given database.
+
+Dependencies:
+- Requires threading, as the state is shared by the database worker threads.
+"""
+
+import threading
+from datetime import datetime
+
+def format_last_spin(entry):
+    """
+    Makes a last spin record a string that is easily printable for the user.
+
+    Parameters:
+        entry (Dictionary or None): The last spin with `players`, `last_game`
+            and `last_game_date`.
+
+    Returns:
+        String: Every relevant attribute of the last spin in an easily readable form.
+            An empty string when there was no spin yet.
+    """
+    if entry is None:
+        return ""
+    formatted_time = entry['last_game_date'].strftime("%d/%m/%Y %H:%M:%S")
+
+    return str(entry['players']) + " - " + entry['last_game'] + \
+        " [" + formatted_time + "]"
+
+class LastSpinState:
+    """
+    This class represents the state of the last wheel spin.
+
+    The LastSpin document is read from the database only once, every change
+    is written to the database and to the in-memory copy at the same time.
+    """
+
+    def __init__(self, collection):
+        """
+        Initializes the LastSpinState class.
+
+        Parameters:
+            collection (pymongo.collection.Collection): The LastSpin collection.
+        """
+        self._collection = collection
+        self._entry = None
+        self._is_loaded = False
+        self._are_pending_logs_taken = False
+        self._lock = threading.Lock()
+
+    def _get_entry(self):
+        """
+        Returns the cached LastSpin document, reading it on first use.
+        Must be called with the lock held.
+        """
+        if not self._is_loaded:
+            self._entry = self._collection.find_one()
+            self._is_loaded = True
+        return self._entry
+
+    def get_string(self):
+        """
+        Makes the last spin record a string that is easily printable for the user.
+
+        Returns:
+            String: Contains every relevant attribute of the last spin record
+                (`players`, `last_game`, `last_game_date`) in an easily readable form.
+                An empty string when there was no spin yet.
+        """
+        with self._lock:
+            entry = self._get_entry()
+        return format_last_spin(entry)
+
+    def is_inserted(self):
+        """
+        Checks whether the last spin was already inserted into the logs.
+
+        Returns:
+            tuple: A tuple containing:
+                - bool: A boolean indicating whether the last spin was already inserted
+                    into the logs (True when there was no spin yet).
+                - entry (dictionary): A copy of the last spin document, None when there
+                    was no spin yet.
+        """
+        with self._lock:
+            entry = self._get_entry()
+        if entry is None:
+            return True, None
+        return entry["is_inserted"], dict(entry)
+
+    def update(self, game, players, time=None):
+        """
+        Stores a new spin as the last spin by a single write.
+
+        Parameters:
+            game (string): The name of the game that was rolled during the spin.
+            players (List): The list of players who participated in the wheel spin.
+            time (datetime, optional): The time of the spin. Defaults to now.
+
+        Returns:
+            None
+        """
+        time = time or datetime.now()
+        values = {
+            "last_game": game,
+            # MongoDB keeps milliseconds, so the cached copy must match the stored date
+            "last_game_date": time.replace(microsecond=time.microsecond // 1000 * 1000),
+            "players": players,
+            "is_inserted": False
+        }
+        # There is a single document in the collection, so no filter is needed
+        self._collection.update_one({}, {"$set": values}, upsert=True)
+        with self._lock:
+            entry = dict(self._entry or {})
+            entry.update(values)
+            self._entry = entry
+            self._is_loaded = True
+
+    def mark_inserted(self, result):
+        """
+        Atomically marks the last spin as inserted into the logs and keeps its log,
+        with the result, in the list of pending logs of the same document,
+        all by a single write.
+
+        Only one caller (across all processes) gets the log back, so the same spin
+        can't be logged twice. The pending log stays in the document until
+        mark_logged is called, so a log lost by a crash can be written later.
+
+        Parameters:
+            result (string): The result of the played game. Either "W" or "L" (Win/Lose).
+
+        Returns:
+            Dictionary or None: The log of the last spin (`game_date`, `game`, `result`
+                and `players`), None when it was already marked as inserted.
+        """
+        with self._lock:
+            entry = self._get_entry()
+        if entry is None or entry["is_inserted"]:
+            return None
+        log = {
+            "game_date": entry["last_game_date"],
+            "game": entry["last_game"],
+            "result": result,
+            "players": entry["players"]
+        }
+        # Only flips the spin this process knows, not a newer spin of another process
+        flipped = self._collection.find_one_and_update(
+            {"is_inserted": False, "last_game_date": entry["last_game_date"]},
+            {"$set": {"is_inserted": True}, "$push": {"pending_logs": log}},
+            projection={"_id": 1}
+        )
+        with self._lock:
+            if self._entry is not None:
+                # Either flipped now or someone else inserted it already
+                self._entry["is_inserted"] = True
+        return log if flipped is not None else None
+
+    def take_pending_logs(self):
+        """
+        Returns the pending logs found in the document when it was read from the database,
+        only on the first call, so they are written only once per process.
+
+        Returns:
+            List: The logs that were marked as inserted but not written into the logs yet.
+        """
+        with self._lock:
+            entry = self._get_entry()
+            if self._are_pending_logs_taken or entry is None:
+                return []
+            self._are_pending_logs_taken = True
+            return list(entry.get("pending_logs", []))
+
+    def mark_logged(self, log):
+        """
+        Removes a written log from the pending logs.
+
+        Parameters:
+            log (Dictionary): The log returned by mark_inserted or take_pending_logs.
+
+        Returns:
+            None
+        """
+        self._collection.update_one(
+            {}, {"$pull": {"pending_logs": {"game_date": log["game_date"], "game": log["game"]}}}
+        )
+
+_states = {}
+_states_lock = threading.Lock()
+
+def get_last_spin_state(db):
+    """
+    Returns the shared LastSpinState of the given database, creating it on first use.
+
+    Parameters:
+        db (pymongo.mongo_client.MongoClient):
+            An instance of a MongoClient connected to the specified database.
+
+    Returns:
+        LastSpinState: The state shared by the whole process.
+    """
+    with _states_lock:
+        if db.name not in _states:
+            _states[db.name] = LastSpinState(db["LastSpin"])
+        return _states[db.name]
@@ -0,0 +1,224 @@
+"""
+list_document_store.py
+
+Module containing the definition of the SortedListStore class, a sorted list of unique
+strings (like the names of GTA races) kept in the documents of a MongoDB collection.
+
+The list is split into bucket documents, each holding a sorted range of the items
+starting at its `first` bound, so no document gets near the BSON size limit.
+Adding items merges them into the buckets on the server by a single round trip,
+membership is answered by a multikey index and prefix queries by an anchored regular
+expression on the same index, so the whole list is never loaded by the client.
+
+Dependencies:
+- Requires pymongo for MongoDB interactions (MongoDB 5.2+ for `$sortArray`).
+- Requires bisect to route the items into the buckets.
+"""
+
+import re
+import bisect
+from pymongo import IndexModel, UpdateOne
+
+# Buckets are split once they may be larger than this, half of the 16 MB BSON limit,
+# so a single add can't push a bucket over the limit
+MAX_BUCKET_BYTES = 8 * 1024 * 1024
+# Estimated BSON overhead of a single array item (type, index key and terminators)
+ITEM_OVERHEAD_BYTES = 16
+# The bound of the first bucket, lower than any string
+FIRST_BOUND = ""
+
+def _get_item_bytes(item):
+    """
+    Estimates the BSON size of a single array item.
+    """
+    return len(item.encode("utf-8")) + ITEM_OVERHEAD_BYTES
+
+def _make_add_pipeline(items):
+    """
+    Creates an update pipeline merging the items into the sorted, deduplicated list of a bucket.
+    """
+    merged_list = {"$setUnion": [{"$ifNull": ["$list", []]}, {"$literal": items}]}
+    return [
+        {"$set": {"list": {"$sortArray": {"input": merged_list, "sortBy": 1}}}},
+        {"$set": {"bytes": {"$bsonSize": "$$ROOT"}}}
+    ]
+
+class SortedListStore:
+    """
+    This class represents a sorted list of unique strings split into bucket documents.
+
+    The bounds of the buckets are read once and kept in memory. The store expects
+    to be the only writer of its collection while it is in use.
+    """
+
+    def __init__(self, collection, max_bucket_bytes=MAX_BUCKET_BYTES):
+        """
+        Initializes the SortedListStore class.
+
+        Parameters:
+            collection (pymongo.collection.Collection): The collection with the buckets.
+            max_bucket_bytes (int, optional): Buckets larger than this are split.
+        """
+        self._collection = collection
+        self.max_bucket_bytes = max_bucket_bytes
+        # Sorted `first` bounds of the buckets, None until loaded
+        self._bounds = None
+        # `first` bound -> estimated size of the bucket in bytes
+        self._sizes = {}
+
+    def ensure_indexes(self):
+        """
+        Creates the indexes of the buckets, a unique one on the bounds
+        and a multikey one on the items.
+
+        Returns:
+            None
+        """
+        self._collection.create_indexes([
+            IndexModel([("first", 1)], unique=True),
+            IndexModel([("list", 1)])
+        ])
+
+    def _upgrade_legacy_document(self):
+        """
+        Turns a single list document written before the buckets existed
+        into the first bucket, sorting and deduplicating its list.
+        """
+        self._collection.update_one({"first": {"$exists": False}}, [
+            {"$set": {
+                "first": FIRST_BOUND,
+                "list": {"$sortArray": {
+                    "input": {"$setUnion": [{"$ifNull": ["$list", []]}, []]},
+                    "sortBy": 1
+                }}
+            }},
+            {"$set": {"bytes": {"$bsonSize": "$$ROOT"}}}
+        ])
+
+    def _load_buckets(self):
+        """
+        Reads the bounds and sizes of the buckets.
+        """
+        self.ensure_indexes()
+        buckets = list(self._collection.find({}, {"first": 1, "bytes": 1}))
+        if any("first" not in bucket for bucket in buckets):
+            self._upgrade_legacy_document()
+            buckets = list(self._collection.find({}, {"first": 1, "bytes": 1}))
+
+        self._sizes = {bucket["first"]: bucket.get("bytes", 0) for bucket in buckets}
+        self._sizes.setdefault(FIRST_BOUND, 0)
+        self._bounds = sorted(self._sizes)
+
+    def _get_bound(self, item):
+        """
+        Returns the bound of the bucket the item belongs to.
+        """
+        return self._bounds[bisect.bisect_right(self._bounds, item) - 1]
+
+    def add_many(self, items):
+        """
+        Adds items into the list by a single round trip, keeping it sorted and without
+        duplicates. Buckets that may have grown too large are split afterwards.
+
+        Parameters:
+            items (Iterable): The strings to be added.
+
+        Returns:
+            bool: Whether any bucket was changed (False when all the items were already there).
+        """
+        items = set(items)
+        if not items:
+            return False
+        if self._bounds is None:
+            self._load_buckets()
+
+        groups = {}
+        for item in items:
+            groups.setdefault(self._get_bound(item), []).append(item)
+        result = self._collection.bulk_write([
+            UpdateOne({"first": bound}, _make_add_pipeline(sorted(group)), upsert=True)
+            for bound, group in groups.items()
+        ], ordered=False)
+
+        for bound, group in groups.items():
+            # Pessimistic, the items might have been there already
+            self._sizes[bound] += sum(_get_item_bytes(item) for item in group)
+            if self._sizes[bound] > self.max_bucket_bytes:
+                self._split_bucket(bound)
+        return result.modified_count + result.upserted_count > 0
+
+    def _split_bucket(self, bound):
+        """
+        Splits a bucket into buckets of about half of the maximal size.
+        """
+        items = self._collection.find_one({"first": bound}, {"list": 1})["list"]
+        parts = [[]]
+        part_bytes = [0]
+        for item in items:
+            if part_bytes[-1] > self.max_bucket_bytes // 2:
+                parts.append([])
+                part_bytes.append(0)
+            parts[-1].append(item)
+            part_bytes[-1] += _get_item_bytes(item)
+
+        # The new buckets are written before the items are removed from the split one,
+        # so no item is ever missing
+        operations = [
+            UpdateOne({"first": part[0]}, {"$set": {"list": part, "bytes": size}}, upsert=True)
+            for part, size in zip(parts[1:], part_bytes[1:])
+        ]
+        operations.append(UpdateOne(
+            {"first": bound}, {"$set": {"list": parts[0], "bytes": part_bytes[0]}}
+        ))
+        self._collection.bulk_write(operations, ordered=True)
+
+        self._sizes[bound] = part_bytes[0]
+        for part, size in zip(parts[1:], part_bytes[1:]):
+            self._sizes[part[0]] = size
+        self._bounds = sorted(self._sizes)
+
+    def contains(self, item):
+        """
+        Checks whether the item is in the list by a single indexed query.
+
+        Parameters:
+            item (string): The string to be found.
+
+        Returns:
+            bool: Whether the item is in the list.
+        """
+        return self._collection.find_one({"list": item}, {"_id": 1}) is not None
+
+    def find_prefix(self, prefix, limit=None):
+        """
+        Finds the items starting with a prefix, without loading the whole list.
+
+        Parameters:
+            prefix (string): The prefix of the items.
+            limit (int, optional): The maximum number of returned items.
+
+        Returns:
+            List: The sorted matching items.
+        """
+        # An anchored regular expression only reads the matching range of the index
+        pattern = {"$regex": "^" + re.escape(prefix)}
+        pipeline = [
+            {"$match": {"list": pattern}},
+            {"$unwind": "$list"},
+            {"$match": {"list": pattern}},
+            {"$sort": {"list": 1}}
+        ]
+        if limit is not None:
+            pipeline.append({"$limit": limit})
+        pipeline.append({"$project": {"_id": 0, "item": "$list"}})
+        return [entry["item"] for entry in self._collection.aggregate(pipeline)]
+
+    def iter_items(self):
+        """
+        Yields all the items in order, one bucket at a time.
+
+        Yields:
+            String: The items of the list.
+        """
+        for bucket in self._collection.find({}, {"list": 1}).sort("first", 1):
+            yield from bucket.get("list", [])
@@ -0,0 +1,151 @@
+"""
+migration_runner.py
+
+Runs collection migrations, reshaping the documents of a source collection into a target
+collection, without loading the whole source collection into memory.
+
+The source documents are streamed from a cursor in the `_id` order, turned into write
+operations by a MigrationStep and written in bounded bulk writes. After every chunk,
+the last migrated `_id` is saved into the Migrations collection, so an interrupted run
+resumes from where it stopped. The write operations of a step must be idempotent
+(like `$addToSet` or upserts), as the chunk being written during an interruption
+is written again when resuming.
+
+Main Functions:
+- run_migration: Runs a single migration step, resuming it from its checkpoint.
+- reset_migration: Forgets the checkpoint of a migration step.
+
+Dependencies:
+- Requires pymongo for MongoDB interactions.
+"""
+
+import time
+from datetime import datetime
+
+# Number of source documents read by a single round trip
+MIGRATION_BATCH_SIZE = 1000
+# The collection with the checkpoints of all migration steps
+CHECKPOINT_COLLECTION = "Migrations"
+
+class MigrationStep:
+    """
+    This class represents a single reshape of a source collection into a target collection.
+    """
+
+    def __init__(self, name, source, target, transform, projection=None, finalize=None):
+        """
+        Initializes the MigrationStep class.
+
+        Parameters:
+            name (string): Unique name of the step, identifies its checkpoint.
+            source (string): Name of the source collection.
+            target (string): Name of the target collection.
+            transform (callable): Takes a list of source documents and the target
+                collection and returns a list of idempotent pymongo write operations
+                (like UpdateOne) for the target. It may also write into the target itself
+                and return an empty list.
+            projection (Dictionary, optional): The source fields to be read.
+                Defaults to all fields.
+            finalize (callable, optional): Called with the target collection
+                once all the source documents are migrated.
+        """
+        self.name = name
+        self.source = source
+        self.target = target
+        self.transform = transform
+        self.projection = projection
+        self.finalize = finalize
+
+def _print_progress(step, processed, rows_per_second):
+    """
+    Prints the progress of a migration step.
+    """
+    print(f"{step.name}: {processed} documents ({rows_per_second:,.0f} rows/s)")
+
+def reset_migration(db, step):
+    """
+    Forgets the checkpoint of a migration step, so its next run starts from the beginning.
+
+    Parameters:
+        db (pymongo.mongo_client.MongoClient):
+            An instance of a MongoClient connected to the specified database.
+        step (MigrationStep): The migration step.
+
+    Returns:
+        None
+    """
+    db[CHECKPOINT_COLLECTION].delete_one({"_id": step.name})
+
+def _save_checkpoint(checkpoints, step, last_id, processed, completed=False):
+    """
+    Saves the last migrated `_id` of a migration step.
+    """
+    checkpoints.update_one(
+        {"_id": step.name},
+        {"$set": {
+            "last_id": last_id,
+            "processed": processed,
+            "completed": completed,
+            "updated_at": datetime.now()
+        }},
+        upsert=True
+    )
+
+def run_migration(db, step, batch_size=MIGRATION_BATCH_SIZE, report=_print_progress):
+    """
+    Runs a single migration step, resuming it from its checkpoint.
+
+    Parameters:
+        db (pymongo.mongo_client.MongoClient):
+            An instance of a MongoClient connected to the specified database.
+        step (MigrationStep): The migration step.
+        batch_size (int, optional): Number of source documents read and written at once.
+        report (callable, optional): Called with the step, the number of processed
+            documents and the rows per second after every chunk. Prints them by default.
+
+    Returns:
+        tuple: A tuple containing:
+            - int: The number of documents processed by this run.
+            - float: The number of processed documents per second.
+    """
+    checkpoints = db[CHECKPOINT_COLLECTION]
+    checkpoint = checkpoints.find_one({"_id": step.name}) or {}
+    if checkpoint.get("completed"):
+        return 0, 0.0
+
+    query = {}
+    if checkpoint.get("last_id") is not None:
+        query = {"_id": {"$gt": checkpoint["last_id"]}}
+    previously_processed = checkpoint.get("processed", 0)
+    target = db[step.target]
+
+    start = time.perf_counter()
+    processed = 0
+    last_id = checkpoint.get("last_id")
+    chunk = []
+
+    def write_chunk():
+        operations = step.transform(chunk, target)
+        if operations:
+            target.bulk_write(operations, ordered=False)
+        _save_checkpoint(checkpoints, step, last_id, previously_processed + processed)
+        elapsed = time.perf_counter() - start
+        report(step, previously_processed + processed, processed / elapsed if elapsed else 0.0)
+        chunk.clear()
+
+    cursor = db[step.source].find(query, step.projection).sort("_id", 1).batch_size(batch_size)
+    for document in cursor:
+        chunk.append(document)
+        last_id = document["_id"]
+        processed += 1
+        if len(chunk) >= batch_size:
+            write_chunk()
+    if chunk:
+        write_chunk()
+
+    if step.finalize is not None:
+        step.finalize(target)
+    _save_checkpoint(checkpoints, step, last_id, previously_processed + processed, completed=True)
+
+    elapsed = time.perf_counter() - start
+    return processed, processed / elapsed if elapsed else 0.0
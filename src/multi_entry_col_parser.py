@@ -1,74 +1,113 @@
 """
 multi_entry_col_parser.py
 
-Re-parses already existing Collection with multiple entries into a single document collection.
+Re-parses already existing Collection with multiple entries into a sorted list collection.
+
+The source collection is streamed by migration_runner in batches, so it is never held
+in memory as a whole, and an interrupted run resumes from its last checkpoint.
 
 Main Functions:
-- parse_entries: Establishes a connection to the MongoDB database.
-- append_to_array: Retrieves a list of all games from the database.
+- parse_entries: Yields the value of the specified key of every document.
+- add_parsed_entries: Adds the parsed values of a batch of documents into the sorted list.
+- append_to_array: Adds race names into the sorted list of race names.
 
 Dependencies:
 - Requires `connect_to_db` from `db_handler` for establishing connection to MongoDB.
+- Requires migration_runner for streaming the source collection.
+- Requires list_document_store for keeping the list sorted and split into buckets.
 """
 
+import argparse
 from db_handler import connect_to_db
+from list_document_store import SortedListStore
+from migration_runner import MigrationStep, MIGRATION_BATCH_SIZE, run_migration, reset_migration
+
+# Collection name -> the SortedListStore of the collection
+_stores = {}
+
+def parse_entries(documents, key="race_name"):
+    """
+    From documents, yields each value of specified key, without new lines.
+    Documents without the key are skipped.
+
+    Parameters:
+        documents (Iterable): The MongoDB documents to be parsed, like a cursor.
+        key (string): The key name.
+
+    Yields:
+        String: The value of the key.
+    """
+    for entry in documents:
+        value = entry.get(key)
+        if value is not None:
+            # Replace new lines
+            yield value.replace('\n', '')
 
-def parse_entries(import_collection, key="race_name"):
+def add_parsed_entries(documents, target, key="race_name"):
     """
-    From collection, parses each value of specified key of all documents into a list.
+    Adds the parsed values of a batch of documents into the sorted list of the target collection.
+    Adding into the list ignores duplicates, so it is safe to repeat when a migration is resumed.
 
     Parameters:
-        import_collection (pymongo.collection.Collection):
-            The MongoDB collection with documents to be parsed.
+        documents (List): The MongoDB documents to be parsed.
+        target (pymongo.collection.Collection): The collection with the list.
         key (string): The key name.
-    
+
     Returns:
-        Dictionary: A simple dictionary representing a MongoDB document containing the list. 
+        List: No write operations, the values are added by the list store.
     """
-    tmp_array = []
-    for entry in import_collection.find():
-        tmp_array.append(entry.get(key))
-    # Replace new lines
-    tmp_array = [entry.replace('\n', '') for entry in tmp_array]
-    document = {
-        'list': tmp_array
-    }
-    return document
+    append_to_array(parse_entries(documents, key), target)
+    return []
 
 def append_to_array(race_name, collection):
     """
-    Takes target collection and expected Race Name, appends it to the array, sorts it alphabetically
-    and modifies the document, in this manner, via code. Modification CAN BE DONE via MongoDB admin.
+    Takes target collection and expected Race Names and adds them into the alphabetically
+    sorted list of race names, skipping the names already there, by a single round trip.
+    Modification CAN BE DONE via MongoDB admin.
 
     Parameters:
-        race_name (string): The name of the race to be added into the collection.
+        race_name (Iterable): The names of the races to be added into the collection.
         collection (pymongo.collection.Collection): The MongoDB collection.
-    
+
     Returns:
-        None
+        bool: Whether any name was added.
     """
-    collection.update_one({}, {'$push': {'list': {'$each': race_name}}})
-    collection.update_one({}, {'$push': {'list': {'$each': [], '$sort': 1}}})
+    if collection.full_name not in _stores:
+        _stores[collection.full_name] = SortedListStore(collection)
+    return _stores[collection.full_name].add_many(race_name)
+
+# Parses the GTA races into the sorted list of race names
+GTA_RACES_MIGRATION = MigrationStep(
+    name="gta_races_list",
+    source="GTARaces",
+    target="GTARacesPrototype",
+    transform=add_parsed_entries,
+    projection={"race_name": 1}
+)
 
 def main():
     """
     The main entry point of the script.
 
-    Defines the `import_collection` from which will the documents be parsed into a list.
-    That list will then be inserted into the `export_collection` adn sorted alphabetically.
+    Parses the documents of the `GTARaces` collection into the alphabetically sorted list
+    of the `GTARacesPrototype` collection.
+    An interrupted run continues where it stopped.
 
     Returns:
-        None 
+        None
     """
-    db = connect_to_db()
-    import_collection = db['GTARaces']
-    export_collection = db['GTARacesPrototype']
+    parser = argparse.ArgumentParser(description="Parse GTARaces into a sorted list of race names.")
+    parser.add_argument("--batch-size", type=int, default=MIGRATION_BATCH_SIZE,
+                        help="Number of documents read and written at once.")
+    parser.add_argument("--restart", action="store_true",
+                        help="Ignore the checkpoint of a previous run and start over.")
+    args = parser.parse_args()
 
-    export_collection.insert_one(document=parse_entries(import_collection))
-
-    # Call with empty list will simply sort the array in the document
-    # Specify Race names AS A LIST, and the target Collection
-    append_to_array([], db['GTARacesPrototype'])
+    db = connect_to_db()
+    if args.restart:
+        reset_migration(db, GTA_RACES_MIGRATION)
+    processed, rows_per_second = run_migration(db, GTA_RACES_MIGRATION, args.batch_size)
+    print(f"Migrated {processed} documents ({rows_per_second:,.0f} rows/s).")
 
 if __name__ == '__main__':
     main()
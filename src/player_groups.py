@@ -0,0 +1,144 @@
+"""
+player_groups.py
+
+Module containing the definition of the PlayerGroupIndex class, an index of the games
+every group of players may play.
+
+The groups of a game (Game.players) are strings of player codes like "DK" or "DKKA",
+the player codes are derived from the groups by game.get_player_codes.
+Every player code is mapped to a bit, so a group is a single integer bitmask regardless
+of the order of its players, and the games are indexed by the masks of their groups.
+Finding the games of a group is then a single dictionary lookup instead of scanning
+the group strings of every game.
+
+Main Functions:
+- parse_group: Splits a group string into its player codes.
+
+Dependencies:
+- Requires game for the player codes.
+"""
+
+from game import get_player_codes
+
+def parse_group(group, player_codes=None):
+    """
+    Splits a group string into its player codes, preferring the longest codes,
+    so "DKKA" is "D", "K" and "KA". A letter that isn't the start of any code
+    is a player on its own.
+
+    Parameters:
+        group (string): The group of players, like "DKKA".
+        player_codes (Iterable, optional): The codes of the players.
+            Defaults to game.get_player_codes().
+
+    Returns:
+        List: The player codes of the group in their order.
+    """
+    if player_codes is None:
+        player_codes = get_player_codes()
+    # The longest codes are matched first, single letters need no matching
+    codes = sorted((code for code in player_codes if len(code) > 1), key=len, reverse=True)
+    players = []
+    index = 0
+    while index < len(group):
+        player = next((code for code in codes if group.startswith(code, index)), group[index])
+        players.append(player)
+        index += len(player)
+    return players
+
+class PlayerGroupIndex:
+    """
+    This class represents the games every group of players may play, indexed by
+    the bitmasks of the groups.
+    """
+
+    def __init__(self, games, player_codes=None):
+        """
+        Initializes the PlayerGroupIndex class.
+
+        Parameters:
+            games (list[game.Game]): The games with their groups of players.
+            player_codes (Iterable, optional): The codes of the players.
+                Defaults to the codes derived from the groups of `games`.
+        """
+        self.player_codes = tuple(
+            get_player_codes(games) if player_codes is None else player_codes
+        )
+        # Player code -> bit of the player
+        self._player_bits = {}
+        # Game name -> set of the masks of the groups that may play it
+        self.game_masks = {}
+        # Group mask -> games the group may play, in the order of `games`
+        self._eligible_games = {}
+
+        for _game in games:
+            masks = set()
+            for group in _game.players:
+                masks.add(self._add_group(group))
+            self.game_masks[_game.name] = masks
+            for mask in masks:
+                self._eligible_games.setdefault(mask, []).append(_game)
+
+    def _add_group(self, group):
+        """
+        Returns the mask of a group, assigning bits to its new players.
+        """
+        mask = 0
+        for player in parse_group(group, self.player_codes):
+            if player not in self._player_bits:
+                self._player_bits[player] = 1 << len(self._player_bits)
+            mask |= self._player_bits[player]
+        return mask
+
+    @property
+    def players(self):
+        """
+        List: The codes of all the indexed players, in the order of their bits.
+        """
+        return list(self._player_bits)
+
+    def get_group_mask(self, players):
+        """
+        Returns the bitmask of a group of players.
+
+        Parameters:
+            players (string or Iterable): A group string like "DKKA" or the player codes.
+
+        Returns:
+            int or None: The mask of the group, None when any of the players isn't in any
+                group of the indexed games.
+        """
+        if isinstance(players, str):
+            players = parse_group(players, self.player_codes)
+        mask = 0
+        for player in players:
+            bit = self._player_bits.get(player)
+            if bit is None:
+                return None
+            mask |= bit
+        return mask
+
+    def get_eligible_games(self, players):
+        """
+        Returns the games a group of players may play.
+
+        Parameters:
+            players (string or Iterable): A group string like "DKKA" or the player codes.
+
+        Returns:
+            list[game.Game]: A new list of the games of the group, in the indexed order.
+        """
+        return list(self._eligible_games.get(self.get_group_mask(players), []))
+
+    def is_eligible(self, game_name, players):
+        """
+        Checks whether a group of players may play a game.
+
+        Parameters:
+            game_name (string): The name of the game.
+            players (string or Iterable): A group string like "DKKA" or the player codes.
+
+        Returns:
+            Bool: Indication whether the group may play the game.
+        """
+        return self.get_group_mask(players) in self.game_masks.get(game_name, ())
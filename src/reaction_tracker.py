@@ -0,0 +1,160 @@
+"""
+reaction_tracker.py
+
+Module containing the definition of the ReactionTracker class, which keeps
+track of users reacting to the messages sent by the Discord bot.
+
+The tracker is fed by the gateway reaction events, so the question "who reacted"
+is answered from memory instead of fetching the message and every reaction list.
+"""
+
+from collections import OrderedDict
+
+# Maximum number of messages tracked at the same time, the oldest ones are evicted first
+MAX_TRACKED_MESSAGES = 50
+
+class TrackedMessage:
+    """
+    This class represents the reactions state of a single tracked message.
+    """
+
+    def __init__(self, is_synced):
+        """
+        Initializes the TrackedMessage class.
+
+        Parameters:
+            is_synced (bool): Whether the state is complete, meaning it can be used
+                without fetching the reactions from Discord.
+        """
+        self.is_synced = is_synced
+        # User ID -> user name
+        self.names = {}
+        # User ID -> number of reactions the user has on the message
+        self.reaction_counts = {}
+
+class ReactionTracker:
+    """
+    This class represents a registry of tracked messages and the users reacting to them.
+    """
+
+    def __init__(self, max_messages=MAX_TRACKED_MESSAGES):
+        """
+        Initializes the ReactionTracker class.
+
+        Parameters:
+            max_messages (int, optional): Maximum number of tracked messages.
+                Defaults to MAX_TRACKED_MESSAGES.
+        """
+        self.max_messages = max_messages
+        self._messages = OrderedDict()
+
+    def _store(self, message_id, tracked_message):
+        """
+        Stores a tracked message, evicting the oldest ones over the limit.
+        """
+        self._messages[message_id] = tracked_message
+        self._messages.move_to_end(message_id)
+        while len(self._messages) > self.max_messages:
+            self._messages.popitem(last=False)
+
+    def track(self, message_id):
+        """
+        Starts tracking a newly sent message. A new message has no reactions yet,
+        so its state is complete right away.
+
+        Parameters:
+            message_id (int): The message's Discord ID.
+
+        Returns:
+            None
+        """
+        self._store(message_id, TrackedMessage(is_synced=True))
+
+    def add_reaction(self, message_id, user_id, user_name):
+        """
+        Records a reaction added to a message. Ignores messages that aren't tracked.
+
+        Parameters:
+            message_id (int): The message's Discord ID.
+            user_id (int): The Discord ID of the reacting user.
+            user_name (string or None): The Discord name of the reacting user,
+                None when the gateway event didn't contain it.
+
+        Returns:
+            None
+        """
+        tracked_message = self._messages.get(message_id)
+        if tracked_message is None:
+            return
+        if user_name is None:
+            # Without a name the state can't be used, fetch it again next time
+            tracked_message.is_synced = False
+            return
+        tracked_message.names[user_id] = user_name
+        tracked_message.reaction_counts[user_id] = (
+            tracked_message.reaction_counts.get(user_id, 0) + 1
+        )
+
+    def remove_reaction(self, message_id, user_id):
+        """
+        Records a reaction removed from a message. The user stops being a participant
+        only when they have no reactions left on the message.
+
+        Parameters:
+            message_id (int): The message's Discord ID.
+            user_id (int): The Discord ID of the user.
+
+        Returns:
+            None
+        """
+        tracked_message = self._messages.get(message_id)
+        if tracked_message is None or user_id not in tracked_message.reaction_counts:
+            return
+        tracked_message.reaction_counts[user_id] -= 1
+        if tracked_message.reaction_counts[user_id] <= 0:
+            del tracked_message.reaction_counts[user_id]
+            del tracked_message.names[user_id]
+
+    def set_users(self, message_id, users):
+        """
+        Replaces the state of a message with a freshly fetched one and (re)starts tracking it.
+
+        Parameters:
+            message_id (int): The message's Discord ID.
+            users (Dictionary): User ID -> (user name, number of reactions of the user).
+
+        Returns:
+            None
+        """
+        tracked_message = TrackedMessage(is_synced=True)
+        for user_id, (user_name, reaction_count) in users.items():
+            tracked_message.names[user_id] = user_name
+            tracked_message.reaction_counts[user_id] = reaction_count
+        self._store(message_id, tracked_message)
+
+    def get_users(self, message_id):
+        """
+        Returns the names of the users that reacted to a message.
+
+        Parameters:
+            message_id (int): The message's Discord ID.
+
+        Returns:
+            List or None: A list of user names, or None when the message isn't tracked
+                or its state isn't complete and has to be fetched from Discord.
+        """
+        tracked_message = self._messages.get(message_id)
+        if tracked_message is None or not tracked_message.is_synced:
+            return None
+        return list(tracked_message.names.values())
+
+    def mark_all_unsynced(self):
+        """
+        Marks every tracked message as incomplete, used after the gateway connection
+        was lost and reaction events could have been missed.
+
+        Returns:
+            None
+        """
+        for tracked_message in self._messages.values():
+            tracked_message.is_synced = False
@@ -0,0 +1,138 @@
+"""
+spin_engine.py
+
+The wheel spinning logic, independent of any UI.
+
+Computes the winning game of a spin together with a precomputed frame schedule,
+telling which game is highlighted in each frame and when (as a `time.monotonic()` timestamp).
+The GUI, a bot-only mode or a test can then replay the schedule. The frames are scheduled
+against the clock, so a spin lasts the same time no matter how slow the rendering is.
+
+Main Functions:
+- choose_winning_game:
+    Randomly chooses one game out of a list of Game objects based on their desire percentage.
+- compute_spin_schedule: Computes the frames of a spin ending on the winning game.
+- plan_spin: Chooses the winning game and computes the frames of the spin.
+
+Dependencies:
+- Requires alias_sampler for the weighted random choice of the winning game.
+"""
+
+import time
+import random
+from collections import namedtuple
+from alias_sampler import get_sampler
+
+# The delay between the first two frames of a spin in seconds
+INITIAL_INTERVAL = 0.01
+# The increase of the delay after each frame in seconds, mimicking a slowing down wheel
+INTERVAL_STEP = 0.02
+# Range of the delay between frames (in seconds) the wheel has to reach before it may stop
+MIN_STOPPING_INTERVAL = 0.3
+MAX_STOPPING_INTERVAL = 0.8
+
+# A single frame of a spin, highlighting the game at `item_index` at `target_time`
+SpinFrame = namedtuple("SpinFrame", ["index", "item_index", "target_time"])
+
+class SpinSchedule:
+    """
+    This class represents a planned spin of the wheel.
+    """
+
+    def __init__(self, winner, winner_index, frames):
+        """
+        Initializes the SpinSchedule class.
+
+        Parameters:
+            winner (game.Game): The winning game.
+            winner_index (int): The index of the winning game in the spun list of games.
+            frames (list[SpinFrame]): The frames of the spin, the last one shows the winner.
+        """
+        self.winner = winner
+        self.winner_index = winner_index
+        self.frames = frames
+
+    @property
+    def duration(self):
+        """
+        float: The time from the first to the last frame in seconds.
+        """
+        return self.frames[-1].target_time - self.frames[0].target_time
+
+def choose_winning_game(games, rng=None):
+    """
+    Randomly chooses one game out of a list of Game objects based on their
+    desire percentage.
+
+    The alias sampler of the percentages is built only once for every set of percentages,
+    each choice then takes constant time.
+
+    Parameters:
+        games (list[game.Game]): A list of games represented by Game objects.
+        rng (random.Random, optional): The random number generator to be used.
+            Defaults to the sampler's own generator.
+
+    Returns:
+        game.Game: A randomly chosen Game object.
+    """
+    return games[_choose_winning_index(games, rng)]
+
+def _choose_winning_index(games, rng=None):
+    """
+    Randomly chooses the index of the winning game based on the games desire percentage.
+    """
+    sampler = get_sampler(tuple(_game.percentage for _game in games))
+    return sampler.draw(rng)
+
+def compute_spin_schedule(items_count, winner_index, start_time=0.0, rng=None):
+    """
+    Computes the frames of a spin.
+
+    The wheel moves by one item each frame, with the delay between frames growing
+    by INTERVAL_STEP. Once the delay exceeds a random stopping interval,
+    the wheel stops at the winning item.
+
+    Parameters:
+        items_count (int): The number of items on the wheel.
+        winner_index (int): The index of the item the wheel stops at.
+        start_time (float, optional): The timestamp of the first frame.
+        rng (random.Random, optional): The random number generator to be used.
+            Defaults to the `random` module.
+
+    Returns:
+        list[SpinFrame]: The frames of the spin, the last one highlights the winner.
+    """
+    rng = rng or random
+    stopping_interval = rng.uniform(MIN_STOPPING_INTERVAL, MAX_STOPPING_INTERVAL)
+    interval = INITIAL_INTERVAL
+    frame_time = start_time
+    frames = []
+
+    while True:
+        # Each loop represents a full turn of the wheel
+        for item_index in range(items_count):
+            frames.append(SpinFrame(len(frames), item_index, frame_time))
+            # After the wheel slowed down enough stop at the winner
+            if interval > stopping_interval and item_index == winner_index:
+                return frames
+            frame_time += interval
+            interval += INTERVAL_STEP
+
+def plan_spin(games, start_time=None, rng=None):
+    """
+    Chooses the winning game and computes the frames of the spin.
+
+    Parameters:
+        games (list[game.Game]): The games on the wheel.
+        start_time (float, optional): The timestamp of the first frame.
+            Defaults to the current `time.monotonic()`.
+        rng (random.Random, optional): The random number generator used for the whole spin.
+
+    Returns:
+        SpinSchedule: The winning game and the frames of the spin.
+    """
+    if start_time is None:
+        start_time = time.monotonic()
+    winner_index = _choose_winning_index(games, rng)
+    frames = compute_spin_schedule(len(games), winner_index, start_time, rng)
+    return SpinSchedule(games[winner_index], winner_index, frames)
@@ -0,0 +1,233 @@
+"""
+spin_simulator.py
+
+A headless Monte Carlo simulator of the wheel spins, running without PySimpleGUI or Discord.
+
+Filters the games the same way PLAY REACTION does (only the games every player of the group
+has in their list of games), optionally only to the games allowed for a group of players,
+then runs millions of spins with the same weighted selection as `choose_winning_game`.
+Reports the empirical distribution against the configured weights, the chi-square deviation
+and the number of spins per second.
+Used to check weighting changes and to catch performance regressions of the selection.
+
+Main Functions:
+- load_games: Loads the games and their weights from a JSON file or the database.
+- filter_common_games: Keeps only the games every player of the group has in common.
+- simulate_spins: Runs the spins, optionally spread over a process pool.
+- chi_square_test: Computes the chi-square statistic and its p-value.
+- main: The command-line interface of the simulator.
+
+Dependencies:
+- Requires alias_sampler for the weighted selection (vectorized when numpy is installed).
+- Requires player_groups to keep only the games allowed for a group of players.
+- Requires db_handler only when the games or players are loaded from the database.
+"""
+
+import sys
+import math
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from game import Game, get_default_games
+from alias_sampler import AliasSampler
+from player_groups import PlayerGroupIndex
+
+# Number of spins drawn at once by a single worker
+SPINS_PER_CHUNK = 1_000_000
+
+def load_games(games_file=None, from_db=False):
+    """
+    Loads the games and their weights.
+
+    Parameters:
+        games_file (string, optional): Path to a JSON file with a list of objects
+            containing `name`, `percentage` and optionally `players`.
+        from_db (bool, optional): Load the game names from the database (with weight 1).
+
+    Returns:
+        list[Game]: The games. The default games of the wheel when no source is given.
+    """
+    if games_file is not None:
+        with open(games_file, encoding="utf-8") as file:
+            return [
+                Game(entry["name"], entry.get("players", []), entry.get("percentage", 1))
+                for entry in json.load(file)
+            ]
+    if from_db:
+        # Imported here, so that the simulator runs without the database dependencies
+        import db_handler # pylint: disable=import-outside-toplevel
+        db = db_handler.connect_to_db()
+        return [Game(name, [], 1) for name in db_handler.get_list_of_games(db)]
+    return get_default_games()
+
+def load_libraries(players, libraries_file=None):
+    """
+    Loads the lists of games of the players.
+
+    Parameters:
+        players (List): Names of the players.
+        libraries_file (string, optional): Path to a JSON file with an object mapping
+            player names to lists of game names. The database is used when not given.
+
+    Returns:
+        Dictionary: Player name -> set of the players game names.
+    """
+    if libraries_file is not None:
+        with open(libraries_file, encoding="utf-8") as file:
+            libraries = json.load(file)
+        return {player: set(libraries.get(player, [])) for player in players}
+
+    # Imported here, so that the simulator runs without the database dependencies
+    import db_handler # pylint: disable=import-outside-toplevel
+    db = db_handler.connect_to_db()
+    libraries = db_handler.get_libraries_of_players(db, players)
+    # Players missing in the database have no games
+    return {player: libraries.get(player, set()) for player in players}
+
+def filter_common_games(games, libraries):
+    """
+    Keeps only the games every player has in their list of games, like PLAY REACTION does.
+
+    Parameters:
+        games (list[Game]): The games of the wheel.
+        libraries (Dictionary): Player name -> set of the players game names.
+
+    Returns:
+        list[Game]: The games the players have in common, in the original order.
+    """
+    if not libraries:
+        return list(games)
+    common_games = set.intersection(*libraries.values())
+    return [_game for _game in games if _game.name in common_games]
+
+def _simulate_chunk(weights, spins, seed):
+    """
+    Runs a chunk of spins in a worker process.
+
+    Returns:
+        List: The number of wins of each game.
+    """
+    return AliasSampler(weights, seed=seed).sample_counts(spins)
+
+def simulate_spins(weights, spins, workers=1, seed=None):
+    """
+    Runs the spins and counts the wins of every game.
+
+    Parameters:
+        weights (List): The weights of the games.
+        spins (int): The number of spins.
+        workers (int, optional): The number of worker processes, 1 runs in this process.
+        seed (int, optional): A seed for reproducible results.
+
+    Returns:
+        List: The number of wins of each game.
+    """
+    chunks = [SPINS_PER_CHUNK] * (spins // SPINS_PER_CHUNK)
+    if spins % SPINS_PER_CHUNK:
+        chunks.append(spins % SPINS_PER_CHUNK)
+    # Every chunk needs its own seed, otherwise all the chunks would draw the same spins
+    seeds = [None if seed is None else seed + index for index in range(len(chunks))]
+
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(
+                _simulate_chunk, [weights] * len(chunks), chunks, seeds
+            ))
+    else:
+        results = [_simulate_chunk(weights, chunk, chunk_seed)
+                   for chunk, chunk_seed in zip(chunks, seeds)]
+
+    counts = [0] * len(weights)
+    for result in results:
+        counts = [count + chunk_count for count, chunk_count in zip(counts, result)]
+    return counts
+
+def chi_square_test(counts, weights):
+    """
+    Computes the chi-square statistic of the wins against the configured weights.
+
+    The p-value uses the Wilson-Hilferty approximation, so no statistics library is needed.
+
+    Parameters:
+        counts (List): The number of wins of each game.
+        weights (List): The weights of the games.
+
+    Returns:
+        tuple: A tuple containing:
+            - float: The chi-square statistic.
+            - int: The degrees of freedom.
+            - float: The p-value, a small value means the wins don't follow the weights.
+    """
+    spins = sum(counts)
+    total_weight = sum(weights)
+    statistic = 0.0
+    categories = 0
+    for count, weight in zip(counts, weights):
+        expected = spins * weight / total_weight
+        if expected > 0:
+            statistic += (count - expected) ** 2 / expected
+            categories += 1
+
+    degrees_of_freedom = categories - 1
+    if degrees_of_freedom < 1:
+        return statistic, degrees_of_freedom, 1.0
+    variance = 2 / (9 * degrees_of_freedom)
+    z_score = ((statistic / degrees_of_freedom) ** (1 / 3) - (1 - variance)) / math.sqrt(variance)
+    return statistic, degrees_of_freedom, 0.5 * math.erfc(z_score / math.sqrt(2))
+
+def main():
+    """
+    The main entry point of the script.
+
+    Parses the command-line arguments, runs the simulation and prints the report.
+
+    Returns:
+        None
+    """
+    parser = argparse.ArgumentParser(description="Headless Monte Carlo wheel spin simulator.")
+    parser.add_argument("--spins", type=int, default=1_000_000, help="Number of spins.")
+    parser.add_argument("--games", help="JSON file with the games and their percentages.")
+    parser.add_argument("--from-db", action="store_true", help="Load the games from the DB.")
+    parser.add_argument("--group",
+                        help="Group of players like DKKA, only the games allowed for it are spun.")
+    parser.add_argument("--players", nargs="*", default=[],
+                        help="Names of the players, only their common games are spun.")
+    parser.add_argument("--libraries",
+                        help="JSON file mapping player names to their games (default: the DB).")
+    parser.add_argument("--workers", type=int, default=1, help="Number of worker processes.")
+    parser.add_argument("--seed", type=int, help="Seed for reproducible results.")
+    args = parser.parse_args()
+
+    games = load_games(args.games, args.from_db)
+    if args.group:
+        games = PlayerGroupIndex(games).get_eligible_games(args.group)
+        if not games:
+            print(f"No game is allowed for the group {args.group}.")
+            sys.exit(1)
+    if args.players:
+        games = filter_common_games(games, load_libraries(args.players, args.libraries))
+    if not games:
+        print("The players have no games in common.")
+        sys.exit(1)
+
+    weights = [_game.percentage for _game in games]
+    start = time.perf_counter()
+    counts = simulate_spins(weights, args.spins, args.workers, args.seed)
+    elapsed = time.perf_counter() - start
+
+    total_weight = sum(weights)
+    print(f"{'game':<36} {'weight':>8} {'expected':>9} {'observed':>9} {'diff':>8}")
+    for _game, count in zip(games, counts):
+        expected = _game.percentage / total_weight
+        observed = count / args.spins
+        print(f"{_game.name[:36]:<36} {_game.percentage:>8g} {expected:>9.4%} "
+              f"{observed:>9.4%} {observed - expected:>+8.4%}")
+
+    statistic, degrees_of_freedom, p_value = chi_square_test(counts, weights)
+    print(f"\nChi-square: {statistic:.2f} ({degrees_of_freedom} degrees of freedom), "
+          f"p-value: {p_value:.4f}")
+    print(f"{args.spins} spins in {elapsed:.3f} s, {args.spins / elapsed:,.0f} spins per second")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+startup_benchmark.py
+
+Measures the cold start of the Wheel of Luck application and fails when it gets slower
+than the budget, so slow imports creeping back into the startup path are noticed.
+
+Two numbers are measured, each in a fresh Python process:
+- the time to import wheel_of_luck, with the slowest imports reported by `-X importtime`,
+- the time from starting the process to the main window being shown.
+
+Main Functions:
+- measure_imports: Imports a module with `-X importtime` and reports the slowest imports.
+- measure_time_to_first_window: Measures the time from process start to the shown window.
+- main: Runs the measurements and checks them against the budget.
+
+Dependencies:
+- Requires subprocess to measure every start in a fresh interpreter.
+- Requires PySimpleGUI and a display for the time to first window.
+"""
+
+import os
+import sys
+import time
+import argparse
+import subprocess
+
+# Default startup budget in milliseconds
+MAX_IMPORT_MS = 400.0
+MAX_WINDOW_MS = 1500.0
+# Number of the slowest imports reported
+REPORTED_IMPORTS = 10
+
+# Shows the main window in a fresh process, prints a line once it is shown
+FIRST_WINDOW_SCRIPT = """
+import wheel_of_luck
+from game import get_default_games
+window = wheel_of_luck.create_main_window(get_default_games())[0]
+window.finalize()
+print("shown", flush=True)
+window.close()
+"""
+
+SOURCE_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+
+def _parse_importtime(output):
+    """
+    Parses the `-X importtime` output into (module, self_us, cumulative_us) tuples.
+    """
+    imports = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        imports.append((module.rstrip(), int(self_us), int(cumulative_us)))
+    return imports
+
+def measure_imports(module="wheel_of_luck"):
+    """
+    Imports a module in a fresh process with `-X importtime`.
+
+    Parameters:
+        module (string, optional): The name of the imported module.
+
+    Returns:
+        tuple: A tuple containing:
+            - float: The total time of the import in milliseconds.
+            - List: The slowest imports as (module, self_ms, cumulative_ms) tuples,
+                the module name is indented by its nesting level.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=SOURCE_DIRECTORY, capture_output=True, text=True, check=True
+    )
+    imports = _parse_importtime(result.stderr)
+    total_ms = sum(self_us for _, self_us, _ in imports) / 1000
+    slowest = sorted(imports, key=lambda entry: entry[1], reverse=True)[:REPORTED_IMPORTS]
+    return total_ms, [(name, self_us / 1000, cumulative_us / 1000)
+                      for name, self_us, cumulative_us in slowest]
+
+def measure_time_to_first_window():
+    """
+    Measures the time from starting a fresh process to the main window being shown,
+    including the interpreter start.
+
+    Returns:
+        float: The time to the first window in milliseconds.
+
+    Raises:
+        RuntimeError: When the window can't be shown (like without a display).
+    """
+    start = time.perf_counter()
+    with subprocess.Popen(
+        [sys.executable, "-c", FIRST_WINDOW_SCRIPT],
+        cwd=SOURCE_DIRECTORY, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+    ) as process:
+        line = process.stdout.readline()
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        _, errors = process.communicate()
+    if line.strip() != "shown":
+        raise RuntimeError(errors.strip().splitlines()[-1] if errors.strip() else "no window")
+    return elapsed_ms
+
+def main():
+    """
+    The main entry point of the script.
+
+    Prints the import time with the slowest imports and the time to the first window.
+    Exits with status code 1 when any of them is over the budget.
+
+    Returns:
+        None
+    """
+    parser = argparse.ArgumentParser(description="Wheel of Luck startup time benchmark.")
+    parser.add_argument("--max-import-ms", type=float, default=MAX_IMPORT_MS,
+                        help="Budget of importing wheel_of_luck in milliseconds.")
+    parser.add_argument("--max-window-ms", type=float, default=MAX_WINDOW_MS,
+                        help="Budget of the time to the first window in milliseconds.")
+    parser.add_argument("--skip-window", action="store_true",
+                        help="Only measure the imports (like on a machine without a display).")
+    args = parser.parse_args()
+
+    over_budget = False
+
+    import_ms, slowest = measure_imports()
+    print(f"Import of wheel_of_luck: {import_ms:.1f} ms (budget {args.max_import_ms:g} ms)")
+    print(f"{'self ms':>8} {'cumulative ms':>14}  module")
+    for name, self_ms, cumulative_ms in slowest:
+        print(f"{self_ms:>8.1f} {cumulative_ms:>14.1f}  {name}")
+    over_budget |= import_ms > args.max_import_ms
+
+    if not args.skip_window:
+        window_ms = measure_time_to_first_window()
+        print(f"Time to first window: {window_ms:.1f} ms (budget {args.max_window_ms:g} ms)")
+        over_budget |= window_ms > args.max_window_ms
+
+    if over_budget:
+        print("The startup is over the budget, check the slowest imports above.")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+stats_handler.py
+
+This module maintains the Stats collection, win/loss counts precomputed from the Logs.
+
+Every log inserted by db_handler increments the counts of its game, of each of its players,
+of its exact group of players and of the game played by that group, so reading the statistics
+never scans the Logs. The game entries also keep the date the game was last played.
+
+Main Functions:
+- get_stats_updates: Creates the count increments of a single log.
+- record_log_stats: Increments the counts of a single log in the database.
+- get_stats: Retrieves the counts of all games, players or groups.
+- get_game_group_stats: Retrieves the counts of all games played by a group.
+- rebuild_stats: Recomputes the whole Stats collection from the Logs.
+
+Dependencies:
+- Requires pymongo for MongoDB interactions.
+- Requires stats_keys for the kinds and the keys of the entries and the counters of a log.
+"""
+
+import re
+import time
+from collections import Counter
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+# The kinds and the keys are imported from stats_keys, so the callers of stats_handler keep them
+from stats_keys import ( # pylint: disable=unused-import
+    KIND_GAME, KIND_PLAYER, KIND_GROUP, KIND_GAME_GROUP, KINDS_WITH_LAST_PLAYED,
+    get_group_key, get_game_group_key, get_stats_increments, sort_stats_entries
+)
+
+# The order of the entries of a kind, most played first, used by get_stats and its index
+STATS_SORT = [("played", DESCENDING), ("key", ASCENDING)]
+
+# Number of logs read and written at once when rebuilding the statistics
+REBUILD_BATCH_SIZE = 1000
+
+def _make_update(kind, key, increments, last_played):
+    """
+    Creates an upsert incrementing the counts of an entry, including its number of `played`
+    games the entries are sorted by (and moving its last played date forward).
+    """
+    update = {"$inc": dict(increments, played=sum(increments.values()))}
+    if kind in KINDS_WITH_LAST_PLAYED and last_played is not None:
+        update["$max"] = {"last_played": last_played}
+    return UpdateOne({"kind": kind, "key": key}, update, upsert=True)
+
+def get_stats_updates(log):
+    """
+    Creates the count increments of a single log.
+
+    Parameters:
+        log (Dictionary): A document of the Logs collection.
+
+    Returns:
+        list[pymongo.UpdateOne]: Upserts incrementing the counts.
+    """
+    return [
+        _make_update(kind, key, {field: 1}, last_played)
+        for kind, key, field, last_played in get_stats_increments(log)
+    ]
+
+def record_log_stats(db, log):
+    """
+    Increments the counts of a single log in the database by a single round trip.
+
+    Parameters:
+        db (pymongo.mongo_client.MongoClient):
+            An instance of a MongoClient connected to the specified database.
+        log (Dictionary): A document of the Logs collection.
+
+    Returns:
+        None
+    """
+    db["Stats"].bulk_write(get_stats_updates(log), ordered=False)
+
+def get_stats(db, kind, limit=None):
+    """
+    Retrieves the counts of all games, players or groups, most played first.
+    The entries are sorted and limited by the database, using the index
+    on the kind and the number of played games.
+
+    Parameters:
+        db (pymongo.mongo_client.MongoClient):
+            An instance of a MongoClient connected to the specified database.
+        kind (string): KIND_GAME, KIND_PLAYER, KIND_GROUP or KIND_GAME_GROUP.
+        limit (int, optional): The maximum number of returned entries.
+
+    Returns:
+        List: Dictionaries with `key`, `wins` and `losses`.
+    """
+    entries = db["Stats"].find(
+        {"kind": kind}, {"_id": 0, "key": 1, "wins": 1, "losses": 1}
+    ).sort(STATS_SORT).limit(limit or 0)
+    return [
+        {"key": entry["key"], "wins": entry.get("wins", 0), "losses": entry.get("losses", 0)}
+        for entry in entries
+    ]
+
+def get_game_group_stats(db, players):
+    """
+    Retrieves the counts and last played dates of all games played by an exact group
+    of players, by a single indexed query.
+
+    Parameters:
+        db (pymongo.mongo_client.MongoClient):
+            An instance of a MongoClient connected to the specified database.
+        players (List): Names of the players of the group.
+
+    Returns:
+        Dictionary: Game name -> dictionary with `wins`, `losses` and `last_played`.
+    """
+    prefix = get_game_group_key(get_group_key(players), "")
+    # An anchored regular expression only reads the matching range of the index
+    entries = db["Stats"].find(
+        {"kind": KIND_GAME_GROUP, "key": {"$regex": "^" + re.escape(prefix)}},
+        {"_id": 0}
+    )
+    return {
+        entry["key"][len(prefix):]: {
+            "wins": entry.get("wins", 0),
+            "losses": entry.get("losses", 0),
+            "last_played": entry.get("last_played")
+        }
+        for entry in entries
+    }
+
+def _flush_counts(collection, counts):
+    """
+    Writes the counts accumulated from a batch of logs by a single round trip.
+    """
+    if not counts:
+        return
+    collection.bulk_write([
+        _make_update(kind, key, increments, last_played)
+        for (kind, key), (increments, last_played) in counts.items()
+    ], ordered=False)
+    counts.clear()
+
+def _count_log(counts, log):
+    """
+    Adds the counts of a single log to the counts accumulated from a batch of logs.
+    """
+    for kind, key, field, log_date in get_stats_increments(log):
+        increments, last_played = counts.get((kind, key), (Counter(), None))
+        increments[field] += 1
+        if log_date is not None:
+            last_played = max(last_played or log_date, log_date)
+        counts[(kind, key)] = (increments, last_played)
+
+def _count_logs(db, collection, query, batch_size):
+    """
+    Streams the logs matching the query in the order of their IDs and writes
+    their counts into the collection, a batch at a time.
+
+    Returns:
+        tuple: The number of counted logs and the ID of the last one (None when none).
+    """
+    # (kind, key) -> (counts of wins and losses, the last played date)
+    counts = {}
+    counted_logs = 0
+    last_id = None
+    for log in db["Logs"].find(
+        query, {"game": 1, "players": 1, "result": 1, "game_date": 1}
+    ).sort("_id", ASCENDING).batch_size(batch_size):
+        _count_log(counts, log)
+        last_id = log["_id"]
+        counted_logs += 1
+        if counted_logs % batch_size == 0:
+            _flush_counts(collection, counts)
+    _flush_counts(collection, counts)
+    return counted_logs, last_id
+
+def rebuild_stats(db, batch_size=REBUILD_BATCH_SIZE):
+    """
+    Recomputes the whole Stats collection from the Logs.
+
+    The logs are streamed in batches and the counts of each batch are written at once.
+    The counts are built in a temporary collection, which then replaces the Stats
+    collection, so the statistics stay readable during the rebuild.
+
+    The logs inserted while the rebuild runs were counted into the replaced collection,
+    so they are counted again into the new one right after the replacement. Only a log
+    whose counts are being written at the very moment of the replacement can be missed
+    or counted twice, rebuild again when that happens.
+
+    Parameters:
+        db (pymongo.mongo_client.MongoClient):
+            An instance of a MongoClient connected to the specified database.
+        batch_size (int, optional): Number of logs read and written at once.
+
+    Returns:
+        tuple: A tuple containing:
+            - int: The number of processed logs.
+            - float: The number of processed logs per second.
+    """
+    start = time.perf_counter()
+    temporary_collection = db["StatsRebuild"]
+    temporary_collection.drop()
+    temporary_collection.create_index([("kind", ASCENDING), ("key", ASCENDING)], unique=True)
+    temporary_collection.create_index([("kind", ASCENDING)] + STATS_SORT)
+
+    processed_logs, last_id = _count_logs(db, temporary_collection, {}, batch_size)
+
+    # The logs up to the newest one now were counted into the Stats being replaced
+    newest_log = db["Logs"].find_one({}, {"_id": 1}, sort=[("_id", DESCENDING)])
+    temporary_collection.rename("Stats", dropTarget=True)
+    if newest_log is not None and newest_log["_id"] != last_id:
+        missed_logs_query = {"_id": {"$lte": newest_log["_id"]}}
+        if last_id is not None:
+            missed_logs_query["_id"]["$gt"] = last_id
+        replayed_logs, _ = _count_logs(db, db["Stats"], missed_logs_query, batch_size)
+        processed_logs += replayed_logs
+
+    elapsed = time.perf_counter() - start
+    return processed_logs, processed_logs / elapsed if elapsed else 0.0
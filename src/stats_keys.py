@@ -0,0 +1,101 @@
+"""
+stats_keys.py
+
+The kinds and the keys of the statistics entries and the counters a log increments,
+shared by all the storage backends and independent of the storage.
+
+Main Functions:
+- get_group_key: Makes a key identifying an exact group of players.
+- get_game_group_key: Makes a key identifying a game played by an exact group of players.
+- get_stats_increments: Lists the counters a single log increments.
+- sort_stats_entries: Sorts the statistics entries, most played first.
+
+Dependencies:
+- None, so the SQLite and memory backends don't load pymongo.
+"""
+
+# The kinds of the counted subjects
+KIND_GAME = "game"
+KIND_PLAYER = "player"
+KIND_GROUP = "group"
+KIND_GAME_GROUP = "game_group"
+
+# Separates the group and the game in the keys of KIND_GAME_GROUP entries
+GAME_GROUP_SEPARATOR = "\n"
+# Kinds of entries keeping the date of the last played game
+KINDS_WITH_LAST_PLAYED = (KIND_GAME, KIND_GAME_GROUP)
+
+def get_group_key(players):
+    """
+    Makes a key identifying an exact group of players, regardless of their order.
+
+    Parameters:
+        players (List): Names of the players.
+
+    Returns:
+        String: The sorted, comma separated names of the players.
+    """
+    return ", ".join(sorted(set(players)))
+
+def get_game_group_key(group_key, game):
+    """
+    Makes a key identifying a game played by an exact group of players.
+    All the keys of a group start with the same prefix, so they can be found together.
+
+    Parameters:
+        group_key (string): The key of the group, see get_group_key.
+        game (string): The name of the game.
+
+    Returns:
+        String: The key of the game played by the group.
+    """
+    return group_key + GAME_GROUP_SEPARATOR + game
+
+def _get_counted_subjects(log):
+    """
+    Returns the (kind, key) pairs whose counts a log increments.
+    """
+    group_key = get_group_key(log["players"])
+    subjects = [
+        (KIND_GAME, log["game"]),
+        (KIND_GROUP, group_key),
+        (KIND_GAME_GROUP, get_game_group_key(group_key, log["game"]))
+    ]
+    subjects += [(KIND_PLAYER, player) for player in set(log["players"])]
+    return subjects
+
+def _get_result_field(log):
+    """
+    Returns the name of the counter a log increments.
+    """
+    return "wins" if log["result"] == "W" else "losses"
+
+def get_stats_increments(log):
+    """
+    Lists the counters a single log increments, independent of the storage.
+
+    Parameters:
+        log (Dictionary): A log with `game`, `players`, `result` and `game_date`.
+
+    Returns:
+        List: (kind, key, counter name, last played date or None) tuples.
+    """
+    field = _get_result_field(log)
+    return [
+        (kind, key, field, log.get("game_date") if kind in KINDS_WITH_LAST_PLAYED else None)
+        for kind, key in _get_counted_subjects(log)
+    ]
+
+def sort_stats_entries(entries, limit=None):
+    """
+    Sorts the statistics entries, most played first.
+
+    Parameters:
+        entries (List): Dictionaries with `key`, `wins` and `losses`.
+        limit (int, optional): The maximum number of returned entries.
+
+    Returns:
+        List: The sorted entries.
+    """
+    entries = sorted(entries, key=lambda entry: (-(entry["wins"] + entry["losses"]), entry["key"]))
+    return entries[:limit]
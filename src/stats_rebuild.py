@@ -0,0 +1,40 @@
+"""
+stats_rebuild.py
+
+Recomputes the Stats collection from the whole history in the Logs collection.
+
+Use it once to backfill the statistics of the logs inserted before the statistics existed,
+or whenever the statistics get out of sync with the logs.
+
+Main Functions:
+- main: Rebuilds the statistics and prints how long it took.
+
+Dependencies:
+- Requires db_handler for the database connection.
+- Requires stats_handler to rebuild the statistics.
+"""
+
+import argparse
+import db_handler
+import stats_handler
+
+def main():
+    """
+    The main entry point of the script.
+
+    Rebuilds the statistics and prints the number of processed logs per second.
+
+    Returns:
+        None
+    """
+    parser = argparse.ArgumentParser(description="Rebuild the Stats collection from the Logs.")
+    parser.add_argument("--batch-size", type=int, default=stats_handler.REBUILD_BATCH_SIZE,
+                        help="Number of logs read and written at once.")
+    args = parser.parse_args()
+
+    db = db_handler.connect_to_db()
+    processed_logs, logs_per_second = stats_handler.rebuild_stats(db, args.batch_size)
+    print(f"Rebuilt the statistics from {processed_logs} logs ({logs_per_second:,.0f} logs/s).")
+
+if __name__ == "__main__":
+    main()
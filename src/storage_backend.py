@@ -0,0 +1,661 @@
+"""
+storage_backend.py
+
+Storage backends of the games, the player libraries, the last spin, the logs and the statistics.
+
+The application and the Discord bot talk to a StorageBackend, so the data can be kept in:
+- MongoDB (the default), through db_handler,
+- an embedded SQLite database file, for small or offline deployments,
+- memory only, for benchmarks and local experiments.
+
+The backend is selected by the STORAGE_BACKEND environment variable ("mongo", "sqlite"
+or "memory"), the SQLite database file by SQLITE_DATABASE_PATH.
+
+Main Functions:
+- create_storage_backend: Creates a storage backend by its name.
+- get_storage_backend: Returns the storage backend selected by the configuration.
+- set_storage_backend: Replaces the shared storage backend (like in benchmarks).
+
+Dependencies:
+- Requires db_handler (and so pymongo) for the MongoDB backend, imported on first use.
+- Requires sqlite3 for the SQLite backend.
+- Requires stats_keys to count the statistics of the logs, and stats_handler (with pymongo)
+  for the statistics of the MongoDB backend, imported on first use.
+- Requires last_spin_state to format the last spin.
+"""
+
+import abc
+import json
+import sqlite3
+import threading
+from datetime import datetime
+import stats_keys
+from last_spin_state import format_last_spin
+from env_var_loader import get_optional_env_var_value
+
+class StorageBackend(abc.ABC):
+    """
+    This class represents the interface of all storage backends.
+
+    The methods are blocking and safe to be called from multiple threads,
+    async_db_handler runs them off the event loop.
+    """
+
+    @abc.abstractmethod
+    def get_list_of_games(self):
+        """
+        Returns:
+            List: All game names, alphabetically sorted.
+        """
+
+    @abc.abstractmethod
+    def is_game_in_game_list(self, game):
+        """
+        Returns:
+            bool: Whether the game is in the list of games.
+        """
+
+    @abc.abstractmethod
+    def add_game_to_game_list(self, game):
+        """
+        Returns:
+            bool: Whether the game was added (False when it was there already).
+        """
+
+    @abc.abstractmethod
+    def remove_game_from_game_list(self, game):
+        """
+        Returns:
+            bool: Whether the game was removed (False when it wasn't there).
+        """
+
+    @abc.abstractmethod
+    def get_list_of_user_games(self, user_name):
+        """
+        Creates the user when they don't exist yet.
+
+        Returns:
+            List: The user's game names, alphabetically sorted.
+        """
+
+    @abc.abstractmethod
+    def get_common_games_of_players(self, user_names):
+        """
+        Creates the users that don't exist yet.
+
+        Returns:
+            Set: The game names every user has in their list of games.
+        """
+
+    @abc.abstractmethod
+    def add_game_to_user_game_list(self, user_name, game):
+        """
+        Creates the user when they don't exist yet.
+
+        Returns:
+            bool: Whether the game was added (False when it was there already).
+        """
+
+    @abc.abstractmethod
+    def remove_game_from_user_game_list(self, user_name, game):
+        """
+        Returns:
+            bool: Whether the game was removed (False when it wasn't there).
+        """
+
+    @abc.abstractmethod
+    def get_last_spin_string(self):
+        """
+        Returns:
+            String: The last spin in an easily readable form, empty when there wasn't any.
+        """
+
+    @abc.abstractmethod
+    def update_last_spin(self, game, players):
+        """
+        Stores a new spin, taken now, as the last spin, not inserted into the logs yet.
+        """
+
+    @abc.abstractmethod
+    def is_last_spin_inserted(self):
+        """
+        Returns:
+            tuple: Whether the last spin was inserted into the logs (True when there
+                was no spin yet) and the last spin, None when there was no spin yet.
+        """
+
+    @abc.abstractmethod
+    def insert_log_into_database(self, result):
+        """
+        Logs the last spin with the result ("W" or "L") and updates the statistics,
+        only when the last spin wasn't logged yet.
+        """
+
+    @abc.abstractmethod
+    def get_stats(self, kind, limit=None):
+        """
+        Returns:
+            List: Dictionaries with `key`, `wins` and `losses`, most played first.
+        """
+
+    @abc.abstractmethod
+    def get_game_group_stats(self, players):
+        """
+        Returns:
+            Dictionary: Game name -> dictionary with `wins`, `losses` and `last_played`
+                of the games played by the exact group of players.
+        """
+
+    def get_connection_stats(self):
+        """
+        Returns:
+            Dictionary or None: Metrics of the connection to the database server,
+                None when the backend has no server.
+        """
+        return None
+
+    def close(self):
+        """
+        Releases the resources of the backend.
+        """
+
+def _make_log(entry, result):
+    """
+    Creates a log of the last spin with the result.
+    """
+    return {
+        "game_date": entry["last_game_date"],
+        "game": entry["last_game"],
+        "result": result,
+        "players": entry["players"]
+    }
+
+class MongoBackend(StorageBackend):
+    """
+    This class represents the MongoDB storage, implemented by db_handler.
+    """
+
+    def __init__(self, db=None):
+        """
+        Initializes the MongoBackend class.
+
+        Parameters:
+            db (pymongo.database.Database, optional): The database.
+                Defaults to the database of db_handler.connect_to_db.
+        """
+        import db_handler # pylint: disable=import-outside-toplevel
+        import stats_handler # pylint: disable=import-outside-toplevel
+        self._db_handler = db_handler
+        self._stats_handler = stats_handler
+        self.db = db if db is not None else db_handler.connect_to_db()
+
+    def get_list_of_games(self):
+        return self._db_handler.get_list_of_games(self.db)
+
+    def is_game_in_game_list(self, game):
+        return self._db_handler.is_game_in_game_list(self.db, game)
+
+    def add_game_to_game_list(self, game):
+        return self._db_handler.add_game_to_game_list(self.db, game)
+
+    def remove_game_from_game_list(self, game):
+        return self._db_handler.remove_game_from_game_list(self.db, game)
+
+    def get_list_of_user_games(self, user_name):
+        return self._db_handler.get_list_of_user_games(self.db, user_name)
+
+    def get_common_games_of_players(self, user_names):
+        return self._db_handler.get_common_games_of_players(self.db, user_names)
+
+    def add_game_to_user_game_list(self, user_name, game):
+        return self._db_handler.add_game_to_user_game_list(self.db, user_name, game)
+
+    def remove_game_from_user_game_list(self, user_name, game):
+        return self._db_handler.remove_game_from_user_game_list(self.db, user_name, game)
+
+    def get_last_spin_string(self):
+        return self._db_handler.get_last_spin_string(self.db)
+
+    def update_last_spin(self, game, players):
+        self._db_handler.update_last_spin(self.db, game, players)
+
+    def is_last_spin_inserted(self):
+        return self._db_handler.is_last_spin_inserted(self.db)
+
+    def insert_log_into_database(self, result):
+        self._db_handler.insert_log_into_database(self.db, result)
+
+    def get_stats(self, kind, limit=None):
+        return self._stats_handler.get_stats(self.db, kind, limit)
+
+    def get_game_group_stats(self, players):
+        return self._stats_handler.get_game_group_stats(self.db, players)
+
+    def get_connection_stats(self):
+        import db_client # pylint: disable=import-outside-toplevel
+        return db_client.get_pool_metrics()
+
+class MemoryBackend(StorageBackend):
+    """
+    This class represents a storage kept in memory only, lost when the process ends.
+    """
+
+    def __init__(self):
+        """
+        Initializes the MemoryBackend class.
+        """
+        self._lock = threading.Lock()
+        self._games = set()
+        # User name -> set of the user's game names
+        self._players = {}
+        self._last_spin = None
+        self.logs = []
+        # (kind, key) -> dictionary with `wins`, `losses` and `last_played`
+        self._stats = {}
+
+    def get_list_of_games(self):
+        with self._lock:
+            return sorted(self._games)
+
+    def is_game_in_game_list(self, game):
+        with self._lock:
+            return game in self._games
+
+    def add_game_to_game_list(self, game):
+        with self._lock:
+            if game in self._games:
+                return False
+            self._games.add(game)
+            return True
+
+    def remove_game_from_game_list(self, game):
+        with self._lock:
+            if game not in self._games:
+                return False
+            self._games.remove(game)
+            return True
+
+    def get_list_of_user_games(self, user_name):
+        with self._lock:
+            return sorted(self._players.setdefault(user_name, set()))
+
+    def get_common_games_of_players(self, user_names):
+        user_names = list(dict.fromkeys(user_names))
+        if not user_names:
+            return set()
+        with self._lock:
+            libraries = [self._players.setdefault(name, set()) for name in user_names]
+            return set.intersection(*libraries)
+
+    def add_game_to_user_game_list(self, user_name, game):
+        with self._lock:
+            library = self._players.setdefault(user_name, set())
+            if game in library:
+                return False
+            library.add(game)
+            return True
+
+    def remove_game_from_user_game_list(self, user_name, game):
+        with self._lock:
+            library = self._players.setdefault(user_name, set())
+            if game not in library:
+                return False
+            library.remove(game)
+            return True
+
+    def get_last_spin_string(self):
+        with self._lock:
+            return format_last_spin(self._last_spin)
+
+    def update_last_spin(self, game, players):
+        with self._lock:
+            self._last_spin = {
+                "last_game": game,
+                "last_game_date": datetime.now(),
+                "players": list(players),
+                "is_inserted": False
+            }
+
+    def is_last_spin_inserted(self):
+        with self._lock:
+            if self._last_spin is None:
+                return True, None
+            return self._last_spin["is_inserted"], dict(self._last_spin)
+
+    def insert_log_into_database(self, result):
+        with self._lock:
+            if self._last_spin is None or self._last_spin["is_inserted"]:
+                return
+            self._last_spin["is_inserted"] = True
+            log = _make_log(self._last_spin, result)
+            self.logs.append(log)
+            for kind, key, field, last_played in stats_keys.get_stats_increments(log):
+                entry = self._stats.setdefault(
+                    (kind, key), {"wins": 0, "losses": 0, "last_played": None}
+                )
+                entry[field] += 1
+                if last_played is not None:
+                    entry["last_played"] = max(entry["last_played"] or last_played, last_played)
+
+    def get_stats(self, kind, limit=None):
+        with self._lock:
+            entries = [
+                {"key": key, "wins": entry["wins"], "losses": entry["losses"]}
+                for (entry_kind, key), entry in self._stats.items() if entry_kind == kind
+            ]
+        return stats_keys.sort_stats_entries(entries, limit)
+
+    def get_game_group_stats(self, players):
+        prefix = stats_keys.get_game_group_key(stats_keys.get_group_key(players), "")
+        with self._lock:
+            return {
+                key[len(prefix):]: dict(entry)
+                for (kind, key), entry in self._stats.items()
+                if kind == stats_keys.KIND_GAME_GROUP and key.startswith(prefix)
+            }
+
+# The SQLite tables and their indexes
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    name TEXT PRIMARY KEY
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS players (
+    name TEXT PRIMARY KEY
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS player_games (
+    player TEXT NOT NULL,
+    game TEXT NOT NULL,
+    PRIMARY KEY (player, game)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS last_spin (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    last_game TEXT NOT NULL,
+    last_game_date TEXT NOT NULL,
+    players TEXT NOT NULL,
+    is_inserted INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS logs (
+    id INTEGER PRIMARY KEY,
+    game_date TEXT NOT NULL,
+    game TEXT NOT NULL,
+    result TEXT NOT NULL,
+    players TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS logs_game_date ON logs (game_date DESC);
+CREATE INDEX IF NOT EXISTS logs_game ON logs (game, game_date DESC);
+-- The per player counters are kept in stats, this index of the logs was never read
+DROP TABLE IF EXISTS log_players;
+CREATE TABLE IF NOT EXISTS stats (
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    wins INTEGER NOT NULL DEFAULT 0,
+    losses INTEGER NOT NULL DEFAULT 0,
+    last_played TEXT,
+    PRIMARY KEY (kind, key)
+) WITHOUT ROWID;
+"""
+
+# Increments the counters of a statistics entry, moving its last played date forward
+SQLITE_STATS_UPSERT = """
+INSERT INTO stats (kind, key, wins, losses, last_played) VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (kind, key) DO UPDATE SET
+    wins = wins + excluded.wins,
+    losses = losses + excluded.losses,
+    last_played = CASE
+        WHEN last_played IS NULL OR excluded.last_played > last_played
+        THEN COALESCE(excluded.last_played, last_played)
+        ELSE last_played
+    END
+"""
+
+def _parse_date(value):
+    """
+    Parses a date stored by the SQLite backend.
+    """
+    return datetime.fromisoformat(value) if value is not None else None
+
+class SQLiteBackend(StorageBackend):
+    """
+    This class represents a storage in an embedded SQLite database file.
+
+    A single connection is shared by all threads and guarded by a lock,
+    every method runs in its own transaction.
+    """
+
+    def __init__(self, path=None):
+        """
+        Initializes the SQLiteBackend class, creating the tables when they don't exist.
+
+        Parameters:
+            path (string, optional): The database file, ":memory:" for a temporary database.
+                Defaults to the SQLITE_DATABASE_PATH setting.
+        """
+        if path is None:
+            path = get_optional_env_var_value("SQLITE_DATABASE_PATH", "wheel_of_luck.sqlite3")
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode = WAL")
+            self._connection.execute("PRAGMA synchronous = NORMAL")
+            self._connection.executescript(SQLITE_SCHEMA)
+
+    def _read(self, query, parameters=()):
+        """
+        Runs a query and returns all of its rows.
+        """
+        with self._lock:
+            return self._connection.execute(query, parameters).fetchall()
+
+    def _write(self, query, parameters=()):
+        """
+        Runs a statement in its own transaction and returns the number of changed rows.
+        """
+        with self._lock, self._connection:
+            return self._connection.execute(query, parameters).rowcount
+
+    def get_list_of_games(self):
+        return [name for (name,) in self._read("SELECT name FROM games ORDER BY name")]
+
+    def is_game_in_game_list(self, game):
+        return bool(self._read("SELECT 1 FROM games WHERE name = ?", (game,)))
+
+    def add_game_to_game_list(self, game):
+        return self._write("INSERT OR IGNORE INTO games (name) VALUES (?)", (game,)) == 1
+
+    def remove_game_from_game_list(self, game):
+        return self._write("DELETE FROM games WHERE name = ?", (game,)) == 1
+
+    def get_list_of_user_games(self, user_name):
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR IGNORE INTO players (name) VALUES (?)", (user_name,)
+            )
+            rows = self._connection.execute(
+                "SELECT game FROM player_games WHERE player = ? ORDER BY game", (user_name,)
+            ).fetchall()
+        return [game for (game,) in rows]
+
+    def get_common_games_of_players(self, user_names):
+        user_names = list(dict.fromkeys(user_names))
+        if not user_names:
+            return set()
+        placeholders = ", ".join("?" * len(user_names))
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT OR IGNORE INTO players (name) VALUES (?)",
+                [(name,) for name in user_names]
+            )
+            # Games in the libraries of all the players
+            rows = self._connection.execute(
+                f"SELECT game FROM player_games WHERE player IN ({placeholders}) "
+                "GROUP BY game HAVING COUNT(*) = ?",
+                (*user_names, len(user_names))
+            ).fetchall()
+        return {game for (game,) in rows}
+
+    def add_game_to_user_game_list(self, user_name, game):
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR IGNORE INTO players (name) VALUES (?)", (user_name,)
+            )
+            return self._connection.execute(
+                "INSERT OR IGNORE INTO player_games (player, game) VALUES (?, ?)",
+                (user_name, game)
+            ).rowcount == 1
+
+    def remove_game_from_user_game_list(self, user_name, game):
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR IGNORE INTO players (name) VALUES (?)", (user_name,)
+            )
+            return self._connection.execute(
+                "DELETE FROM player_games WHERE player = ? AND game = ?", (user_name, game)
+            ).rowcount == 1
+
+    def _get_last_spin(self):
+        """
+        Returns the last spin as a dictionary, None when there was no spin yet.
+        """
+        rows = self._read(
+            "SELECT last_game, last_game_date, players, is_inserted FROM last_spin WHERE id = 1"
+        )
+        if not rows:
+            return None
+        last_game, last_game_date, players, is_inserted = rows[0]
+        return {
+            "last_game": last_game,
+            "last_game_date": _parse_date(last_game_date),
+            "players": json.loads(players),
+            "is_inserted": bool(is_inserted)
+        }
+
+    def get_last_spin_string(self):
+        return format_last_spin(self._get_last_spin())
+
+    def update_last_spin(self, game, players):
+        self._write(
+            "INSERT OR REPLACE INTO last_spin "
+            "(id, last_game, last_game_date, players, is_inserted) VALUES (1, ?, ?, ?, 0)",
+            (game, datetime.now().isoformat(), json.dumps(list(players)))
+        )
+
+    def is_last_spin_inserted(self):
+        entry = self._get_last_spin()
+        if entry is None:
+            return True, None
+        return entry["is_inserted"], entry
+
+    def insert_log_into_database(self, result):
+        with self._lock, self._connection:
+            # Marking the spin as inserted and logging it is a single transaction
+            if self._connection.execute(
+                "UPDATE last_spin SET is_inserted = 1 WHERE id = 1 AND is_inserted = 0"
+            ).rowcount == 0:
+                return
+            last_game, last_game_date, players = self._connection.execute(
+                "SELECT last_game, last_game_date, players FROM last_spin WHERE id = 1"
+            ).fetchone()
+            log = _make_log({
+                "last_game": last_game,
+                "last_game_date": _parse_date(last_game_date),
+                "players": json.loads(players)
+            }, result)
+
+            self._connection.execute(
+                "INSERT INTO logs (game_date, game, result, players) VALUES (?, ?, ?, ?)",
+                (last_game_date, last_game, result, players)
+            )
+            self._connection.executemany(SQLITE_STATS_UPSERT, [
+                (kind, key, int(field == "wins"), int(field == "losses"),
+                 last_played.isoformat() if last_played is not None else None)
+                for kind, key, field, last_played in stats_keys.get_stats_increments(log)
+            ])
+
+    def get_stats(self, kind, limit=None):
+        rows = self._read(
+            "SELECT key, wins, losses FROM stats WHERE kind = ? "
+            "ORDER BY wins + losses DESC, key LIMIT ?",
+            (kind, -1 if limit is None else limit)
+        )
+        return [{"key": key, "wins": wins, "losses": losses} for key, wins, losses in rows]
+
+    def get_game_group_stats(self, players):
+        prefix = stats_keys.get_game_group_key(stats_keys.get_group_key(players), "")
+        # All the keys starting with the prefix, read as a range of the primary key
+        upper_bound = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        rows = self._read(
+            "SELECT key, wins, losses, last_played FROM stats "
+            "WHERE kind = ? AND key >= ? AND key < ?",
+            (stats_keys.KIND_GAME_GROUP, prefix, upper_bound)
+        )
+        return {
+            key[len(prefix):]: {
+                "wins": wins, "losses": losses, "last_played": _parse_date(last_played)
+            }
+            for key, wins, losses, last_played in rows
+        }
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+# Storage backend names and their classes
+STORAGE_BACKENDS = {
+    "mongo": MongoBackend,
+    "sqlite": SQLiteBackend,
+    "memory": MemoryBackend,
+}
+
+def create_storage_backend(name):
+    """
+    Creates a storage backend by its name.
+
+    Parameters:
+        name (string): "mongo", "sqlite" or "memory".
+
+    Returns:
+        StorageBackend: The new storage backend.
+
+    Raises:
+        ValueError: When there is no storage backend with that name.
+    """
+    backend_class = STORAGE_BACKENDS.get(name.lower())
+    if backend_class is None:
+        raise ValueError(
+            f"Unknown storage backend {name}, use one of: {', '.join(STORAGE_BACKENDS)}."
+        )
+    return backend_class()
+
+_storage_backend = None
+_storage_backend_lock = threading.Lock()
+
+def get_storage_backend():
+    """
+    Returns the storage backend selected by the STORAGE_BACKEND environment variable,
+    creating it on first use. The backend is shared by the whole process.
+
+    Returns:
+        StorageBackend: The shared storage backend.
+    """
+    global _storage_backend # pylint: disable=global-statement
+    with _storage_backend_lock:
+        if _storage_backend is None:
+            _storage_backend = create_storage_backend(
+                get_optional_env_var_value("STORAGE_BACKEND", "mongo")
+            )
+        return _storage_backend
+
+def set_storage_backend(storage):
+    """
+    Replaces the storage backend shared by the whole process, like with a stand-in
+    backend in benchmarks. The replaced backend isn't closed.
+
+    Parameters:
+        storage (StorageBackend): The new shared storage backend.
+
+    Returns:
+        None
+    """
+    global _storage_backend # pylint: disable=global-statement
+    with _storage_backend_lock:
+        _storage_backend = storage
@@ -6,16 +6,21 @@ The main module.
 Manages the application's UI, starts the corresponding Discord bot and sends it commands.
 Maintains the wheel spinning logic and sends results into a MongoDB database.
 
+The main window is shown before the Discord bot and the database modules are imported,
+so their slow imports and connections don't delay the start of the application.
+
 Main Functions:
+- create_main_window:
+    Sets all the UI elements and lays them out in the main window of the application.
 - remove_unwated_games:
     Hides every game in the wheels UI that isn't mentioned in the `common_games` parameter.
-- choose_winning_game:
-    Randomly chooses one game out of a list of Game objects based on their desire percentage.
 - spin_wheel:
-    The whole wheel spinning logic is in this function.
-- send_message_to_discord:
+    Plays the wheel spin planned by spin_engine in the UI.
+- send_reaction_message_to_discord:
     Sends a new coroutine to the thread that the Discord bot is running on,
-    telling the bot to send a message on Discord.
+    telling the bot to send a message collecting reactions on Discord, and awaits it.
+- post_message_to_discord:
+    Tells the Discord bot to send a message on Discord without waiting for it.
 - main:
     The main entry point of the application.
 
@@ -25,16 +30,31 @@ Dependencies:
 - Requires threading for running the Discord bot on a separate thread.
 - Requires PySimpleGUI for the application's simple UI.
 - Requires discord_bot to send commands to the Discord bot.
-- Requires db_handler for all the databe operations and establishment.
+- Requires storage_backend for all the databe operations and establishment.
+- Requires async_db_handler to log the W/L results without blocking the UI.
+- Requires adaptive_weights to weight the games by the group's history (optional mode).
+- Requires spin_engine to plan the outcome and the timing of the wheel spins.
+- Requires wheel_renderer to play the planned spins in the UI.
+- Requires bot_bridge to await the Discord bot calls without freezing the application.
+- Requires instrumentation to record the latency of the spin phases.
 """
 
-import random
 import asyncio
 import threading
 import PySimpleGUI
-import discord_bot
-import db_handler
-from game import Game
+from game import get_default_games
+from spin_engine import plan_spin
+from wheel_renderer import WheelRenderer
+from bot_bridge import BotBridge, BotBridgeError
+
+# How often the UI window is read while waiting for an event, in milliseconds.
+# In between, the event loop runs the background Discord calls.
+WINDOW_READ_TIMEOUT = 50
+# Time limit of logging out the Discord bot when closing the application, in seconds
+LOGOUT_TIMEOUT = 5.0
+
+# Awaitable calls to the Discord bot thread, created by start_discord_bot
+bot_bridge = None
 
 def remove_unwated_games(game_ui_texts, games, window, common_games):
     """
@@ -44,7 +64,7 @@ def remove_unwated_games(game_ui_texts, games, window, common_games):
         games_ui_texts (PySimpleGUI.Text): UI texts of all the game names.
         games (list[Game]): A list of all games represented by Game objects.
         window (PySimpleGUI.Window): The main UI window of the application.
-        common_games (list[string]): A list of game names that the players have in common.
+        common_games (set[string]): A set of game names that the players have in common.
 
     Returns:
         list[PySimpleGUI.Text]:
@@ -82,43 +102,13 @@ def make_all_games_texts_visible(games_ui_texts, window):
         # Get() function here gets the actuall string text of the ui_text
         window[_text.Get()].Update(visible = True)
 
-def whiten_game_ui_text(games_ui_texts):
-    """
-    Makes the text of all UI texts white
-
-    Parameters:
-        games_ui_texts (PySimpleGUI.Text): UI texts of all the game names.
-
-    Returns:
-        None
-    """
-    for _text in games_ui_texts:
-        _text.update(text_color='White')
-
-def choose_winning_game(games):
-    """
-    Randomly chooses one game out of a list of Game objects based on their
-    desire percentage.
-    
-    Parameters:
-        games (list[game.Game]): A list of games represented by Game objects.
-
-    Returns:
-        game.Game: A randomly chosen Game object.
-    """
-    percentages = []
-    for _game in games:
-        percentages.append(_game.percentage)
-
-    winning_games = random.choices(list(games),weights=percentages, k=1)
-    return winning_games[0]
-
 async def spin_wheel(games_ui_texts, games, main_window, result_ui):
     """
-    The whole wheel spinning logic is in this function.
-    
-    Mimicks a wheel spin by changing the colors of the UI game texts and progressively
-    slowing down until a certain spin speed and rolled game is reached.
+    Plays the wheel spin in the UI.
+
+    The outcome and the timing of the spin are planned by spin_engine. The planned frames
+    are played by WheelRenderer, changing the colors of the UI game texts with at most
+    one window refresh per display frame, so slow UI refreshes don't prolong the spin.
 
     Parameters:
         games_ui_texts (PySimpleGUI.Text): UI texts of all game names.
@@ -129,51 +119,32 @@ async def spin_wheel(games_ui_texts, games, main_window, result_ui):
     Returns:
         PySimpleGUI.Text: The changed `result_ui` object containing the name of the resulting game.
     """
-    # Start with all games whitened.
-    whiten_game_ui_text(games_ui_texts)
-    # Choose the name of the winning game
-    rolled_game = choose_winning_game(games).name
+    # Imported here, so that reading its settings doesn't delay the main window
+    from instrumentation import span # pylint: disable=import-outside-toplevel
 
-    # Find the UI text corresponding to the `rolled_game`
-    rolled_game_ui_text = games_ui_texts[0]
+    renderer = WheelRenderer(main_window)
+    # Start with all games whitened, applied together with the first frame
     for _text in games_ui_texts:
-        if _text.Get() == rolled_game:
-            rolled_game_ui_text = _text
-
-    # Initial values setup before the wheel spinning
-    interval = 0.01
-    min_spinning_time = random.uniform(0.3, 0.8)
-    prev_text = games_ui_texts[0]
-    end = False
-
-    while not end:
-        # Each loop represents a wheel move
-        for curr_text in games_ui_texts:
-
-            # Update the color of the currently seleted game UI text
-            curr_text.update(text_color='Lime')
-
-            # Update the color of the previously selected game UI text
-            # When there is only one game, then don't update it
-            if prev_text.key != curr_text.key:
-                prev_text.update(text_color='White')
-            # Set the current text as previous to get ready for the next move
-            prev_text = curr_text
-            # Update the UI changes in the window
-            main_window.refresh()
-
-            # After minimal time has passed stop at the rolled game
-            if interval > min_spinning_time and curr_text == rolled_game_ui_text:
-                end = True
-                break
-
-            # Increase the interval of the next spin, mimicking a spinning wheel
-            await asyncio.sleep(interval)
-            interval+=0.02
+        renderer.set_color(_text, 'White')
+
+    # Choose the winning game and plan the frames of the spin
+    with span("spin_wheel.plan"):
+        schedule = plan_spin(games)
+    # The lists games and game_ui_texts are in the same order, so indexing works
+    rolled_game_ui_text = games_ui_texts[schedule.winner_index]
+
+    with span("spin_wheel.render"):
+        await renderer.play(schedule.frames, games_ui_texts, 'Lime', 'White')
 
     # Print out the spin result
-    result_ui.update("\nUžijte si " + rolled_game_ui_text.Get())
-    main_window.refresh()
+    with span("spin_wheel.show_result"):
+        result_ui.update("\nUžijte si " + rolled_game_ui_text.Get())
+        main_window.refresh()
+
+    stats = renderer.get_stats()
+    print(f"Spin rendered {stats['frames_rendered']} frames, dropped {stats['frames_dropped']}, "
+          f"frame {stats['avg_frame_ms']:.1f}/{stats['max_frame_ms']:.1f} ms (avg/max), "
+          f"refresh {stats['avg_refresh_ms']:.1f}/{stats['max_refresh_ms']:.1f} ms (avg/max)")
 
     return rolled_game_ui_text
 
@@ -184,61 +155,83 @@ def start_discord_bot():
     Returns:
         threading.Thread: A newly stared thread on which the Discord bot is running.
     """
+    global bot_bridge # pylint: disable=global-statement
+    import discord_bot # pylint: disable=import-outside-toplevel
+    bot_bridge = BotBridge(lambda: discord_bot.get_client().loop, discord_bot.ready_event)
     bot_thread = threading.Thread(target=discord_bot.run_bot, daemon=True)
     bot_thread.start()
     return bot_thread
 
-def send_message_to_discord(message):
+async def send_reaction_message_to_discord(message):
     """
     Sends a new coroutine to the thread that the Discord bot is running on,
-    telling the bot to send a message on Discord.
+    telling the bot to send a message collecting reactions on Discord,
+    and waits for it without blocking the event loop.
 
     Parameters:
         message (string): A message to be sent via the Discord bot.
 
     Returns:
         int: The Discord ID of the sent message.
+
+    Raises:
+        bot_bridge.BotBridgeError: When the bot doesn't send the message in time or it fails.
     """
-    # Run the send_message coroutine in the bot's event loop
-    future = asyncio.run_coroutine_threadsafe(
-        discord_bot.send_message(message),
-        discord_bot.client.loop
-    )
-    message_id = future.result()
-    return message_id
+    import discord_bot # pylint: disable=import-outside-toplevel
+    return await bot_bridge.call(discord_bot.send_reaction_message, message)
+
+def post_message_to_discord(message):
+    """
+    Sends a new coroutine to the thread that the Discord bot is running on,
+    telling the bot to send a message on Discord, without waiting for it.
+
+    Parameters:
+        message (string): A message to be sent via the Discord bot.
+
+    Returns:
+        None
+    """
+    import discord_bot # pylint: disable=import-outside-toplevel
+    bot_bridge.post(discord_bot.send_message, message)
 
-def get_reactions_users(message_id):
+async def get_reactions_users(message_id):
     """
     Sends a new coroutine to the thread that the Discord bot is running on,
     telling the bot to return a list of all Discord user names that put a reaction
-    on the message with `message_id`.
+    on the message with `message_id`, and waits for it without blocking the event loop.
 
     Parameters:
         message_id (int): A message to be sent via the Discord bot.
 
     Returns:
         list: A list of all user names that have reacted to the message.
+
+    Raises:
+        bot_bridge.BotBridgeError: When the bot doesn't return the users in time or it fails.
     """
-    # Run the send_message coroutine in the bot's event loop
-    future = asyncio.run_coroutine_threadsafe(
-        discord_bot.get_reaction_users(message_id),
-        discord_bot.client.loop
-    )
-    users = future.result()
-    return users
+    import discord_bot # pylint: disable=import-outside-toplevel
+    return await bot_bridge.call(discord_bot.get_reaction_users, message_id)
 
-def logout_discord_bot():
+async def logout_discord_bot():
     """
     Sends a new coroutine to the thread that the Discord bot is running on,
     telling the bot to log out, resulting in the closing of the event loop
     in the Discord bot thread.
 
     Returns:
-        None
+        bool: Indication whether the bot logged out, it doesn't when it never logged in.
     """
-    asyncio.run_coroutine_threadsafe(discord_bot.logout(), discord_bot.client.loop)
-
-def change_last_spin_insertion_visibility(window, db, visible):
+    if bot_bridge is None or not bot_bridge.is_ready:
+        return False
+    import discord_bot # pylint: disable=import-outside-toplevel
+    try:
+        await bot_bridge.call(discord_bot.logout, timeout=LOGOUT_TIMEOUT)
+    except BotBridgeError as error:
+        print(error)
+        return False
+    return True
+
+def change_last_spin_insertion_visibility(window, storage, visible):
     """
     Handles visibility of the corresponding UI elements taking care of last spin
     insertion into the DB. 
@@ -246,8 +239,8 @@ def change_last_spin_insertion_visibility(window, db, visible):
     Parameters:
         window (PySimpleGUI.Window):
             The main UI window of the application.
-        db (pymongo.mongo_client.MongoClient):
-            An instance of a MongoClient connected to the specified database.
+        storage (storage_backend.StorageBackend):
+            The storage of the games, the players and the last spin.
         visible (bool):
             Indicates whether the UI elements should be hidden/shown .
 
@@ -258,47 +251,37 @@ def change_last_spin_insertion_visibility(window, db, visible):
     window["L"].Update(visible=visible)
     window["LAST_GAME"].Update(visible=visible)
     if visible:
-        window["LAST_GAME"].Update(value=db_handler.get_last_spin_string(db))
+        window["LAST_GAME"].Update(value=make_last_game_text(storage.get_last_spin_string()))
 
     window.refresh()
 
-async def main():
+def make_last_game_text(last_game_result):
     """
-    The main entry point of the application.
+    Makes the text asking for the result of the last spin.
 
-    Establishes connection to MongoDB database and Discord bot.
-    Sets all the UI elements and lays them out.
-    Provides all the functionality that the UI elements should posses. 
+    Parameters:
+        last_game_result (string): The last spin record, see get_last_spin_string.
 
     Returns:
-        None 
+        String: The text of the last game UI element.
     """
-    # Establish database connection
-    db = db_handler.connect_to_db()
+    return f"\nJak dopadla minulá hra? \n({last_game_result})"
 
-    # Start the Discord bot
-    bot_thread = start_discord_bot()
+def create_main_window(games):
+    """
+    Sets all the UI elements and lays them out in the main window of the application.
+    The elements of the last spin result are hidden until the database is loaded.
 
-    # All the playable games
-    games = [
-        Game("Apex Legends", ["DK", "D", "K", "DKKA", "DKA"], 1),
-        Game("PUBG: Battlegrounds", ["DK", "K", "D", "DKKA", "DKA",], 1),
-        Game("Counter Strike: Global Offensive", ["DK", "D", "DKKA", "DKA",], 1),
-        Game("Fortnite", ["DK", "D"], 1),
-        Game("Programovani kola stesti", ["DK", "D", "DKKA", "DKA"], 1),
-        Game("Lost Ark", ["DK", "D", "K", "DFK"], 1),
-        #Game("Payday 2", ["DFK", "DK", "FK", "F", "K"], 1),
-        Game("League of Legends", ["DM", "D", "M", "DF", "DFKM"], 1),
-        Game("Fall Guys", ["DFK", "DK", "DF", "FK", "D", "K", "F"], 1),
-        Game("Overwatch", ["DFK", "DK", "DF", "FK", "D", "K", "F", "DKKA", "DKA"], 1),
-        Game("Grant Treft Auto V", ["DFK", "F", "DK", "DF"], 1),
-        Game("Keep Talking and Nobody Explodes", ["DK", "DF", "TEST"], 1),
-        Game("Orcs Must Die", ["DK", "K"], 1),
-        Game("Deceive", ["DFK", "DK", "DF"], 1),
-        Game("Dead by Daylight", ["DK", "DKKA", "DKA"], 1),
-        Game("Dying Light", ["DKKA", "DKA"], 1)
-    ]
+    Parameters:
+        games (list[Game]): All the playable games.
 
+    Returns:
+        tuple: A tuple containing:
+            - PySimpleGUI.Window: The main UI window of the application.
+            - list[PySimpleGUI.Text]: UI texts of all the game names.
+            - PySimpleGUI.Text: The UI text showing the spin result.
+            - PySimpleGUI.Text: The UI text showing the reaction to the W/L buttons.
+    """
     # Colors
     bg_color = "Black"
     fg_color = "White"
@@ -311,15 +294,14 @@ async def main():
 
     # Texts
     result_ui = PySimpleGUI.Text("", text_color=fg_color, background_color=bg_color, font=font)
-    last_game_result = db_handler.get_last_spin_string(db)
-    is_last_spin_inserted, _ = db_handler.is_last_spin_inserted(db)
+    # The last spin is filled in once the database is loaded
     last_game_result_ui = PySimpleGUI.Text(
-        f"\nJak dopadla minulá hra? \n({last_game_result})",
+        "",
         text_color=fg_color,
         background_color=bg_color,
         font=font,
         key="LAST_GAME",
-        visible= not is_last_spin_inserted
+        visible=False
     )
 
     winlose = PySimpleGUI.Text("", text_color=fg_color, background_color=bg_color, font=font)
@@ -342,7 +324,7 @@ async def main():
         font=font,
         mouseover_colors=btn_mouseover_color,
         size=btn_size,
-        visible=not is_last_spin_inserted
+        visible=False
     )
     lose = PySimpleGUI.Button(
         "L",
@@ -350,7 +332,7 @@ async def main():
         font=font,
         mouseover_colors=btn_mouseover_color,
         size=btn_size,
-        visible=not is_last_spin_inserted
+        visible=False
     )
     announce_button = PySimpleGUI.Button(
         "ANNOUNCE",
@@ -397,6 +379,37 @@ async def main():
         use_default_focus=False
     )
 
+    return main_window, games_ui_texts, result_ui, winlose
+
+async def main():
+    """
+    The main entry point of the application.
+
+    Shows the main window first, then starts the Discord bot and connects to
+    the storage backend, so the slow imports and connections don't delay the window.
+    Provides all the functionality that the UI elements should posses.
+
+    Returns:
+        None
+    """
+    # All the playable games
+    games = get_default_games()
+    main_window, games_ui_texts, result_ui, winlose = create_main_window(games)
+    # Show the window right away
+    main_window.finalize()
+
+    # Start the Discord bot
+    bot_thread = start_discord_bot()
+
+    # Establish database connection
+    import storage_backend # pylint: disable=import-outside-toplevel
+    import adaptive_weights # pylint: disable=import-outside-toplevel
+    import async_db_handler # pylint: disable=import-outside-toplevel
+    storage = storage_backend.get_storage_backend()
+    is_last_spin_inserted, _ = storage.is_last_spin_inserted()
+    if not is_last_spin_inserted:
+        change_last_spin_insertion_visibility(main_window, storage, True)
+
     # Initiate variables
     rolled_game = None
     message_id = None
@@ -404,51 +417,49 @@ async def main():
     # Each iteration represents a wheel spin
     while True:
         # Reads values from the applications main window
-        event, _ = main_window.read()
+        event, _ = main_window.read(timeout=WINDOW_READ_TIMEOUT)
 
+        # No event, let the background Discord calls run
+        if event == PySimpleGUI.TIMEOUT_EVENT:
+            await asyncio.sleep(0)
+            continue
         # Pressing W/L buttons condition
         if event == "W":
             winlose.update("\n YOU ARE THE BEST" )
-            db_handler.insert_log_into_database(db, event)
-            change_last_spin_insertion_visibility(main_window, db, False)
+            await async_db_handler.insert_log_into_database(storage, event)
+            change_last_spin_insertion_visibility(main_window, storage, False)
             continue
         if event == "L":
             winlose.update("\n YOU SUCK" )
-            db_handler.insert_log_into_database(db, event)
-            change_last_spin_insertion_visibility(main_window, db, False)
+            await async_db_handler.insert_log_into_database(storage, event)
+            change_last_spin_insertion_visibility(main_window, storage, False)
             continue
         if event == "SEND REACTION":
-            message_id = send_message_to_discord("Jde se točit kolem štěští! Kdo se zapojí?")
+            try:
+                message_id = await send_reaction_message_to_discord(
+                    "Jde se točit kolem štěští! Kdo se zapojí?"
+                )
+            except BotBridgeError as error:
+                print(error)
             continue
         if event == "PLAY REACTION":
             # Check that there is a message already sent in the DC chat
             if message_id is None:
                 print("You have to send a reaction message first.")
                 continue
-            players = get_reactions_users(message_id)
+            try:
+                players = await get_reactions_users(message_id)
+            except BotBridgeError as error:
+                print(error)
+                continue
 
             # No reaction case
             if not players:
-                send_message_to_discord("Nikdo nechce točit :(")
+                post_message_to_discord("Nikdo nechce točit :(")
                 continue
 
-            # Get list of games that those players have in common
-            is_first_player = True
-            for player in players:
-                # Inicialize the list of common games by the first player
-                if is_first_player:
-                    common_games = db_handler.get_list_of_user_games(db, player)
-                    is_first_player = False
-                    continue
-                # Get current players list of games
-                player_games = db_handler.get_list_of_user_games(db, player)
-                # Keep only the games that are still in the common_games list
-                # and also in the current players list
-                updated_games_list = []
-                for game in common_games:
-                    if game in player_games:
-                        updated_games_list.append(game)
-                common_games = updated_games_list
+            # Get set of games that those players have in common
+            common_games = storage.get_common_games_of_players(players)
 
             # Wheel setup and spinning
             wanted_game_ui_texts, wanted_games = remove_unwated_games(
@@ -457,30 +468,38 @@ async def main():
                 main_window,
                 common_games
             )
+            if adaptive_weights.is_history_weighting_enabled():
+                adaptive_weights.apply_history_weights(storage, wanted_games, players)
             rolled_game = await spin_wheel(
                 wanted_game_ui_texts,
                 wanted_games,
                 main_window,
                 result_ui
             )
-            db_handler.update_last_spin(db, rolled_game.Get(), players=players)
+            storage.update_last_spin(rolled_game.Get(), players)
             # Show insertion
-            change_last_spin_insertion_visibility(main_window, db, True)
+            change_last_spin_insertion_visibility(main_window, storage, True)
             continue
         if  event == "ANNOUNCE":
             if rolled_game is not None:
                 # Call Discord Bot to announce the game that has been rolled
-                send_message_to_discord(
+                post_message_to_discord(
                     "Jdeme hrát " + rolled_game.Get() + ", chce se někdo přidat?"
                 )
             continue
         # Window closing event
         # Properly shutting down the bot and its loop
-        logout_discord_bot()
-        # Wait for the logout operation to end, closing the discord bot thread
-        bot_thread.join()
+        if await logout_discord_bot():
+            # Wait for the logout operation to end, closing the discord bot thread
+            bot_thread.join(timeout=LOGOUT_TIMEOUT)
         break
 
+    pool = storage.get_connection_stats()
+    if pool is not None:
+        print(f"Database pool: {pool['checkouts']} checkouts, {pool['open_connections']} open "
+              f"connections, checkout wait {pool['avg_checkout_wait_ms']:.1f}/"
+              f"{pool['max_checkout_wait_ms']:.1f} ms (avg/max)")
+
 if __name__ == "__main__":
     # Create an event loop for the main function
     asyncio.run(main())
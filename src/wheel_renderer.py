@@ -0,0 +1,150 @@
+"""
+wheel_renderer.py
+
+Module containing the definition of the WheelRenderer class, which plays
+the frames of a planned spin in the PySimpleGUI window.
+
+Widget changes are batched into at most one window refresh per display frame,
+colors that didn't change aren't updated at all and frames are skipped when the
+rendering falls behind the schedule, so the spin stays smooth with hundreds of games.
+"""
+
+import time
+import asyncio
+
+# The time of a single display frame in seconds (60 frames per second)
+FRAME_BUDGET = 1 / 60
+
+class WheelRenderer:
+    """
+    This class represents a renderer of the wheel animation.
+    """
+
+    def __init__(self, window, frame_budget=FRAME_BUDGET):
+        """
+        Initializes the WheelRenderer class.
+
+        Parameters:
+            window (PySimpleGUI.Window): The main UI window of the application.
+            frame_budget (float, optional): The minimal time between two window refreshes
+                in seconds. Defaults to FRAME_BUDGET.
+        """
+        self.window = window
+        self.frame_budget = frame_budget
+        # UI text key -> (UI text, color) waiting for the next flush
+        self._pending_colors = {}
+        # UI text key -> color currently shown in the window
+        self._shown_colors = {}
+        self._last_refresh = None
+        self.frames_rendered = 0
+        self.frames_dropped = 0
+        self._refresh_time_total = 0.0
+        self._refresh_time_max = 0.0
+        self._frame_time_total = 0.0
+        self._frame_time_max = 0.0
+
+    def set_color(self, ui_text, color):
+        """
+        Stages a text color change, applied by the next flush.
+
+        Parameters:
+            ui_text (PySimpleGUI.Text): The UI text to be changed.
+            color (string): The new text color.
+
+        Returns:
+            None
+        """
+        if self._shown_colors.get(ui_text.key) == color:
+            # Drop a pending change back to the shown color
+            self._pending_colors.pop(ui_text.key, None)
+            return
+        self._pending_colors[ui_text.key] = (ui_text, color)
+
+    def flush(self):
+        """
+        Applies all the staged changes and refreshes the window once.
+
+        Returns:
+            None
+        """
+        start = time.monotonic()
+        for key, (ui_text, color) in self._pending_colors.items():
+            ui_text.update(text_color=color)
+            self._shown_colors[key] = color
+        self._pending_colors.clear()
+        self.window.refresh()
+        end = time.monotonic()
+
+        refresh_time = end - start
+        self._refresh_time_total += refresh_time
+        self._refresh_time_max = max(self._refresh_time_max, refresh_time)
+        if self._last_refresh is not None:
+            frame_time = end - self._last_refresh
+            self._frame_time_total += frame_time
+            self._frame_time_max = max(self._frame_time_max, frame_time)
+        self._last_refresh = end
+        self.frames_rendered += 1
+
+    def _get_next_refresh_time(self):
+        """
+        Returns the earliest time the window may be refreshed again.
+        """
+        if self._last_refresh is None:
+            return 0.0
+        return self._last_refresh + self.frame_budget
+
+    async def play(self, frames, games_ui_texts, highlight_color, base_color):
+        """
+        Plays the frames of a spin, highlighting one UI text in each frame.
+
+        A frame is skipped when the next frame is due before it could be shown,
+        either because the rendering fell behind or because both frames fall
+        into the same display frame. The last frame is always shown.
+
+        Parameters:
+            frames (list[spin_engine.SpinFrame]): The planned frames of the spin.
+            games_ui_texts (list[PySimpleGUI.Text]): UI texts of the spun games.
+            highlight_color (string): The color of the highlighted game.
+            base_color (string): The color of the other games.
+
+        Returns:
+            None
+        """
+        highlighted_text = None
+        for position, frame in enumerate(frames):
+            show_time = max(frame.target_time, self._get_next_refresh_time())
+            is_last_frame = position == len(frames) - 1
+            if not is_last_frame and frames[position + 1].target_time <= max(
+                show_time, time.monotonic()
+            ):
+                self.frames_dropped += 1
+                continue
+
+            delay = show_time - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            current_text = games_ui_texts[frame.item_index]
+            if highlighted_text is not None and highlighted_text.key != current_text.key:
+                self.set_color(highlighted_text, base_color)
+            self.set_color(current_text, highlight_color)
+            highlighted_text = current_text
+            self.flush()
+
+    def get_stats(self):
+        """
+        Returns the rendering metrics.
+
+        Returns:
+            Dictionary: `frames_rendered`, `frames_dropped`, average and maximal
+                `frame_ms` (time between refreshes) and `refresh_ms` (cost of a refresh).
+        """
+        frames_rendered = max(self.frames_rendered, 1)
+        return {
+            "frames_rendered": self.frames_rendered,
+            "frames_dropped": self.frames_dropped,
+            "avg_frame_ms": self._frame_time_total / max(self.frames_rendered - 1, 1) * 1000,
+            "max_frame_ms": self._frame_time_max * 1000,
+            "avg_refresh_ms": self._refresh_time_total / frames_rendered * 1000,
+            "max_refresh_ms": self._refresh_time_max * 1000
+        }
@@ -0,0 +1,11 @@
+"""
+conftest.py
+
+Shared setup of the tests, which import the application modules from src
+the same way the application does.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "src"))
@@ -0,0 +1,60 @@
+"""
+Tests of the game weights adaptive_weights computes from the history of a group of players.
+"""
+
+from datetime import datetime, timedelta
+import pytest
+from adaptive_weights import MIN_WEIGHT, apply_history_weights, compute_weight
+from game import Game
+from storage_backend import MemoryBackend
+
+NOW = datetime(2024, 6, 1)
+
+def test_never_played_game_gets_half_of_the_weight():
+    assert compute_weight(0, 0, None, NOW) == pytest.approx(MIN_WEIGHT + 0.5)
+
+def test_just_played_game_gets_the_lowest_weight():
+    assert compute_weight(5, 0, NOW, NOW) == pytest.approx(MIN_WEIGHT)
+
+def test_recency_comes_back_by_the_half_life(monkeypatch):
+    monkeypatch.setenv("RECENCY_HALF_LIFE_DAYS", "7")
+    week_ago = NOW - timedelta(days=7)
+    # Half of the recency, times the smoothed win rate of 1 win and 1 loss
+    assert compute_weight(1, 1, week_ago, NOW) == pytest.approx(MIN_WEIGHT + 0.5 * 0.5)
+    assert compute_weight(1, 1, week_ago - timedelta(days=7), NOW) > \
+        compute_weight(1, 1, week_ago, NOW)
+
+def test_half_life_is_read_on_use(monkeypatch):
+    two_weeks_ago = NOW - timedelta(days=14)
+    monkeypatch.setenv("RECENCY_HALF_LIFE_DAYS", "14")
+    assert compute_weight(1, 1, two_weeks_ago, NOW) == pytest.approx(MIN_WEIGHT + 0.5 * 0.5)
+
+def test_won_games_weigh_more_than_lost_games():
+    long_ago = NOW - timedelta(days=365)
+    assert compute_weight(4, 0, long_ago, NOW) > compute_weight(0, 4, long_ago, NOW)
+
+def log_spin(storage, game, players, result):
+    """
+    Spins a game and logs its result.
+    """
+    storage.update_last_spin(game, players)
+    storage.insert_log_into_database(result)
+
+def test_weights_follow_the_logs_of_the_group():
+    storage = MemoryBackend()
+    games = [Game("Apex Legends", [], 1), Game("Fortnite", [], 1), Game("Deceive", [], 1)]
+    players = ["tegez", "jouker"]
+    log_spin(storage, "Apex Legends", players, "W")
+    # Another group doesn't change the weights of this one
+    log_spin(storage, "Fortnite", ["r4tmax"], "L")
+
+    later = datetime.now() + timedelta(days=1)
+    apply_history_weights(storage, games, list(reversed(players)), now=later)
+    weights = {_game.name: _game.percentage for _game in games}
+    assert weights["Fortnite"] == weights["Deceive"] == pytest.approx(MIN_WEIGHT + 0.5)
+    # Played a day ago, so it's less likely than the games the group didn't play
+    assert MIN_WEIGHT < weights["Apex Legends"] < weights["Deceive"]
+
+    log_spin(storage, "Deceive", players, "L")
+    apply_history_weights(storage, games, players, now=later)
+    assert games[2].percentage < weights["Deceive"]
@@ -0,0 +1,33 @@
+"""
+Tests of the regression check of benchmark_suite, comparing the results with a baseline run.
+"""
+
+from benchmark_suite import compare_results, create_benchmark_backend, find_regressions
+
+def make_result(name, median_ms, backend="memory", size=10):
+    """
+    Returns a result of a storage benchmark.
+    """
+    return {"group": "storage", "name": name, "backend": backend, "size": size,
+            "median_ms": median_ms}
+
+def test_only_benchmarks_of_both_runs_are_compared():
+    baseline = [make_result("get_list_of_games", 1.0), make_result("removed", 1.0)]
+    results = [make_result("get_list_of_games", 3.0), make_result("added", 1.0),
+               make_result("get_list_of_games", 1.0, size=100)]
+    comparison = compare_results(baseline, results)
+    assert [(result["name"], ratio) for result, _, ratio in comparison] == \
+        [("get_list_of_games", 3.0)]
+
+def test_regressions_above_the_allowed_ratio():
+    baseline = [make_result("slow", 1.0), make_result("fine", 1.0), make_result("noise", 0.01)]
+    results = [make_result("slow", 2.5), make_result("fine", 1.9), make_result("noise", 0.1)]
+    regressions = find_regressions(compare_results(baseline, results), 2)
+    # The noise is 10 times slower, but too fast in the baseline to be checked
+    assert [(result["name"], ratio) for result, ratio in regressions] == [("slow", 2.5)]
+
+def test_mongo_stand_in_is_seeded_in_bulk():
+    storage = create_benchmark_backend("mongo", 100)
+    assert len(storage.get_list_of_games()) == 100
+    assert storage.get_common_games_of_players(["player0", "player7"])
+    storage.close()
@@ -0,0 +1,109 @@
+"""
+Tests of the pending call cap and the readiness gate of bot_bridge.BotBridge.
+"""
+
+import asyncio
+import threading
+import pytest
+import bot_bridge
+from bot_bridge import BotBridge, BotBridgeError
+
+@pytest.fixture(name="bot_loop")
+def fixture_bot_loop():
+    """
+    An event loop running on its own thread, like the loop of the Discord bot.
+    """
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield loop
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.close()
+
+async def echo(value):
+    """
+    A Discord call returning its argument.
+    """
+    return value
+
+def test_call_runs_on_the_bot_loop(bot_loop):
+    ready_event = threading.Event()
+    ready_event.set()
+    bridge = BotBridge(lambda: bot_loop, ready_event)
+
+    async def get_loop():
+        return asyncio.get_running_loop()
+
+    assert asyncio.run(bridge.call(echo, 42)) == 42
+    assert asyncio.run(bridge.call(get_loop)) is bot_loop
+    assert bridge.pending == 0
+
+def test_call_waits_until_the_bot_is_ready(bot_loop, monkeypatch):
+    monkeypatch.setattr(bot_bridge, "READY_POLL_INTERVAL", 0.01)
+    ready_event = threading.Event()
+    bridge = BotBridge(lambda: bot_loop, ready_event, timeout=5)
+
+    async def main():
+        call = asyncio.create_task(bridge.call(echo, "ready"))
+        await asyncio.sleep(0.05)
+        assert not call.done()
+        ready_event.set()
+        return await call
+
+    assert asyncio.run(main()) == "ready"
+
+def test_call_fails_when_the_bot_never_gets_ready(bot_loop, monkeypatch):
+    monkeypatch.setattr(bot_bridge, "READY_POLL_INTERVAL", 0.01)
+    bridge = BotBridge(lambda: bot_loop, threading.Event(), timeout=0.05)
+
+    with pytest.raises(BotBridgeError, match="isn't logged in"):
+        asyncio.run(bridge.call(echo, 1))
+    assert bridge.pending == 0
+
+def test_calls_over_the_pending_cap_are_refused(bot_loop):
+    ready_event = threading.Event()
+    ready_event.set()
+    bridge = BotBridge(lambda: bot_loop, ready_event, max_pending=2)
+    release = threading.Event()
+
+    async def blocked():
+        await asyncio.get_running_loop().run_in_executor(None, release.wait)
+        return "done"
+
+    async def main():
+        calls = [asyncio.create_task(bridge.call(blocked)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        assert bridge.pending == 2
+        with pytest.raises(BotBridgeError, match="too many pending calls"):
+            await bridge.call(echo, 1)
+        assert bridge.post(echo, 1) is None
+        release.set()
+        return await asyncio.gather(*calls)
+
+    assert asyncio.run(main()) == ["done", "done"]
+    assert bridge.pending == 0
+    # There is room again once the pending calls finished
+    assert asyncio.run(bridge.call(echo, 3)) == 3
+
+def test_failed_call_raises_bot_bridge_error(bot_loop):
+    ready_event = threading.Event()
+    ready_event.set()
+    bridge = BotBridge(lambda: bot_loop, ready_event)
+
+    async def fail():
+        raise ValueError("Discord is down")
+
+    with pytest.raises(BotBridgeError, match="Discord is down") as error_info:
+        asyncio.run(bridge.call(fail))
+    assert isinstance(error_info.value.__cause__, ValueError)
+    assert bridge.pending == 0
+
+def test_slow_call_times_out(bot_loop):
+    ready_event = threading.Event()
+    ready_event.set()
+    bridge = BotBridge(lambda: bot_loop, ready_event)
+
+    with pytest.raises(BotBridgeError, match="didn't finish"):
+        asyncio.run(bridge.call(asyncio.sleep, 5, timeout=0.05))
+    assert bridge.pending == 0
@@ -0,0 +1,165 @@
+"""
+Tests of the rate limit and the coalescing of channel_sender.ChannelSender.
+"""
+
+import time
+import asyncio
+import itertools
+import pytest
+from channel_sender import ChannelSender, ChannelSenderClosedError, MAX_MESSAGE_LENGTH
+
+class FakeChannel:
+    """
+    Records the sent texts with their times, like `channel.send` returning a message.
+    """
+
+    class Message: # pylint: disable=too-few-public-methods
+        """
+        A sent message with its Discord ID.
+        """
+        def __init__(self, message_id):
+            self.id = message_id # pylint: disable=invalid-name
+
+    def __init__(self):
+        self.sent = []
+        self._ids = itertools.count(1)
+
+    async def send(self, content):
+        """
+        Records the text and returns the sent message.
+        """
+        self.sent.append((time.monotonic(), content))
+        return self.Message(next(self._ids))
+
+def test_queued_messages_are_coalesced():
+    channel = FakeChannel()
+    sender = ChannelSender(channel.send)
+
+    async def main():
+        return await asyncio.gather(*(sender.send(f"line {index}") for index in range(3)))
+
+    message_ids = asyncio.run(main())
+    assert [content for _, content in channel.sent] == ["line 0\nline 1\nline 2"]
+    assert message_ids == [1, 1, 1]
+    assert sender.get_stats()["sent_messages"] == 1
+    assert sender.get_stats()["coalesced_messages"] == 2
+
+def test_messages_that_mustnt_be_coalesced_are_sent_alone():
+    channel = FakeChannel()
+    sender = ChannelSender(channel.send)
+
+    async def main():
+        return await asyncio.gather(
+            sender.send("a"), sender.send("b"), sender.send("poll", coalesce=False),
+            sender.send("c")
+        )
+
+    assert asyncio.run(main()) == [1, 1, 2, 3]
+    assert [content for _, content in channel.sent] == ["a\nb", "poll", "c"]
+
+def test_coalesced_message_stays_within_the_length_limit():
+    channel = FakeChannel()
+    sender = ChannelSender(channel.send)
+    half = "x" * (MAX_MESSAGE_LENGTH // 2)
+
+    async def main():
+        await asyncio.gather(*(sender.send(half) for _ in range(3)))
+
+    asyncio.run(main())
+    assert [len(content) for _, content in channel.sent] == [len(half)] * 3
+    assert all(len(content) <= MAX_MESSAGE_LENGTH for _, content in channel.sent)
+
+def test_sends_keep_under_the_rate_limit():
+    channel = FakeChannel()
+    period = 0.2
+    sender = ChannelSender(channel.send, rate_limit_messages=2, rate_limit_period=period)
+
+    async def main():
+        await asyncio.gather(*(sender.send(str(index), coalesce=False) for index in range(5)))
+
+    asyncio.run(main())
+    send_times = [sent_at for sent_at, _ in channel.sent]
+    assert [content for _, content in channel.sent] == ["0", "1", "2", "3", "4"]
+    # Any 2 + 1 consecutive sends span at least the whole period (sliding window)
+    for first, third in zip(send_times, send_times[2:]):
+        assert third - first >= period - 0.01
+    # The first 2 sends don't wait
+    assert send_times[1] - send_times[0] < period / 2
+    assert sender.get_stats()["rate_limit_waits"] >= 2
+
+def test_messages_queued_while_waiting_for_the_rate_limit_are_coalesced():
+    channel = FakeChannel()
+    sender = ChannelSender(channel.send, rate_limit_messages=1, rate_limit_period=0.1)
+
+    async def main():
+        first = asyncio.create_task(sender.send("first"))
+        await asyncio.sleep(0.01)
+        # Both wait for the rate limit and leave together
+        return await asyncio.gather(first, sender.send("second"), sender.send("third"))
+
+    assert asyncio.run(main()) == [1, 2, 2]
+    assert [content for _, content in channel.sent] == ["first", "second\nthird"]
+
+def test_failed_send_fails_its_callers_only():
+    calls = []
+
+    async def send(content):
+        calls.append(content)
+        if content == "broken":
+            raise RuntimeError("Discord is down")
+        return FakeChannel.Message(len(calls))
+
+    sender = ChannelSender(send)
+
+    async def main():
+        broken = asyncio.create_task(sender.send("broken", coalesce=False))
+        working = asyncio.create_task(sender.send("working"))
+        with pytest.raises(RuntimeError):
+            await broken
+        return await working
+
+    assert asyncio.run(main()) == 2
+    assert calls == ["broken", "working"]
+
+def test_close_fails_the_waiting_callers():
+    channel = FakeChannel()
+    sender = ChannelSender(channel.send, rate_limit_messages=1, rate_limit_period=10)
+
+    async def main():
+        first = await sender.send("first")
+        # Waits for the rate limit until the queue is closed
+        waiting = [asyncio.create_task(sender.send(text)) for text in ("a", "b")]
+        await asyncio.sleep(0.01)
+        await sender.close()
+        results = await asyncio.gather(*waiting, return_exceptions=True)
+        with pytest.raises(ChannelSenderClosedError):
+            await sender.send("after close")
+        return first, results
+
+    first, results = asyncio.run(main())
+    assert first == 1
+    assert all(isinstance(result, ChannelSenderClosedError) for result in results)
+    assert [content for _, content in channel.sent] == ["first"]
+
+def test_cancelled_worker_fails_the_waiting_callers():
+    async def main():
+        started = asyncio.Event()
+
+        async def send(_):
+            started.set()
+            await asyncio.sleep(10)
+            return FakeChannel.Message(1)
+
+        sender = ChannelSender(send)
+        sending = asyncio.create_task(sender.send("sending"))
+        await started.wait()
+        queued = asyncio.create_task(sender.send("queued", coalesce=False))
+        await asyncio.sleep(0)
+        # Like the tasks of the bot cancelled when its event loop shuts down
+        sender._worker.cancel() # pylint: disable=protected-access
+        return await asyncio.wait_for(
+            asyncio.gather(sending, queued, return_exceptions=True), 1
+        )
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, ChannelSenderClosedError) for result in results)
@@ -0,0 +1,105 @@
+"""
+Tests of the shared MongoClient of db_client, its pool options and its pool metrics.
+
+No test needs a server, as the client connects on the first database operation, except
+the one checking the metrics of real checkouts, which runs against a real MongoDB server
+when MONGODB_TEST_URI is set (like "mongodb://localhost:27017") and is skipped otherwise.
+"""
+
+import os
+from types import SimpleNamespace
+import pytest
+import db_client
+from db_client import PoolMetrics, close_client, get_client, get_client_options
+
+MONGODB_TEST_URI = os.environ.get("MONGODB_TEST_URI")
+
+@pytest.fixture(name="client_settings", autouse=True)
+def fixture_client_settings(monkeypatch):
+    """
+    Points the shared client at a server nobody listens on, with new pool metrics,
+    and closes the client after the test.
+    """
+    monkeypatch.setenv("DB_CONNECTION_STRING", "mongodb://localhost:1")
+    monkeypatch.setattr(db_client, "pool_metrics", PoolMetrics())
+    close_client()
+    yield monkeypatch
+    close_client()
+
+def test_client_is_shared_and_not_connected():
+    client = get_client()
+    assert get_client() is client
+    assert db_client.get_database().name == db_client.DATABASE_NAME
+    # connect=False, nothing was opened yet
+    assert db_client.get_pool_metrics()["open_connections"] == 0
+
+def test_pool_options_are_read_from_the_settings(client_settings):
+    client_settings.setenv("DB_MAX_POOL_SIZE", "7")
+    client_settings.setenv("DB_MIN_POOL_SIZE", "2")
+    client_settings.setenv("DB_WAIT_QUEUE_TIMEOUT_MS", "1500")
+    client_settings.setenv("DB_SOCKET_TIMEOUT_MS", "3000")
+    client_settings.setenv("DB_SERVER_SELECTION_TIMEOUT_MS", "4000")
+
+    options = get_client().options
+    assert options.pool_options.max_pool_size == 7
+    assert options.pool_options.min_pool_size == 2
+    assert options.pool_options.wait_queue_timeout == 1.5
+    assert options.pool_options.socket_timeout == 3.0
+    assert options.server_selection_timeout == 4.0
+
+def test_compressors_are_read_from_the_settings(client_settings):
+    client_settings.setenv("DB_COMPRESSORS", "zstd,zlib")
+    assert get_client_options()["compressors"] == "zstd,zlib"
+
+def test_default_options(client_settings):
+    for _, env_var_name, _, _ in db_client.CLIENT_OPTION_SETTINGS:
+        client_settings.delenv(env_var_name, raising=False)
+    assert get_client_options() == {
+        "maxPoolSize": 20,
+        "minPoolSize": 0,
+        "serverSelectionTimeoutMS": 10000,
+        "connectTimeoutMS": 10000,
+        "socketTimeoutMS": 20000,
+        "waitQueueTimeoutMS": 5000,
+        "compressors": "zlib"
+    }
+
+def test_closed_client_is_replaced_by_a_new_one():
+    client = get_client()
+    close_client()
+    assert get_client() is not client
+
+def test_pool_metrics_count_the_events():
+    metrics = PoolMetrics()
+    for _ in range(3):
+        metrics.connection_created(SimpleNamespace())
+    metrics.connection_closed(SimpleNamespace())
+    metrics.connection_checked_out(SimpleNamespace(duration=0.002))
+    metrics.connection_checked_out(SimpleNamespace(duration=0.004))
+    metrics.connection_checked_in(SimpleNamespace())
+    metrics.connection_check_out_failed(SimpleNamespace(duration=0.006))
+    metrics.pool_cleared(SimpleNamespace())
+
+    stats = metrics.get_stats()
+    assert stats["open_connections"] == 2
+    assert stats["checked_out"] == 1
+    assert stats["checkouts"] == 2
+    assert stats["checkout_failures"] == 1
+    assert stats["pool_clears"] == 1
+    assert stats["avg_checkout_wait_ms"] == pytest.approx(4)
+    assert stats["max_checkout_wait_ms"] == pytest.approx(6)
+
+def test_pool_metrics_without_checkouts():
+    stats = PoolMetrics().get_stats()
+    assert stats["avg_checkout_wait_ms"] == 0.0
+    assert stats["max_checkout_wait_ms"] == 0.0
+
+def test_pool_metrics_count_real_checkouts(client_settings):
+    if not MONGODB_TEST_URI:
+        pytest.skip("MONGODB_TEST_URI isn't set")
+    client_settings.setenv("DB_CONNECTION_STRING", MONGODB_TEST_URI)
+    get_client().admin.command("ping")
+    stats = db_client.get_pool_metrics()
+    assert stats["checkouts"] >= 1
+    assert stats["checked_out"] == 0
+    assert stats["open_connections"] >= 1
@@ -0,0 +1,84 @@
+"""
+Tests of the readiness of discord_bot across a lost connection, without connecting to Discord.
+"""
+
+import asyncio
+import threading
+import pytest
+import bot_bridge
+import discord_bot
+from bot_bridge import BotBridge
+from channel_sender import ChannelSender
+from reaction_tracker import ReactionTracker
+
+@pytest.fixture(name="bot_loop")
+def fixture_bot_loop():
+    """
+    An event loop running on its own thread, like the loop of the Discord bot.
+    """
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield loop
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.close()
+
+@pytest.fixture(autouse=True)
+def fixture_ready_event():
+    """
+    Leaves the bot logged out after every test.
+    """
+    yield
+    discord_bot.ready_event.clear()
+
+def test_disconnect_then_resume_makes_the_bot_ready_again():
+    discord_bot.ready_event.set()
+    asyncio.run(discord_bot.on_disconnect())
+    assert not discord_bot.ready_event.is_set()
+    asyncio.run(discord_bot.on_resumed())
+    assert discord_bot.ready_event.is_set()
+
+def test_resume_keeps_the_reactions_unsynced():
+    discord_bot.reaction_tracker.set_users(1, {10: ("player", 1)})
+    asyncio.run(discord_bot.on_disconnect())
+    asyncio.run(discord_bot.on_resumed())
+    # Reactions might have been missed while disconnected
+    assert discord_bot.reaction_tracker.get_users(1) is None
+
+def test_bridge_call_waiting_over_a_disconnect_runs_after_the_resume(bot_loop, monkeypatch):
+    monkeypatch.setattr(bot_bridge, "READY_POLL_INTERVAL", 0.01)
+    discord_bot.ready_event.set()
+    bridge = BotBridge(lambda: bot_loop, discord_bot.ready_event, timeout=5)
+
+    async def echo(value):
+        return value
+
+    async def main():
+        asyncio.run_coroutine_threadsafe(discord_bot.on_disconnect(), bot_loop).result()
+        call = asyncio.create_task(bridge.call(echo, "sent"))
+        await asyncio.sleep(0.05)
+        assert not call.done()
+        asyncio.run_coroutine_threadsafe(discord_bot.on_resumed(), bot_loop).result()
+        return await call
+
+    assert asyncio.run(main()) == "sent"
+
+def test_only_reaction_messages_are_tracked(monkeypatch):
+    sent_ids = iter(range(100, 200))
+
+    async def send(_):
+        return type("Message", (), {"id": next(sent_ids)})()
+
+    monkeypatch.setattr(discord_bot, "get_channel_sender", lambda _: ChannelSender(send))
+    monkeypatch.setattr(discord_bot, "get_channel_id", lambda: 1)
+    monkeypatch.setattr(discord_bot, "reaction_tracker", ReactionTracker())
+
+    async def main():
+        text_id = await discord_bot.send_message("Nikdo nechce točit :(")
+        reaction_id = await discord_bot.send_reaction_message("Kdo se zapojí?")
+        return text_id, reaction_id
+
+    text_id, reaction_id = asyncio.run(main())
+    assert discord_bot.reaction_tracker.get_users(text_id) is None
+    assert discord_bot.reaction_tracker.get_users(reaction_id) == []
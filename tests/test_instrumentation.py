@@ -0,0 +1,136 @@
+"""
+Tests of the latency histograms and the mode selection of instrumentation.
+"""
+
+import asyncio
+import pytest
+import instrumentation
+from instrumentation import Histogram, get_mode, render_prometheus, span, timed
+
+@pytest.fixture(name="select_mode")
+def fixture_select_mode(monkeypatch):
+    """
+    Returns a function selecting the instrumentation mode by the environment,
+    with the settings read again and no histograms recorded yet.
+    """
+    monkeypatch.setattr(instrumentation, "_histograms", {})
+
+    def select(value):
+        monkeypatch.setenv("INSTRUMENTATION", value)
+        monkeypatch.setattr(instrumentation, "_settings", None)
+    return select
+
+@pytest.mark.parametrize("value, expected", [
+    ("off", "off"), ("log", "log"), ("Prometheus", "prometheus"), (" log ", "log")
+])
+def test_known_modes_are_selected(select_mode, value, expected):
+    select_mode(value)
+    assert get_mode() == expected
+
+@pytest.mark.parametrize("value", ["on", "true", "1", "prom"])
+def test_unknown_mode_is_reported_and_off(select_mode, capsys, value):
+    select_mode(value)
+    assert get_mode() == "off"
+    assert not instrumentation.is_enabled()
+    assert f"Unknown INSTRUMENTATION mode {value}" in capsys.readouterr().out
+
+def test_mode_is_read_on_first_use(select_mode):
+    select_mode("off")
+
+    @timed("test.first_use")
+    def work():
+        return 1
+
+    # Decorated while the instrumentation was off, recorded once it's on
+    select_mode("log")
+    assert work() == 1
+    assert instrumentation.get_histograms()["test.first_use"].count == 1
+
+def test_nothing_is_recorded_when_off(select_mode):
+    select_mode("off")
+
+    @timed("test.off")
+    def work():
+        return 1
+
+    with span("test.off_span"):
+        pass
+    assert work() == 1
+    assert not instrumentation.get_histograms()
+
+def test_timed_records_calls_and_failures(select_mode):
+    select_mode("log")
+
+    @timed("test.calls")
+    def work(fail):
+        if fail:
+            raise ValueError("failed")
+        return "done"
+
+    assert work(False) == "done"
+    with pytest.raises(ValueError):
+        work(True)
+    histogram = instrumentation.get_histograms()["test.calls"]
+    assert (histogram.count, histogram.errors) == (2, 1)
+
+def test_timed_records_coroutine_functions(select_mode):
+    select_mode("prometheus")
+
+    @timed()
+    async def fetch():
+        await asyncio.sleep(0)
+        return "fetched"
+
+    assert asyncio.run(fetch()) == "fetched"
+    name = f"{__name__}.test_timed_records_coroutine_functions.<locals>.fetch"
+    assert instrumentation.get_histograms()[name].count == 1
+
+def test_span_records_failures(select_mode):
+    select_mode("log")
+    with pytest.raises(KeyError):
+        with span("test.span"):
+            raise KeyError("missing")
+    histogram = instrumentation.get_histograms()["test.span"]
+    assert (histogram.count, histogram.errors) == (1, 1)
+
+def test_slow_operations_are_printed(select_mode, monkeypatch, capsys):
+    monkeypatch.setenv("SLOW_OPERATION_MS", "0")
+    select_mode("log")
+    with span("test.slow"):
+        pass
+    assert "Slow operation test.slow" in capsys.readouterr().out
+
+def test_quantiles_are_estimated_by_the_buckets():
+    histogram = Histogram(buckets=(0.01, 0.1, 1.0))
+    assert histogram.get_quantile(0.5) == 0.0
+    for _ in range(90):
+        histogram.observe(0.005)
+    for _ in range(10):
+        histogram.observe(0.5)
+    assert histogram.get_quantile(0.5) == 0.01
+    assert histogram.get_quantile(0.95) == 0.5
+    stats = histogram.get_stats()
+    assert stats["count"] == 100
+    assert stats["p50_ms"] == pytest.approx(10)
+    assert stats["max_ms"] == pytest.approx(500)
+
+def test_quantile_above_the_last_bucket_is_the_maximum():
+    histogram = Histogram(buckets=(0.01,))
+    histogram.observe(3.0)
+    assert histogram.get_quantile(0.99) == 3.0
+    assert histogram.get_cumulative_counts() == [(0.01, 0), (float("inf"), 1)]
+
+def test_prometheus_text_has_buckets_sums_and_errors(select_mode):
+    select_mode("prometheus")
+    with span("db.get"):
+        pass
+    with pytest.raises(RuntimeError):
+        with span("db.get"):
+            raise RuntimeError("failed")
+    text = render_prometheus()
+    prefix = instrumentation.METRIC_PREFIX
+    assert f"# TYPE {prefix}_duration_seconds histogram" in text
+    assert f'{prefix}_duration_seconds_bucket{{operation="db.get",le="+Inf"}} 2' in text
+    assert f'{prefix}_duration_seconds_count{{operation="db.get"}} 2' in text
+    assert f'{prefix}_errors_total{{operation="db.get"}} 1' in text
+    assert text.endswith("\n")
@@ -0,0 +1,190 @@
+"""
+Tests of list_document_store.SortedListStore.
+
+The merge pipeline is checked stage by stage and run against a real MongoDB server
+when MONGODB_TEST_URI is set (like "mongodb://localhost:27017"), those tests are skipped
+otherwise. mongomock has no `$sortArray`, so the tests of the bucket split replace
+the pipeline by a sorted `$push`, which is the same merge for items that aren't
+in the list yet.
+"""
+
+import os
+import uuid
+import mongomock
+import pytest
+from pymongo import MongoClient, UpdateOne
+import list_document_store
+from list_document_store import SortedListStore, MAX_BUCKET_BYTES, FIRST_BOUND
+
+MONGODB_TEST_URI = os.environ.get("MONGODB_TEST_URI")
+
+# Long items keep the number of items of an 8 MB bucket small
+ITEM_LENGTH = 1000
+
+def test_add_pipeline_merges_sorts_and_sizes_the_bucket():
+    pipeline = list_document_store._make_add_pipeline(["a", "b"]) # pylint: disable=protected-access
+    assert pipeline == [
+        {"$set": {"list": {"$sortArray": {
+            "input": {"$setUnion": [{"$ifNull": ["$list", []]}, {"$literal": ["a", "b"]}]},
+            "sortBy": 1
+        }}}},
+        {"$set": {"bytes": {"$bsonSize": "$$ROOT"}}}
+    ]
+
+class RecordingCollection:
+    """
+    A mongomock collection recording the bulk writes instead of running them.
+    """
+
+    def __init__(self):
+        self._collection = mongomock.MongoClient().db["GTA"]
+        self.bulk_writes = []
+
+    def bulk_write(self, operations, ordered=True):
+        """
+        Records the operations, reporting a single upserted bucket.
+        """
+        self.bulk_writes.append((operations, ordered))
+        return type("Result", (), {"modified_count": 0, "upserted_count": 1})()
+
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+def test_add_many_sends_one_pipeline_upsert_per_bucket():
+    collection = RecordingCollection()
+    store = SortedListStore(collection)
+    # The bounds of two existing buckets
+    store._bounds = [FIRST_BOUND, "m"] # pylint: disable=protected-access
+    store._sizes = {FIRST_BOUND: 0, "m": 0} # pylint: disable=protected-access
+
+    assert store.add_many(["zulu", "alpha", "mike", "alpha"])
+    (operations, ordered), = collection.bulk_writes
+    assert not ordered
+    make_pipeline = list_document_store._make_add_pipeline # pylint: disable=protected-access
+    assert sorted(operations, key=str) == sorted([
+        UpdateOne({"first": FIRST_BOUND}, make_pipeline(["alpha"]), upsert=True),
+        UpdateOne({"first": "m"}, make_pipeline(["mike", "zulu"]), upsert=True)
+    ], key=str)
+
+@pytest.fixture(name="mongo_collection")
+def fixture_mongo_collection():
+    """
+    A new collection of a real MongoDB server, dropped after the test.
+    """
+    if not MONGODB_TEST_URI:
+        pytest.skip("MONGODB_TEST_URI isn't set")
+    client = MongoClient(MONGODB_TEST_URI, serverSelectionTimeoutMS=5000)
+    collection = client["WheelOfLuckTests"][f"GTA_{uuid.uuid4().hex}"]
+    yield collection
+    collection.drop()
+    client.close()
+
+def test_pipeline_keeps_the_list_sorted_without_duplicates(mongo_collection):
+    store = SortedListStore(mongo_collection)
+    assert store.add_many(["delta", "alpha", "charlie"])
+    assert store.add_many(["bravo", "alpha", "echo"])
+    # Only items already in the list change nothing
+    assert not store.add_many(["alpha", "echo"])
+
+    bucket = mongo_collection.find_one({"first": FIRST_BOUND})
+    assert bucket["list"] == ["alpha", "bravo", "charlie", "delta", "echo"]
+    assert bucket["bytes"] > 0
+    assert store.find_prefix("ch") == ["charlie"]
+
+def test_pipeline_merges_into_split_buckets(mongo_collection):
+    store = SortedListStore(mongo_collection, max_bucket_bytes=50 * ITEM_LENGTH)
+    items = make_items(120)
+    store.add_many(items[::2])
+    store.add_many(items[1::2] + items[:10])
+
+    buckets = list(mongo_collection.find({}, {"_id": 0}).sort("first", 1))
+    assert len(buckets) > 1
+    assert list(store.iter_items()) == items
+    assert SortedListStore(mongo_collection).contains(items[77])
+
+def test_legacy_list_document_is_upgraded(mongo_collection):
+    mongo_collection.insert_one({"list": ["charlie", "alpha", "charlie"]})
+    store = SortedListStore(mongo_collection)
+    store.add_many(["bravo"])
+    assert list(store.iter_items()) == ["alpha", "bravo", "charlie"]
+
+@pytest.fixture(name="collection")
+def fixture_collection(monkeypatch):
+    """
+    An empty mongomock collection, with the merge pipeline replaced by a sorted `$push`.
+    """
+    monkeypatch.setattr(
+        list_document_store, "_make_add_pipeline",
+        lambda items: {"$push": {"list": {"$each": items, "$sort": 1}}}
+    )
+    return mongomock.MongoClient().db["GTA"]
+
+def make_items(count, prefix="race"):
+    """
+    Returns `count` distinct items of ITEM_LENGTH characters.
+    """
+    return [f"{prefix} {index:06d} ".ljust(ITEM_LENGTH, "x") for index in range(count)]
+
+def get_buckets(collection):
+    """
+    Returns the buckets sorted by their bounds.
+    """
+    return list(collection.find({}, {"_id": 0}).sort("first", 1))
+
+def test_bucket_under_the_limit_isnt_split(collection):
+    store = SortedListStore(collection)
+    items = make_items(1000)
+    store.add_many(reversed(items))
+
+    buckets = get_buckets(collection)
+    assert len(buckets) == 1
+    assert buckets[0]["first"] == FIRST_BOUND
+    assert list(store.iter_items()) == items
+
+def test_bucket_over_8_mb_is_split(collection):
+    item_bytes = ITEM_LENGTH + list_document_store.ITEM_OVERHEAD_BYTES
+    count = MAX_BUCKET_BYTES // item_bytes + 100
+    store = SortedListStore(collection)
+    items = make_items(count)
+    store.add_many(items)
+
+    buckets = get_buckets(collection)
+    # Split into buckets of about half of the limit
+    assert len(buckets) == 3
+    assert buckets[0]["first"] == FIRST_BOUND
+    for bucket in buckets[1:]:
+        # Every other bucket starts at its first item
+        assert bucket["first"] == bucket["list"][0]
+    for bucket in buckets:
+        assert bucket["bytes"] <= MAX_BUCKET_BYTES // 2 + item_bytes
+        assert bucket["list"] == sorted(bucket["list"])
+    # No item was lost or duplicated by the split
+    assert list(store.iter_items()) == items
+    assert store.contains(items[0]) and store.contains(items[-1])
+
+def test_items_added_after_a_split_go_to_their_bucket(collection):
+    store = SortedListStore(collection, max_bucket_bytes=50 * ITEM_LENGTH)
+    items = make_items(60)
+    store.add_many(items)
+    assert len(get_buckets(collection)) > 1
+
+    # Sorts before every item and after every item
+    low, high = make_items(1, "a")[0], make_items(1, "z")[0]
+    store.add_many([high, low])
+    buckets = get_buckets(collection)
+    assert buckets[0]["list"][0] == low
+    assert buckets[-1]["list"][-1] == high
+    assert list(store.iter_items()) == [low] + items + [high]
+
+def test_new_store_reads_the_bounds_of_the_split_buckets(collection):
+    store = SortedListStore(collection, max_bucket_bytes=50 * ITEM_LENGTH)
+    items = make_items(120)
+    store.add_many(items)
+    bounds = [bucket["first"] for bucket in get_buckets(collection)]
+    assert len(bounds) > 2
+
+    reopened = SortedListStore(collection, max_bucket_bytes=50 * ITEM_LENGTH)
+    extra = items[70][:-1] + "y"
+    reopened.add_many([extra])
+    assert [bucket["first"] for bucket in get_buckets(collection)][:len(bounds)] == bounds
+    assert list(reopened.iter_items()) == sorted(items + [extra])
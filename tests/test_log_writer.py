@@ -0,0 +1,137 @@
+"""
+Tests of the pending logs of last_spin_state and the background log writer of db_handler,
+a logged spin must be written and counted exactly once, even when it's written again.
+"""
+
+import mongomock
+import pytest
+from pymongo.errors import DuplicateKeyError, PyMongoError
+import db_handler
+import game_catalog
+import last_spin_state
+import stats_handler
+from last_spin_state import LastSpinState, get_last_spin_state
+
+@pytest.fixture(name="db")
+def fixture_db(monkeypatch):
+    """
+    An empty mongomock database with its indexes, and no state cached by a previous test.
+    """
+    monkeypatch.setattr(last_spin_state, "_states", {})
+    monkeypatch.setattr(game_catalog, "_catalogs", {})
+    db = mongomock.MongoClient()["WheelOfLuck"]
+    db_handler.ensure_indexes(db)
+    return db
+
+def restart_process(monkeypatch):
+    """
+    Drops the states cached in memory, like a new process of the application.
+    """
+    monkeypatch.setattr(last_spin_state, "_states", {})
+
+def assert_logged_once(db, game, wins=0, losses=0):
+    """
+    Checks that the game was logged once, counted once and no log is pending.
+    """
+    db_handler.wait_for_logs()
+    assert db["Logs"].count_documents({"game": game}) == 1
+    assert stats_handler.get_stats(db, stats_handler.KIND_GAME) == [
+        {"key": game, "wins": wins, "losses": losses}
+    ]
+    assert db["LastSpin"].find_one().get("pending_logs", []) == []
+
+def test_log_is_written_and_counted_once(db):
+    get_last_spin_state(db).update("Apex Legends", ["tegez", "jouker"])
+    db_handler.insert_log_into_database(db, "W")
+    # A second click on the same spin does nothing
+    db_handler.insert_log_into_database(db, "L")
+
+    assert_logged_once(db, "Apex Legends", wins=1)
+    log = db["Logs"].find_one({}, {"_id": 0})
+    assert log["result"] == "W"
+    assert log["players"] == ["tegez", "jouker"]
+
+def test_pending_log_lost_by_a_crash_is_replayed_once(db, monkeypatch):
+    get_last_spin_state(db).update("Fortnite", ["tegez"])
+    # The process crashes after the click, before the log writer wrote the log
+    assert get_last_spin_state(db).mark_inserted("L") is not None
+    assert db["Logs"].count_documents({}) == 0
+
+    restart_process(monkeypatch)
+    is_inserted, _ = db_handler.is_last_spin_inserted(db)
+    assert is_inserted
+    assert_logged_once(db, "Fortnite", losses=1)
+
+    # The pending logs are only replayed once per process
+    db_handler.is_last_spin_inserted(db)
+    db_handler.insert_log_into_database(db, "W")
+    assert_logged_once(db, "Fortnite", losses=1)
+
+def test_replay_of_a_log_written_before_the_crash_isnt_counted_twice(db, monkeypatch):
+    get_last_spin_state(db).update("Overwatch", ["tegez"])
+
+    def fail(*_):
+        raise PyMongoError("The process crashed")
+
+    # The log and its statistics are written, but it stays pending
+    with monkeypatch.context() as crashing:
+        crashing.setattr(LastSpinState, "mark_logged", fail)
+        db_handler.insert_log_into_database(db, "W")
+        db_handler.wait_for_logs()
+    assert len(db["LastSpin"].find_one()["pending_logs"]) == 1
+
+    restart_process(monkeypatch)
+    db_handler.is_last_spin_inserted(db)
+    assert_logged_once(db, "Overwatch", wins=1)
+
+class RacingLogs:
+    """
+    The Logs collection of a writer losing the race: another writer inserts
+    and counts the same log between the check and the insert of its upsert.
+    """
+
+    def __init__(self, db):
+        self._db = db
+        self._has_raced = False
+
+    def update_one(self, query, update, upsert=False):
+        """
+        Lets the other writer win the first upsert.
+        """
+        if not self._has_raced:
+            self._has_raced = True
+            log = update["$setOnInsert"]
+            self._db["Logs"].insert_one(dict(log))
+            stats_handler.record_log_stats(self._db, log)
+            raise DuplicateKeyError("E11000 duplicate key error")
+        return self._db["Logs"].update_one(query, update, upsert=upsert)
+
+class RacingDatabase:
+    """
+    A database whose Logs collection loses the first upsert to another writer.
+    """
+
+    def __init__(self, db):
+        self._db = db
+        self._logs = RacingLogs(db)
+
+    def __getitem__(self, collection_name):
+        return self._logs if collection_name == "Logs" else self._db[collection_name]
+
+    def __getattr__(self, name):
+        return getattr(self._db, name)
+
+def test_upsert_losing_a_race_doesnt_count_the_log_again(db):
+    get_last_spin_state(db).update("Deceive", ["tegez"])
+    log = get_last_spin_state(db).mark_inserted("W")
+
+    db_handler._write_log(RacingDatabase(db), log) # pylint: disable=protected-access
+    assert_logged_once(db, "Deceive", wins=1)
+
+def test_logs_are_unique_by_date_and_game(db):
+    get_last_spin_state(db).update("Fall Guys", ["tegez"])
+    db_handler.insert_log_into_database(db, "W")
+    db_handler.wait_for_logs()
+    log = db["Logs"].find_one({}, {"_id": 0})
+    with pytest.raises(DuplicateKeyError):
+        db["Logs"].insert_one(log)
@@ -0,0 +1,91 @@
+"""
+Tests of the checkpoints of migration_runner, an interrupted migration resumes where it stopped.
+"""
+
+import mongomock
+import pytest
+from pymongo import UpdateOne
+from migration_runner import CHECKPOINT_COLLECTION, MigrationStep, reset_migration, run_migration
+
+SOURCE_COUNT = 25
+
+@pytest.fixture(name="db")
+def fixture_db():
+    """
+    A mongomock database with SOURCE_COUNT source documents.
+    """
+    db = mongomock.MongoClient()["WheelOfLuck"]
+    db["Source"].insert_many(
+        [{"_id": index, "value": f"v{index}"} for index in range(SOURCE_COUNT)]
+    )
+    return db
+
+class CrashingTransform:
+    """
+    Copies the source documents by upserts, crashing on the chunk with a given `_id`.
+    Records the `_id`s of every chunk it was given.
+    """
+
+    def __init__(self, crash_at=None):
+        self.crash_at = crash_at
+        self.chunks = []
+
+    def __call__(self, documents, target):
+        ids = [document["_id"] for document in documents]
+        self.chunks.append(ids)
+        if self.crash_at in ids:
+            raise RuntimeError("Interrupted")
+        return [
+            UpdateOne({"_id": document["_id"]}, {"$set": {"value": document["value"]}},
+                      upsert=True)
+            for document in documents
+        ]
+
+def make_step(transform):
+    """
+    A step copying Source into Target.
+    """
+    return MigrationStep("copy", "Source", "Target", transform, projection={"value": 1})
+
+def test_migration_copies_every_document_in_chunks(db):
+    transform = CrashingTransform()
+    processed, _ = run_migration(db, make_step(transform), batch_size=10, report=lambda *_: None)
+
+    assert processed == SOURCE_COUNT
+    assert [len(chunk) for chunk in transform.chunks] == [10, 10, 5]
+    assert db["Target"].count_documents({}) == SOURCE_COUNT
+    checkpoint = db[CHECKPOINT_COLLECTION].find_one({"_id": "copy"})
+    assert checkpoint["completed"] and checkpoint["processed"] == SOURCE_COUNT
+
+def test_interrupted_migration_resumes_after_the_last_chunk(db):
+    with pytest.raises(RuntimeError):
+        run_migration(db, make_step(CrashingTransform(crash_at=15)), batch_size=10,
+                      report=lambda *_: None)
+    checkpoint = db[CHECKPOINT_COLLECTION].find_one({"_id": "copy"})
+    assert checkpoint["last_id"] == 9 and not checkpoint["completed"]
+
+    transform = CrashingTransform()
+    processed, _ = run_migration(db, make_step(transform), batch_size=10, report=lambda *_: None)
+    # Only the documents after the checkpoint are read again
+    assert transform.chunks[0][0] == 10
+    assert processed == SOURCE_COUNT - 10
+    assert db["Target"].count_documents({}) == SOURCE_COUNT
+    assert db[CHECKPOINT_COLLECTION].find_one({"_id": "copy"})["processed"] == SOURCE_COUNT
+
+def test_completed_migration_isnt_run_again_until_reset(db):
+    run_migration(db, make_step(CrashingTransform()), batch_size=10, report=lambda *_: None)
+    transform = CrashingTransform()
+    assert run_migration(db, make_step(transform), report=lambda *_: None) == (0, 0.0)
+    assert not transform.chunks
+
+    reset_migration(db, make_step(transform))
+    processed, _ = run_migration(db, make_step(transform), batch_size=10, report=lambda *_: None)
+    assert processed == SOURCE_COUNT
+    # The upserts are idempotent, running again doesn't duplicate anything
+    assert db["Target"].count_documents({}) == SOURCE_COUNT
+
+def test_progress_is_reported_after_every_chunk(db):
+    reports = []
+    run_migration(db, make_step(CrashingTransform()), batch_size=10,
+                  report=lambda step, processed, _: reports.append((step.name, processed)))
+    assert reports == [("copy", 10), ("copy", 20), ("copy", 25)]
@@ -0,0 +1,60 @@
+"""
+Tests of the group parsing and the eligibility index of player_groups.
+"""
+
+from game import Game, get_default_games, get_player_codes
+from player_groups import PlayerGroupIndex, parse_group
+
+def test_ka_is_a_single_player():
+    assert parse_group("DKKA") == ["D", "K", "KA"]
+    assert parse_group("DKA") == ["D", "KA"]
+    assert parse_group("KAK") == ["KA", "K"]
+    assert parse_group("DK") == ["D", "K"]
+
+def test_default_codes_are_derived_from_the_game_list():
+    assert get_player_codes() == ["D", "F", "K", "KA", "M", "TEST"]
+    assert parse_group("DKKA", get_player_codes()) == parse_group("DKKA")
+
+def test_codes_follow_the_players_playing_alone():
+    games = [
+        Game("Solo", ["A", "B"], 1),
+        Game("Trio", ["ABXY", "BC"], 1),
+        Game("Guests", ["GUEST"], 1)
+    ]
+    # C, X and Y never play alone, so they continue the code of B,
+    # a group without any single letter player is a single code
+    assert get_player_codes(games) == ["A", "B", "BC", "BXY", "GUEST"]
+
+def test_index_derives_the_codes_of_its_games():
+    index = PlayerGroupIndex([Game("Duo", ["D", "DJO"], 1), Game("Solo", ["J"], 1)])
+    assert index.player_codes == ("D", "J", "JO")
+    assert index.is_eligible("Duo", ["D", "JO"])
+    assert not index.is_eligible("Duo", ["D", "J"])
+
+def test_letters_without_a_code_are_single_players():
+    assert parse_group("TEST", player_codes=["D", "K"]) == ["T", "E", "S", "T"]
+    assert parse_group("DKKA", player_codes=["D", "K"]) == ["D", "K", "K", "A"]
+
+def test_longest_code_is_preferred():
+    assert parse_group("ABCD", player_codes=["AB", "ABC"]) == ["ABC", "D"]
+
+def test_group_mask_ignores_the_order_of_the_players():
+    index = PlayerGroupIndex(get_default_games())
+    assert index.get_group_mask("DKKA") == index.get_group_mask("KAKD")
+    assert index.get_group_mask("DKA") != index.get_group_mask("DKKA")
+    assert index.get_group_mask("DX") is None
+
+def test_eligible_games_of_a_group():
+    games = [
+        Game("Both", ["DK", "DKKA"], 1),
+        Game("Ka only", ["DKA"], 1),
+        Game("Solo", ["D"], 1),
+        Game("Solo K", ["K"], 1)
+    ]
+    index = PlayerGroupIndex(games)
+    assert [_game.name for _game in index.get_eligible_games("KDKA")] == ["Both"]
+    assert [_game.name for _game in index.get_eligible_games("DKA")] == ["Ka only"]
+    assert [_game.name for _game in index.get_eligible_games("K")] == ["Solo K"]
+    assert index.get_eligible_games("KA") == []
+    assert index.is_eligible("Solo", ["D"])
+    assert not index.is_eligible("Solo", "DK")
@@ -0,0 +1,118 @@
+"""
+Tests of the win/loss counters of stats_handler, kept up to date by every log
+and rebuilt from the Logs.
+"""
+
+from datetime import datetime, timedelta
+import mongomock
+import pytest
+import stats_handler
+from stats_handler import (
+    KIND_GAME, KIND_GROUP, KIND_PLAYER, get_game_group_stats, get_stats, rebuild_stats,
+    record_log_stats
+)
+
+START = datetime(2024, 1, 1)
+
+@pytest.fixture(name="db")
+def fixture_db():
+    """
+    An empty mongomock database.
+    """
+    return mongomock.MongoClient()["WheelOfLuck"]
+
+def make_log(game, players, result, days=0):
+    """
+    Returns a log of a game played `days` days after START.
+    """
+    return {"game": game, "players": players, "result": result,
+            "game_date": START + timedelta(days=days)}
+
+def log_game(db, log):
+    """
+    Inserts a log and counts it, like db_handler does.
+    """
+    db["Logs"].insert_one(dict(log))
+    record_log_stats(db, log)
+
+def get_stats_documents(db):
+    """
+    Returns all the statistics entries without their IDs, in a stable order.
+    """
+    return sorted(
+        (entry for entry in db["Stats"].find({}, {"_id": 0})),
+        key=lambda entry: (entry["kind"], entry["key"])
+    )
+
+LOGS = [
+    make_log("Apex Legends", ["tegez", "jouker"], "W", 0),
+    make_log("Apex Legends", ["jouker", "tegez"], "L", 1),
+    make_log("Fortnite", ["tegez"], "W", 2),
+    make_log("Apex Legends", ["tegez", "jouker"], "W", 3),
+    make_log("Deceive", ["tegez", "jouker", "r4tmax"], "L", 4),
+]
+
+def test_log_increments_its_game_players_and_group(db):
+    for log in LOGS:
+        log_game(db, log)
+
+    assert get_stats(db, KIND_GAME) == [
+        {"key": "Apex Legends", "wins": 2, "losses": 1},
+        {"key": "Deceive", "wins": 0, "losses": 1},
+        {"key": "Fortnite", "wins": 1, "losses": 0},
+    ]
+    assert get_stats(db, KIND_PLAYER)[0] == {"key": "tegez", "wins": 3, "losses": 2}
+    # The order of the players doesn't make a different group
+    assert get_stats(db, KIND_GROUP)[0] == {"key": "jouker, tegez", "wins": 2, "losses": 1}
+    apex = db["Stats"].find_one({"kind": KIND_GAME, "key": "Apex Legends"})
+    assert apex["played"] == 3
+    assert apex["last_played"] == START + timedelta(days=3)
+
+def test_stats_are_limited_to_the_most_played(db):
+    for log in LOGS:
+        log_game(db, log)
+
+    assert [entry["key"] for entry in get_stats(db, KIND_GAME, limit=2)] == [
+        "Apex Legends", "Deceive"
+    ]
+
+def test_game_group_stats_only_match_the_exact_group(db):
+    for log in LOGS:
+        log_game(db, log)
+
+    stats = get_game_group_stats(db, ["jouker", "tegez"])
+    assert set(stats) == {"Apex Legends"}
+    assert stats["Apex Legends"]["wins"] == 2
+    assert stats["Apex Legends"]["last_played"] == START + timedelta(days=3)
+
+def test_rebuild_matches_the_incremental_counts(db):
+    for log in LOGS:
+        log_game(db, log)
+    incremental = get_stats_documents(db)
+
+    db["Stats"].drop()
+    processed_logs, _ = rebuild_stats(db, batch_size=2)
+    assert processed_logs == len(LOGS)
+    assert get_stats_documents(db) == incremental
+
+def test_rebuild_counts_the_logs_inserted_while_it_runs(db, monkeypatch):
+    for log in LOGS[:3]:
+        log_game(db, log)
+    count_logs = stats_handler._count_logs # pylint: disable=protected-access
+
+    def count_logs_while_logging(*args):
+        counted = count_logs(*args)
+        if args[1].name == "StatsRebuild":
+            # Logged by the bot after the rebuild read the logs
+            for log in LOGS[3:]:
+                log_game(db, log)
+        return counted
+
+    monkeypatch.setattr(stats_handler, "_count_logs", count_logs_while_logging)
+    rebuild_stats(db)
+
+    monkeypatch.undo()
+    rebuilt = get_stats_documents(db)
+    db["Stats"].drop()
+    rebuild_stats(db)
+    assert rebuilt == get_stats_documents(db)
@@ -0,0 +1,141 @@
+"""
+Tests of the behaviour every storage backend shares, run against MemoryBackend
+and a temporary SQLiteBackend.
+"""
+
+import os
+import sqlite3
+import subprocess
+import sys
+import pytest
+import storage_backend
+from stats_keys import KIND_GAME, KIND_GROUP, KIND_PLAYER
+from storage_backend import MemoryBackend, SQLiteBackend, StorageBackend
+
+@pytest.fixture(name="storage", params=["memory", "sqlite"])
+def fixture_storage(request):
+    """
+    An empty storage backend, closed after the test.
+    """
+    storage = MemoryBackend() if request.param == "memory" else SQLiteBackend(":memory:")
+    yield storage
+    storage.close()
+
+def play(storage, game, players, result):
+    """
+    Spins a game for the players and logs its result.
+    """
+    storage.update_last_spin(game, players)
+    storage.insert_log_into_database(result)
+
+def test_interface_is_abstract():
+    with pytest.raises(TypeError):
+        StorageBackend() # pylint: disable=abstract-class-instantiated
+
+def test_games_are_added_sorted_and_removed_once(storage):
+    assert storage.add_game_to_game_list("Portal")
+    assert storage.add_game_to_game_list("Chess")
+    assert not storage.add_game_to_game_list("Chess")
+    assert storage.get_list_of_games() == ["Chess", "Portal"]
+    assert storage.is_game_in_game_list("Portal")
+    assert storage.remove_game_from_game_list("Portal")
+    assert not storage.remove_game_from_game_list("Portal")
+    assert not storage.is_game_in_game_list("Portal")
+
+def test_user_libraries(storage):
+    assert storage.get_list_of_user_games("Anna") == []
+    assert storage.add_game_to_user_game_list("Anna", "Portal")
+    assert storage.add_game_to_user_game_list("Anna", "Chess")
+    assert not storage.add_game_to_user_game_list("Anna", "Chess")
+    assert storage.get_list_of_user_games("Anna") == ["Chess", "Portal"]
+    assert storage.remove_game_from_user_game_list("Anna", "Portal")
+    assert not storage.remove_game_from_user_game_list("Anna", "Portal")
+    assert storage.get_list_of_user_games("Anna") == ["Chess"]
+
+def test_common_games_of_players(storage):
+    for player, games in {"Anna": ["Chess", "Portal"], "Ben": ["Portal", "Go"]}.items():
+        for game in games:
+            storage.add_game_to_user_game_list(player, game)
+    assert storage.get_common_games_of_players(["Anna", "Ben", "Anna"]) == {"Portal"}
+    # A new player has no games yet
+    assert storage.get_common_games_of_players(["Anna", "Cyril"]) == set()
+    assert storage.get_common_games_of_players([]) == set()
+
+def test_last_spin_is_logged_once(storage):
+    assert storage.is_last_spin_inserted() == (True, None)
+    assert storage.get_last_spin_string() == ""
+    storage.update_last_spin("Chess", ["Anna", "Ben"])
+    is_inserted, last_spin = storage.is_last_spin_inserted()
+    assert not is_inserted
+    assert last_spin["last_game"] == "Chess"
+    assert last_spin["players"] == ["Anna", "Ben"]
+    assert "Chess" in storage.get_last_spin_string()
+
+    storage.insert_log_into_database("W")
+    storage.insert_log_into_database("L")
+    assert storage.is_last_spin_inserted()[0]
+    assert storage.get_stats(KIND_GAME) == [{"key": "Chess", "wins": 1, "losses": 0}]
+
+def test_stats_count_games_players_and_groups(storage):
+    play(storage, "Chess", ["Anna", "Ben"], "W")
+    play(storage, "Chess", ["Ben", "Anna"], "L")
+    play(storage, "Portal", ["Anna"], "W")
+
+    assert storage.get_stats(KIND_GAME) == [
+        {"key": "Chess", "wins": 1, "losses": 1},
+        {"key": "Portal", "wins": 1, "losses": 0}
+    ]
+    assert storage.get_stats(KIND_PLAYER) == [
+        {"key": "Anna", "wins": 2, "losses": 1},
+        {"key": "Ben", "wins": 1, "losses": 1}
+    ]
+    assert storage.get_stats(KIND_GROUP, limit=1) == [
+        {"key": "Anna, Ben", "wins": 1, "losses": 1}
+    ]
+
+def test_game_group_stats_of_the_exact_group(storage):
+    play(storage, "Chess", ["Anna", "Ben"], "W")
+    play(storage, "Portal", ["Anna", "Ben"], "L")
+    play(storage, "Go", ["Anna", "Ben", "Cyril"], "W")
+
+    stats = storage.get_game_group_stats(["Ben", "Anna"])
+    assert set(stats) == {"Chess", "Portal"}
+    assert (stats["Chess"]["wins"], stats["Chess"]["losses"]) == (1, 0)
+    assert (stats["Portal"]["wins"], stats["Portal"]["losses"]) == (0, 1)
+    assert stats["Portal"]["last_played"] >= stats["Chess"]["last_played"]
+    assert storage.get_game_group_stats(["Cyril"]) == {}
+
+def test_connection_stats_without_a_server(storage):
+    assert storage.get_connection_stats() is None
+
+def test_sqlite_drops_the_unused_log_players_table(tmp_path):
+    path = str(tmp_path / "wheel_of_luck.sqlite3")
+    with sqlite3.connect(path) as connection:
+        connection.execute("CREATE TABLE log_players (player TEXT, log_id INTEGER)")
+    connection.close()
+    storage = SQLiteBackend(path)
+    play(storage, "Chess", ["Anna"], "W")
+    storage.close()
+    with sqlite3.connect(path) as connection:
+        tables = {name for (name,) in connection.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table'"
+        )}
+    connection.close()
+    assert "log_players" not in tables
+    assert "logs" in tables
+
+def test_memory_and_sqlite_backends_dont_load_pymongo():
+    script = (
+        "import sys, storage_backend\n"
+        "for storage in (storage_backend.MemoryBackend(), "
+        "storage_backend.SQLiteBackend(':memory:')):\n"
+        "    storage.update_last_spin('Chess', ['Anna'])\n"
+        "    storage.insert_log_into_database('W')\n"
+        "    storage.get_stats('game')\n"
+        "print('pymongo' in sys.modules)\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script], cwd=os.path.dirname(storage_backend.__file__),
+        capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip() == "False"